@@ -5,8 +5,14 @@ import os
 from dotenv import load_dotenv
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from blueprints.communications import send_bulk_template_reminders, send_bulk_text_reminders
-from datetime import datetime
+from reminder_schedule import plan_reminders
+from blueprints.analytics import run_churn_scoring
+from outbox import drain_outbox
+from stock_ledger import take_snapshot
+from low_stock import send_digest as send_low_stock_digest
+from jobs import JobRunner
+from delivery_status import status_buffer
+from blueprints.auth import login_events
 
 load_dotenv()
 
@@ -42,25 +48,53 @@ def create_app():
     
     # Register blueprints
     register_blueprints(app)
+
+    # Flushes buffered WhatsApp status callbacks (every worker receives webhooks)
+    status_buffer.start(app)
+    # Flushes buffered login events (every worker serves logins)
+    login_events.start(app)
     
     # Scheduler Setup
+    # Every gunicorn worker runs this scheduler; JobRunner lets only one
+    # worker claim each trigger and records the run in job_run.
     if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from models import JobRun
+        runner = JobRunner(db, JobRun)
         scheduler = BackgroundScheduler()
         hour = int(os.getenv('SCHEDULE_TIME_HH', '9'))
         minute = int(os.getenv('SCHEDULE_TIME_MM', '0'))
-        
-        def scheduled_job():
-            with app.app_context():
-                now = datetime.now()
-                try:
-                    if os.getenv('WHATSAPP_TEMPLATE_FEE_REMINDER_NAME'):
-                        send_bulk_template_reminders(now.year, now.month)
-                    else:
-                        send_bulk_text_reminders(now.year, now.month)
-                except Exception:
-                    pass
-                    
-        scheduler.add_job(scheduled_job, CronTrigger(hour=hour, minute=minute))
+
+        def fee_reminders():
+            # Fires at the start of the send window; messages are spread across it
+            res = plan_reminders()
+            if not res.get('ok'):
+                raise RuntimeError(res.get('error') or 'reminder run failed')
+            return res.get('planned', 0)
+
+        scheduler.add_job(runner.scheduled(app, 'fee_reminders', fee_reminders),
+                          CronTrigger(hour=hour, minute=minute))
+
+        churn_hour = int(os.getenv('CHURN_TIME_HH', '2'))
+        churn_minute = int(os.getenv('CHURN_TIME_MM', '30'))
+        scheduler.add_job(runner.scheduled(app, 'churn_scoring', lambda: run_churn_scoring()['scored']),
+                          CronTrigger(hour=churn_hour, minute=churn_minute))
+
+        drain_seconds = int(os.getenv('OUTBOX_DRAIN_SECONDS', '15'))
+        scheduler.add_job(runner.scheduled(app, 'outbox_drain', lambda: drain_outbox()['claimed'], drain_seconds),
+                          'interval', seconds=drain_seconds, max_instances=1, coalesce=True)
+
+        # Yesterday's closing stock, just after local midnight
+        scheduler.add_job(runner.scheduled(app, 'stock_snapshot', lambda: take_snapshot()['products']),
+                          CronTrigger(hour=0, minute=5))
+
+        low_hour = int(os.getenv('LOW_STOCK_DIGEST_HH', '8'))
+        low_minute = int(os.getenv('LOW_STOCK_DIGEST_MM', '0'))
+        scheduler.add_job(runner.scheduled(app, 'low_stock_digest', lambda: send_low_stock_digest()['queued']),
+                          CronTrigger(hour=low_hour, minute=low_minute))
+
+        keep_days = int(os.getenv('JOB_RUN_RETENTION_DAYS', '14'))
+        scheduler.add_job(runner.scheduled(app, 'job_run_prune', lambda: runner.prune(keep_days)),
+                          CronTrigger(hour=3, minute=45))
         scheduler.start()
     
     @app.route('/')
@@ -1,7 +1,7 @@
 from flask import Flask, request, jsonify, render_template, send_file, session, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import pandas as pd
 import os
 from dotenv import load_dotenv
@@ -9,7 +9,13 @@ from dotenv import load_dotenv
 # Load environment variables FIRST (before any os.getenv calls)
 load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
 
-import requests
+from whatsapp_client import get_whatsapp_client
+from mailer import send_one
+from jobs import JobRunner, run_key
+from invoice_sequence import next_invoice_number
+from sale_mirror import SaleMirror, targets_configured as sale_mirror_targets_configured
+from login_log import LoginLogBuffer
+from role_cache import RoleCache
 from werkzeug.security import generate_password_hash, check_password_hash
 import werkzeug
 # Compatibility shim: some werkzeug builds omit __version__ attribute which
@@ -22,10 +28,9 @@ if not hasattr(werkzeug, '__version__'):
         werkzeug.__version__ = '0'
 import json
 import hashlib
+import threading
 import secrets
 from sqlalchemy import or_, func
-import smtplib
-from email.message import EmailMessage
 import zipfile
 from io import BytesIO
 from authlib.integrations.flask_client import OAuth
@@ -174,7 +179,9 @@ def _build_member_card_pdf_bytes(member: "Member") -> tuple[bool, bytes, str]:
         return False, b"", "PDF generation library not installed"
     buf = BytesIO()
     page_w, page_h = A4
-    c = _pdf_canvas.Canvas(buf, pagesize=A4)
+    # invariant=1 drops the creation timestamp and random document ID, so the
+    # same card renders to the same bytes (and reuses its cached WhatsApp media id)
+    c = _pdf_canvas.Canvas(buf, pagesize=A4, invariant=1)
     # Card layout
     margin = 36
     card_w = page_w - margin * 2
@@ -216,10 +223,11 @@ def _build_member_card_pdf_bytes(member: "Member") -> tuple[bool, bytes, str]:
     c.drawString(text_x, text_y - 20, f"Serial: #{serial}")
     c.drawString(text_x, text_y - 40, f"Phone: {member.phone or ''}")
     c.drawString(text_x, text_y - 60, f"Admission Date: {member.admission_date.isoformat()}")
-    # Footer / issued date
+    # Footer / issued date: the card is issued at admission. Nothing on it may
+    # depend on today's date, or every resend uploads a new PDF
     c.setFillColor(HexColor("#60A5FA"))
     c.setFont("Helvetica-Oblique", 10)
-    c.drawString(card_x + 16, card_y + 12, f"Issued: {datetime.now().strftime('%Y-%m-%d')}")
+    c.drawString(card_x + 16, card_y + 12, f"Issued: {member.admission_date.isoformat()}")
     c.showPage()
     c.save()
     buf.seek(0)
@@ -472,6 +480,75 @@ class LoginLog(db.Model):
     ip_address = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class JobRun(db.Model):
+    # Run lock + history for scheduled jobs (see jobs.JobRunner)
+    __table_args__ = (
+        db.UniqueConstraint('job_name', 'run_key', name='uq_job_run_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(64), nullable=False)
+    run_key = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')
+    owner = db.Column(db.String(120), nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+    rows_affected = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+job_runner = JobRunner(db, JobRun)
+login_events = LoginLogBuffer(db, LoginLog)
+role_cache = RoleCache(db, User)
+
+class InvoiceSequence(db.Model):
+    # Last invoice number handed out per day (see invoice_sequence.py)
+    day = db.Column(db.Date, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+class SaleMirrorQueue(db.Model):
+    # Sales waiting to be mirrored to Google Sheets / Drive (see sale_mirror.py)
+    __table_args__ = (
+        db.Index('idx_sale_mirror_status_next', 'status', 'next_attempt_at'),
+    )
+    sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/sending/done/dead
+    sheet_done = db.Column(db.Boolean, nullable=False, default=False)
+    drive_done = db.Column(db.Boolean, nullable=False, default=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lease_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    mirrored_at = db.Column(db.DateTime, nullable=True)
+
+sale_mirror = SaleMirror(db, SaleMirrorQueue, Sale)
+
+class StockMovement(db.Model):
+    # Ledger of stock changes, same shape as the main app's (see stock_ledger.py)
+    __table_args__ = (
+        db.Index('ix_stock_movement_product_created', 'product_id', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(30), nullable=False)
+    ref = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def _sale_mirror_enabled() -> bool:
+    # Queue nothing unless a sheet or Drive folder is set up to receive it
+    return (os.getenv('POS_GOOGLE_BACKUP_ENABLED', '1') not in ('0', 'false', 'False')
+            and sale_mirror_targets_configured())
+
+class WhatsAppMedia(db.Model):
+    # Uploaded media ids keyed by content hash, so identical files are uploaded once
+    sha256 = db.Column(db.String(64), primary_key=True)
+    media_id = db.Column(db.String(128), nullable=False)
+    mime = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
 def get_setting(key: str, default: str | None = None) -> str | None:
     s = Setting.query.filter_by(key=key).first()
     return s.value if s else default
@@ -537,13 +614,8 @@ def _gen_referral_code(prefix: str = 'M') -> str:
 
 
 def _generate_invoice_number() -> str:
-    prefix = os.getenv('POS_INVOICE_PREFIX', 'INV')
-    day = datetime.now(timezone.utc).strftime('%Y%m%d')
-    while True:
-        suffix = secrets.token_hex(2).upper()
-        candidate = f"{prefix}{day}-{suffix}"
-        if not Sale.query.filter_by(invoice_number=candidate).first():
-            return candidate
+    # Bumps the day's counter in the caller's transaction; commit or roll back with the sale
+    return next_invoice_number(db, InvoiceSequence, os.getenv('POS_INVOICE_PREFIX', 'INV'))
 
 
 def _sale_verification_hash(invoice: str, total: float) -> str:
@@ -555,72 +627,8 @@ def _sale_verification_hash(invoice: str, total: float) -> str:
 
 
 def _log_login_event(user: "User", method: str) -> None:
-    try:
-        entry = LoginLog(
-            user_id=user.id if user else None,
-            username=user.username if user else 'unknown',
-            method=method,
-            ip_address=request.remote_addr,
-        )
-        db.session.add(entry)
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-
-def _sale_to_csv_bytes(sale: Sale) -> bytes:
-    rows = ["invoice_number,customer,total,payment_method,created_at"]
-    rows.append(
-        f"{sale.invoice_number},{(sale.customer_name or '').replace(',', ' ')},{sale.total},{sale.payment_method or ''},{sale.created_at.isoformat()}"
-    )
-    rows.append("item,qty,price,total")
-    for item in sale.items:
-        rows.append(
-            f"{item.name.replace(',', ' ')},{item.quantity},{item.unit_price},{item.total_price}"
-        )
-    return "\n".join(rows).encode('utf-8')
-
-
-def _append_sale_to_sheet(sale: Sale) -> tuple[bool, str | dict]:
-    if not HAVE_GDRIVE:
-        return False, 'Google API client not installed'
-    sheet_id = os.getenv('SALES_SHEET_ID')
-    sa_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE')
-    if not (sheet_id and sa_file and os.path.exists(sa_file)):
-        return False, 'Sheet configuration missing'
-    try:
-        scopes = ['https://www.googleapis.com/auth/spreadsheets']
-        creds = service_account.Credentials.from_service_account_file(sa_file, scopes=scopes)
-        service = build('sheets', 'v4', credentials=creds)
-        payload = {
-            'values': [[
-                sale.invoice_number,
-                sale.created_at.isoformat() if sale.created_at else '',
-                sale.customer_name or '',
-                sale.total,
-                sale.payment_method or '',
-                json.dumps([item.to_dict() for item in sale.items]),
-            ]]
-        }
-        service.spreadsheets().values().append(
-            spreadsheetId=sheet_id,
-            range=os.getenv('SALES_SHEET_RANGE', 'Sheet1!A:F'),
-            valueInputOption='USER_ENTERED',
-            body=payload,
-        ).execute()
-        return True, 'appended'
-    except Exception as exc:
-        return False, str(exc)
-
-
-def _upload_sale_artifacts_to_drive(sale: Sale) -> dict:
-    results = {}
-    csv_bytes = _sale_to_csv_bytes(sale)
-    ok, info = _upload_backup_to_gdrive(csv_bytes, f"sale_{sale.invoice_number}.csv", mime='text/csv')
-    results['csv'] = {'ok': ok, 'info': info}
-    sheet_ok, sheet_info = _append_sale_to_sheet(sale)
-    results['sheet'] = {'ok': sheet_ok, 'info': sheet_info}
-    return results
+    # Buffered; the login_events thread inserts in batches
+    login_events.record(user, method, request.remote_addr)
 
 
 def _persist_sale(payload: dict, user_id: int | None, synced_offline: bool = False) -> tuple[Sale, dict]:
@@ -688,17 +696,19 @@ def _persist_sale(payload: dict, user_id: int | None, synced_offline: bool = Fal
             if row['product_id']:
                 product = db.session.get(Product, row['product_id'])
                 if product:
-                    product.stock = max(0, product.stock - row['quantity'])
+                    new_stock = max(0, product.stock - row['quantity'])
+                    db.session.add(StockMovement(product_id=product.id, delta=new_stock - product.stock,
+                                                 reason='sale', ref=invoice))
+                    product.stock = new_stock
+        mirror_enabled = _sale_mirror_enabled()
+        if mirror_enabled:
+            # Mirrored to Sheets/Drive in the background, batched with other sales
+            sale_mirror.enqueue(sale.id)
         db.session.commit()
     except Exception:
         db.session.rollback()
         raise
-    backup_results = {}
-    if os.getenv('POS_GOOGLE_BACKUP_ENABLED', '1') not in ('0', 'false', 'False'):
-        try:
-            backup_results = _upload_sale_artifacts_to_drive(sale)
-        except Exception as exc:
-            backup_results = {'error': str(exc)}
+    backup_results = {'mirror': 'queued' if mirror_enabled else 'disabled'}
     append_audit('pos.sale.create', {
         'sale_id': sale.id,
         'invoice_number': sale.invoice_number,
@@ -781,6 +791,9 @@ def create_tables():
         set_setting('gym_name', 'ZAIDAN FITNESS RECORD')
     # Start scheduler once
     start_scheduler_once()
+    if _sale_mirror_enabled():
+        sale_mirror.start(app)
+    login_events.start(app)
     # Optional immediate rollover on startup if enabled
     if os.getenv('AUTO_PAYMENT_ROLLOVER_ENABLED', '0') not in ('0','false','False',''):
         try:
@@ -804,12 +817,14 @@ def start_scheduler_once():
     if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or not app.debug:
         scheduler = BackgroundScheduler()
         trigger = CronTrigger(hour=hour, minute=minute)
-        scheduler.add_job(send_monthly_unpaid_template_job, trigger)
+        # job_runner lets only one worker run each trigger and records it in job_run
+        scheduler.add_job(job_runner.scheduled(app, 'fee_reminders', send_monthly_unpaid_template_job), trigger)
         # Optional: payment rollover (ensure current year rows)
         if os.getenv('AUTO_PAYMENT_ROLLOVER_ENABLED', '0') not in ('0','false','False',''):
             rollover_hour = int(os.getenv('ROLLOVER_TIME_HH', '2'))
             rollover_minute = int(os.getenv('ROLLOVER_TIME_MM', '15'))
-            scheduler.add_job(payment_rollover_job, CronTrigger(hour=rollover_hour, minute=rollover_minute))
+            scheduler.add_job(job_runner.scheduled(app, 'payment_rollover', payment_rollover_job),
+                              CronTrigger(hour=rollover_hour, minute=rollover_minute))
         scheduler.start()
     app.config['SCHEDULER_STARTED'] = True
 
@@ -849,8 +864,7 @@ def admin_required(view_func):
         uid = session.get('user_id')
         if not uid:
             return redirect(url_for('login', next=request.path))
-        user = db.session.get(User, uid)
-        if not user or (user.role or 'staff') != 'admin':
+        if not role_cache.is_admin(uid):
             flash('Admin access required', 'warning')
             return redirect(url_for('dashboard'))
         return view_func(*args, **kwargs)
@@ -869,9 +883,8 @@ def login():
             _log_login_event(user, 'password')
             # Optional: create backup on login
             try:
-                trigger_backup_on_login()
-                if os.getenv('AUTO_BACKUP_ON_LOGIN', '0') not in ('0','false','False','') and 'local' in (os.getenv('AUTO_BACKUP_DEST', 'local').lower()):
-                    flash('Backup created after login (see backups folder).', 'info')
+                if trigger_backup_on_login() and 'local' in (os.getenv('AUTO_BACKUP_DEST', 'local').lower()):
+                    flash('Backup started in the background (see backups folder).', 'info')
             except Exception:
                 pass
             next_url = request.args.get('next') or url_for('dashboard')
@@ -1007,9 +1020,7 @@ def dashboard():
     # Expose admin flag for template to gate admin-only actions
     is_admin = False
     try:
-        uid = session.get('user_id')
-        user = db.session.get(User, uid) if uid else None
-        is_admin = bool(user and (user.role or 'staff') == 'admin')
+        is_admin = role_cache.is_admin(session.get('user_id'))
     except Exception:
         is_admin = False
     return render_template(
@@ -1999,7 +2010,7 @@ def send_whatsapp_template(to_phone: str, template_name: str, lang_code: str = '
         }
     }
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=20)
+        r = get_whatsapp_client().post(url, headers=headers, json=payload, timeout=20)
     except Exception as e:
         return False, f"request error: {e}"
     ok = 200 <= r.status_code < 300
@@ -2018,7 +2029,7 @@ def send_whatsapp_text(to_phone: str, text: str) -> tuple[bool, str | dict]:
     headers = { 'Authorization': f'Bearer {token}', 'Content-Type': 'application/json' }
     payload = { 'messaging_product': 'whatsapp', 'to': to_phone, 'type': 'text', 'text': { 'preview_url': False, 'body': text } }
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=20)
+        r = get_whatsapp_client().post(url, headers=headers, json=payload, timeout=20)
     except Exception as e:
         return False, f'request error: {e}'
     try:
@@ -2348,7 +2359,7 @@ def send_whatsapp_message(to_phone: str, text: str) -> tuple[bool, str]:
         'text': {'preview_url': False, 'body': text}
     }
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=20)
+        r = get_whatsapp_client().post(url, headers=headers, json=payload, timeout=20)
     except Exception as e:
         return False, f"request error: {e}"
     ok = 200 <= r.status_code < 300
@@ -2391,7 +2402,7 @@ def _whatsapp_upload_media(filename: str, content: bytes, mime: str = 'applicati
     files = { 'file': (filename, BytesIO(content), mime) }
     data = { 'messaging_product': 'whatsapp', 'type': mime }
     try:
-        r = requests.post(url, headers=headers, files=files, data=data, timeout=30)
+        r = get_whatsapp_client().post(url, headers=headers, files=files, data=data, timeout=30)
     except Exception as e:
         return False, f"upload error: {e}"
     try:
@@ -2402,13 +2413,60 @@ def _whatsapp_upload_media(filename: str, content: bytes, mime: str = 'applicati
         return True, js
     return False, f"{r.status_code}: {js}"
 
-def send_whatsapp_document(to_phone: str, filename: str, content: bytes, caption: str = '') -> tuple[bool, str | dict]:
-    ok, res = _whatsapp_upload_media(filename, content, 'application/pdf')
+def _whatsapp_media_ttl() -> timedelta:
+    # Cloud API keeps uploaded media for 30 days; expire the cache entry a day early
+    return timedelta(days=int(os.getenv('WHATSAPP_MEDIA_TTL_DAYS', '29')))
+
+def _whatsapp_media_id(filename: str, content: bytes, mime: str) -> tuple[bool, str, bool]:
+    """Return (ok, media_id or error, cached) for ``content``, uploading only on a cache miss."""
+    digest = hashlib.sha256(content).hexdigest()
+    now = datetime.utcnow()
+    row = db.session.get(WhatsAppMedia, digest)
+    if row and row.expires_at > now and row.mime == mime:
+        return True, row.media_id, True
+    ok, res = _whatsapp_upload_media(filename, content, mime)
     if not ok:
-        return False, res  # error string
+        return False, res, False
     media_id = res.get('id') if isinstance(res, dict) else None
     if not media_id:
-        return False, 'Failed to get media id from upload response'
+        return False, 'Failed to get media id from upload response', False
+    try:
+        if row is None:
+            row = WhatsAppMedia(sha256=digest)
+            db.session.add(row)
+        row.media_id = media_id
+        row.mime = mime
+        row.size = len(content)
+        row.created_at = now
+        row.expires_at = now + _whatsapp_media_ttl()
+        db.session.commit()
+    except Exception:
+        # The cache is an optimisation; a failed write must not fail the send
+        db.session.rollback()
+    return True, media_id, False
+
+def _forget_whatsapp_media(media_id: str) -> None:
+    try:
+        WhatsAppMedia.query.filter_by(media_id=media_id).delete()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+def send_whatsapp_document(to_phone: str, filename: str, content: bytes, caption: str = '') -> tuple[bool, str | dict]:
+    ok, media_id, cached = _whatsapp_media_id(filename, content, 'application/pdf')
+    if not ok:
+        return False, media_id  # error string
+    ok, res = _send_whatsapp_document_by_id(to_phone, media_id, filename, caption)
+    if not ok and cached and 'media' in str(res).lower():
+        # Cached id was rejected (deleted or expired early on Meta's side): upload again once
+        _forget_whatsapp_media(media_id)
+        ok, media_id, _ = _whatsapp_media_id(filename, content, 'application/pdf')
+        if not ok:
+            return False, media_id
+        ok, res = _send_whatsapp_document_by_id(to_phone, media_id, filename, caption)
+    return ok, res
+
+def _send_whatsapp_document_by_id(to_phone: str, media_id: str, filename: str, caption: str) -> tuple[bool, str | dict]:
     token = os.getenv('WHATSAPP_TOKEN')
     phone_id = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
     url = f"https://graph.facebook.com/v20.0/{phone_id}/messages"
@@ -2427,7 +2485,7 @@ def send_whatsapp_document(to_phone: str, filename: str, content: bytes, caption
         }
     }
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=30)
+        r = get_whatsapp_client().post(url, headers=headers, json=payload, timeout=30)
     except Exception as e:
         return False, f"request error: {e}"
     ok = 200 <= r.status_code < 300
@@ -2438,64 +2496,14 @@ def send_whatsapp_document(to_phone: str, filename: str, content: bytes, caption
     return ok, (data if ok else f"{r.status_code}: {data}")
 
 def send_email(subject: str, body: str, to_email: str, attachments: list[tuple[str, bytes]]|None=None) -> tuple[bool, str]:
-    host = os.getenv('SMTP_HOST')
-    port = int(os.getenv('SMTP_PORT', '587'))
-    user = os.getenv('SMTP_USER')
-    pwd = os.getenv('SMTP_PASSWORD')
-    use_tls = os.getenv('SMTP_TLS', '1') not in ('0','false','False')
-    if not (host and user and pwd and to_email):
-        return False, 'SMTP config missing (host/user/password or recipient)'
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = user
-    msg['To'] = to_email
-    msg.set_content(body)
-    if attachments:
-        for filename, content in attachments:
-            msg.add_attachment(content, maintype='application', subtype='octet-stream', filename=filename)
-    try:
-        if use_tls:
-            with smtplib.SMTP(host, port, timeout=30) as s:
-                s.ehlo(); s.starttls(); s.ehlo(); s.login(user, pwd); s.send_message(msg)
-        else:
-            with smtplib.SMTP(host, port, timeout=30) as s:
-                s.login(user, pwd); s.send_message(msg)
-        return True, 'sent'
-    except Exception as e:
-        return False, str(e)
+    return send_one(subject, body, to_email, attachments=attachments)
 
 def send_email_enhanced(subject: str, text_body: str, to_email: str, html_body: str|None=None, attachments: list[tuple[str, bytes]]|None=None) -> tuple[bool, str]:
     """Extended email helper supporting optional HTML alternative.
 
     Falls back to plain text if no HTML provided. Uses same SMTP env vars.
     """
-    host = os.getenv('SMTP_HOST')
-    port = int(os.getenv('SMTP_PORT', '587'))
-    user = os.getenv('SMTP_USER')
-    pwd = os.getenv('SMTP_PASSWORD')
-    use_tls = os.getenv('SMTP_TLS', '1') not in ('0','false','False')
-    if not (host and user and pwd and to_email):
-        return False, 'SMTP config missing (host/user/password or recipient)'
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = user
-    msg['To'] = to_email
-    msg.set_content(text_body or '')
-    if html_body:
-        msg.add_alternative(html_body, subtype='html')
-    if attachments:
-        for filename, content in attachments:
-            msg.add_attachment(content, maintype='application', subtype='octet-stream', filename=filename)
-    try:
-        if use_tls:
-            with smtplib.SMTP(host, port, timeout=30) as s:
-                s.ehlo(); s.starttls(); s.ehlo(); s.login(user, pwd); s.send_message(msg)
-        else:
-            with smtplib.SMTP(host, port, timeout=30) as s:
-                s.login(user, pwd); s.send_message(msg)
-        return True, 'sent'
-    except Exception as e:
-        return False, str(e)
+    return send_one(subject, text_body or '', to_email, attachments=attachments, html=html_body)
 
 @app.route('/admin/backup/email', methods=['POST'])
 @admin_required
@@ -2588,15 +2596,36 @@ def _save_backup_local(content: bytes, ts: str) -> tuple[bool, str]:
         return False, str(e)
 
 
-def trigger_backup_on_login() -> None:
-    """Perform backup right after a successful login based on env config.
+_login_backup_lock = threading.Lock()
+
+
+def trigger_backup_on_login() -> bool:
+    """Start a login-time backup in the background, based on env config.
+
+    The login request returns straight away; returns whether a backup was
+    started. Every login still gets its own backup, but the lock makes them
+    run one at a time in this process instead of building ZIPs in parallel.
 
     Env controls:
       - AUTO_BACKUP_ON_LOGIN: enable when set to '1'/'true'
       - AUTO_BACKUP_DEST: comma-separated 'local', 'email', 'drive' (default: 'local')
     """
     if os.getenv('AUTO_BACKUP_ON_LOGIN', '0') in ('0', 'false', 'False', ''):
-        return
+        return False
+
+    def work():
+        with _login_backup_lock, app.app_context():
+            try:
+                _backup_on_login()
+            except Exception as e:
+                db.session.rollback()
+                append_audit('backup.auto_login.error', {'error': str(e)})
+
+    threading.Thread(target=work, name='login-backup', daemon=True).start()
+    return True
+
+
+def _backup_on_login() -> None:
     ok, data, ts = _build_backup_zip_bytes()
     if not ok:
         append_audit('backup.auto_login.error', {'error': data})
@@ -2710,6 +2739,25 @@ def download_backup():
     )
 
 
+@app.route('/admin/jobs', methods=['GET'])
+@admin_required
+def job_runs_view():
+    try:
+        limit = min(max(int(request.args.get('limit') or 50), 1), 500)
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'invalid limit'}), 400
+    return jsonify({'ok': True, 'runs': job_runner.history(limit=limit, job_name=request.args.get('job') or None)})
+
+
+@app.route('/admin/sales/mirror', methods=['GET', 'POST'])
+@admin_required
+def sale_mirror_view():
+    # POST mirrors everything due now instead of waiting for the next interval
+    if request.method == 'POST':
+        return jsonify({'ok': True, 'result': sale_mirror.drain(), **sale_mirror.stats()})
+    return jsonify({'ok': True, **sale_mirror.stats()})
+
+
 @app.route('/admin/backup/create', methods=['POST'])
 @admin_required
 def create_backup():
@@ -3337,15 +3385,18 @@ def init_backup_scheduler():
     # Get backup interval (default: every 6 hours)
     backup_interval = int(os.getenv('BACKUP_INTERVAL_HOURS', '6'))
     
-    def backup_job():
-        """Wrapper function to run backup within app context"""
-        with app.app_context():
-            perform_automatic_backup()
-    
+    period = backup_interval * 3600
+
+    def run_backup():
+        result = perform_automatic_backup()
+        if not result.get('ok'):
+            raise RuntimeError(result.get('error') or 'backup failed')
+        return result
+
     try:
         scheduler = BackgroundScheduler()
         scheduler.add_job(
-            func=backup_job,
+            func=job_runner.scheduled(app, 'automatic_backup', run_backup, period),
             trigger='interval',
             hours=backup_interval,
             id='automatic_backup',
@@ -3354,11 +3405,12 @@ def init_backup_scheduler():
         )
         scheduler.start()
         
-        # Perform initial backup on startup (within app context)
+        # Perform initial backup on startup (within app context); shares the
+        # interval's run key, so restarts within one interval don't pile up backups
         with app.app_context():
-            result = perform_automatic_backup()
-            if result.get('ok'):
-                print(f"✓ Initial backup created: {result.get('path')}")
+            run = job_runner.run_once('automatic_backup', run_key(period), run_backup)
+            if run is not None and run.status == 'ok':
+                print("✓ Initial backup created")
         
         print(f"✓ Automatic backup scheduler started (every {backup_interval} hours)")
         print(f"✓ Backups saved to: {BACKUP_DIR}")
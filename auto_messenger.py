@@ -1,23 +1,37 @@
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import json
+import math
+import queue
+import threading
 from twilio.rest import Client
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 
+from mailer import SMTPSession, build_message, send_bulk_email, MIN_MESSAGES_PER_SESSION
+from messaging import dispatch_concurrent
+
 # Load .env if present
 load_dotenv()
 
 # --- EMAIL CONFIG ---
 EMAIL_ADDRESS = os.getenv("GMAIL_EMAIL")
 EMAIL_PASSWORD = os.getenv("GMAIL_PASSWORD")
+SMTP_HOST = os.getenv("GMAIL_SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("GMAIL_SMTP_PORT", "587"))
+SMTP_TLS = os.getenv("GMAIL_SMTP_TLS", "1") not in ("0", "false", "False")
 
 # --- WHATSAPP CONFIG ---
 TWILIO_SID = os.getenv("TWILIO_SID")
 TWILIO_AUTH = os.getenv("TWILIO_AUTH")
 TWILIO_WHATSAPP = os.getenv("TWILIO_WHATSAPP", "whatsapp:+14155238886")
 
+# --- PARALLEL MODE LIMITS ---
+# Each email worker holds one SMTP session for its share of the recipients
+EMAIL_SESSIONS = int(os.getenv("AUTO_MESSENGER_EMAIL_SESSIONS", "4"))
+WHATSAPP_WORKERS = int(os.getenv("AUTO_MESSENGER_WHATSAPP_WORKERS", "8"))
+# Twilio queues WhatsApp messages above the sender's throughput; stay under it
+WHATSAPP_RATE_PER_SEC = float(os.getenv("AUTO_MESSENGER_WHATSAPP_RATE", "10"))
+
 client = Client(TWILIO_SID, TWILIO_AUTH) if (TWILIO_SID and TWILIO_AUTH) else None
 
 app = Flask(__name__)
@@ -25,21 +39,23 @@ app = Flask(__name__)
 # ==============================
 # SEND EMAIL FUNCTION
 # ==============================
-def send_email(to_email: str, subject: str, message: str):
+def _smtp_config() -> dict:
+    return {"host": SMTP_HOST, "port": SMTP_PORT, "user": EMAIL_ADDRESS, "password": EMAIL_PASSWORD,
+            "use_tls": SMTP_TLS, "sender": EMAIL_ADDRESS}
+
+def _require_email_config():
     if not (EMAIL_ADDRESS and EMAIL_PASSWORD):
         raise RuntimeError("Gmail credentials not configured. Set GMAIL_EMAIL and GMAIL_PASSWORD (App Password).")
-    msg = MIMEMultipart()
-    msg["From"] = EMAIL_ADDRESS
-    msg["To"] = to_email
-    msg["Subject"] = subject
 
-    msg.attach(MIMEText(message, "plain"))
-
-    server = smtplib.SMTP("smtp.gmail.com", 587)
-    server.starttls()
-    server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-    server.sendmail(EMAIL_ADDRESS, to_email, msg.as_string())
-    server.quit()
+def send_email(to_email: str, subject: str, message: str, session: SMTPSession | None = None):
+    """Send one email; pass ``session`` to reuse an open SMTP connection."""
+    _require_email_config()
+    msg = build_message(subject, message, to_email, EMAIL_ADDRESS)
+    if session is not None:
+        session.send(msg)
+        return
+    with SMTPSession(**_smtp_config()) as s:
+        s.send(msg)
 
 # ==============================
 # SEND WHATSAPP FUNCTION
@@ -69,6 +85,8 @@ def send_message():
     subject = data.get("subject") or "Welcome to Zaidan Fitness Gym"
     provided_message = data.get("message")
     dry_run = bool(data.get("dry_run"))
+    # Parallel mode streams per-recipient results as NDJSON instead of one JSON reply
+    parallel = bool(data.get("parallel")) or request.args.get("stream") in ("1", "true", "True")
 
     # Build final message (allow custom override)
     default_template = f"""
@@ -83,16 +101,19 @@ Zaidan Fitness Gym
 """
     final_message = provided_message.strip() if isinstance(provided_message, str) and provided_message.strip() else default_template
 
-    # Merge recipients
+    # Merge recipients (order kept, duplicates and non-string entries dropped)
     all_emails = []
     if single_email:
         all_emails.append(single_email)
     all_emails.extend(email_list)
+    all_emails = list(dict.fromkeys(em for em in all_emails if isinstance(em, str)))
 
     all_whatsapp = []
     if single_whatsapp:
         all_whatsapp.append(single_whatsapp)
     all_whatsapp.extend(whatsapp_list)
+    # Accept both raw number or already prefixed whatsapp:+
+    all_whatsapp = list(dict.fromkeys(wa.replace("whatsapp:", "") for wa in all_whatsapp if isinstance(wa, str)))
 
     if not all_emails and not all_whatsapp:
         return jsonify({"ok": False, "error": "Provide at least one recipient via email/whatsapp/emails/whatsapps"}), 400
@@ -106,30 +127,134 @@ Zaidan Fitness Gym
             "dry_run": True,
             "subject": subject,
             "message_preview": final_message[:160],
-            "targets": {"emails": all_emails, "whatsapps": all_whatsapp}
+            "targets": {"emails": all_emails, "whatsapps": all_whatsapp},
+            "plan": _plan(all_emails, all_whatsapp),
         }), 200
 
-    # Send emails
-    for em in all_emails:
-        try:
-            send_email(em, subject, final_message)
-            results["email"].append({"to": em, "ok": True})
-        except Exception as e:
-            results["email"].append({"to": em, "ok": False, "error": str(e)})
+    if parallel:
+        return Response(
+            stream_with_context(_stream_parallel(all_emails, all_whatsapp, subject, final_message)),
+            mimetype="application/x-ndjson",
+        )
+
+    # Send emails over one SMTP session
+    session = SMTPSession(**_smtp_config()) if all_emails and EMAIL_ADDRESS and EMAIL_PASSWORD else None
+    try:
+        for em in all_emails:
+            try:
+                send_email(em, subject, final_message, session=session)
+                results["email"].append({"to": em, "ok": True})
+            except Exception as e:
+                results["email"].append({"to": em, "ok": False, "error": str(e)})
+    finally:
+        if session is not None:
+            session.close()
 
     # Send WhatsApp messages
     for wa in all_whatsapp:
         try:
-            # Accept both raw number or already prefixed whatsapp:+
-            wa_clean = wa.replace("whatsapp:", "") if isinstance(wa, str) else wa
-            send_whatsapp(wa_clean, final_message)
-            results["whatsapp"].append({"to": wa_clean, "ok": True})
+            send_whatsapp(wa, final_message)
+            results["whatsapp"].append({"to": wa, "ok": True})
         except Exception as e:
             results["whatsapp"].append({"to": wa, "ok": False, "error": str(e)})
 
     return jsonify({"ok": True, "results": results}), 200
 
 
+def _plan(emails: list, whatsapps: list) -> dict:
+    sessions = max(1, min(EMAIL_SESSIONS, math.ceil(len(emails) / MIN_MESSAGES_PER_SESSION))) if emails else 0
+    workers = max(1, min(WHATSAPP_WORKERS, len(whatsapps))) if whatsapps else 0
+    return {
+        "email": {"recipients": len(emails), "smtp_sessions": sessions},
+        "whatsapp": {
+            "recipients": len(whatsapps),
+            "workers": workers,
+            "rate_per_sec": WHATSAPP_RATE_PER_SEC,
+            # Lower bound: the rate limit, ignoring Twilio API latency
+            "min_seconds": round(len(whatsapps) / WHATSAPP_RATE_PER_SEC, 1),
+        },
+    }
+
+
+def _whatsapp_job(to_number: str, message: str) -> tuple[bool, str]:
+    try:
+        send_whatsapp(to_number, message)
+        return True, "sent"
+    except Exception as e:
+        return False, str(e)
+
+
+def _stream_parallel(emails: list, whatsapps: list, subject: str, message: str):
+    """Send both channels concurrently and yield one NDJSON line per recipient.
+
+    Emails go over up to EMAIL_SESSIONS reused SMTP sessions; WhatsApp
+    messages over WHATSAPP_WORKERS threads sharing a token bucket. Lines are
+    written as results arrive; the last line is a summary. Each worker always
+    posts an end marker, so one that dies mid-run cannot stall the stream;
+    recipients it never reported on are listed as failed.
+    """
+    events: queue.Queue = queue.Queue()
+
+    def emit(channel):
+        def on_result(row):
+            line = {"channel": channel, "to": row["to"], "ok": row["ok"]}
+            if not row["ok"]:
+                line["error"] = str(row.get("error"))
+            events.put(line)
+        return on_result
+
+    def run_email():
+        try:
+            _require_email_config()
+        except RuntimeError as e:
+            for em in emails:
+                events.put({"channel": "email", "to": em, "ok": False, "error": str(e)})
+            return
+        send_bulk_email([{"to": em, "subject": subject, "body": message, "meta": {"to": em}} for em in emails],
+                        config=_smtp_config(), max_sessions=EMAIL_SESSIONS, on_result=emit("email"))
+
+    def run_whatsapp():
+        jobs = [{"args": {"to_number": wa, "message": message}, "meta": {"to": wa}} for wa in whatsapps]
+        dispatch_concurrent(jobs, _whatsapp_job, max_workers=WHATSAPP_WORKERS,
+                            rate_per_sec=WHATSAPP_RATE_PER_SEC, on_result=emit("whatsapp"))
+
+    def worker(channel, target):
+        error = None
+        try:
+            target()
+        except Exception as e:
+            error = str(e)
+        finally:
+            events.put((channel, error))
+
+    channels = {"email": (run_email, emails), "whatsapp": (run_whatsapp, whatsapps)}
+    threads = []
+    for channel, (target, recipients) in channels.items():
+        if recipients:
+            t = threading.Thread(target=worker, args=(channel, target), daemon=True)
+            t.start()
+            threads.append(t)
+
+    summary = {"email": {"sent": 0, "failed": 0}, "whatsapp": {"sent": 0, "failed": 0}}
+    reported = {"email": set(), "whatsapp": set()}
+    running = len(threads)
+    while running:
+        event = events.get()
+        if isinstance(event, tuple):
+            channel, error = event
+            running -= 1
+            lines = [{"channel": channel, "to": to, "ok": False, "error": error or "not sent"}
+                     for to in channels[channel][1] if to not in reported[channel]]
+        else:
+            lines = [event]
+        for line in lines:
+            reported[line["channel"]].add(line["to"])
+            summary[line["channel"]]["sent" if line["ok"] else "failed"] += 1
+            yield json.dumps(line) + "\n"
+    for t in threads:
+        t.join()
+    yield json.dumps({"done": True, "ok": True, "summary": summary}) + "\n"
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "5000"))
     app.run(debug=True, port=port)
@@ -0,0 +1,85 @@
+"""In-process write buffer flushed in batches by a background thread.
+
+Request handlers ``add`` rows and return; a daemon thread calls ``write``
+with everything pending every ``flush_seconds``, or as soon as
+``flush_size`` rows are waiting, and once more at interpreter exit. A failed
+write puts the batch back for the next tick. Rows still buffered when a
+worker is killed are lost, so only use this for data that can tolerate it.
+"""
+import atexit
+import threading
+
+
+class BatchBuffer:
+    thread_name = 'batch-buffer'
+
+    def __init__(self, flush_size: int, flush_seconds: float, max_pending: int = 50000):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._events: list[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def write(self, batch: list[dict]) -> int:
+        """Persist one batch; subclasses commit or raise."""
+        raise NotImplementedError
+
+    def add(self, events: list[dict]) -> None:
+        with self._lock:
+            room = self.max_pending - len(self._events)
+            if len(events) > room:
+                # DB down for a long time: drop the overflow rather than grow without bound
+                self.dropped += len(events) - max(room, 0)
+                events = events[:max(room, 0)]
+            self._events.extend(events)
+            full = len(self._events) >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._events)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._events = self._events, []
+            if not batch:
+                return 0
+            try:
+                return self.write(batch)
+            except Exception:
+                # Put the batch back so the next tick retries it
+                with self._lock:
+                    self._events[:0] = batch
+                raise
+
+    def start(self, app) -> None:
+        """Start the background flusher (once per process)."""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                self._wake.wait(self.flush_seconds)
+                self._wake.clear()
+                with app.app_context():
+                    try:
+                        self.flush()
+                    except Exception:
+                        pass
+
+        def flush_at_exit():
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    pass
+
+        self._thread = threading.Thread(target=loop, name=self.thread_name, daemon=True)
+        self._thread.start()
+        atexit.register(flush_at_exit)
@@ -7,6 +7,8 @@ from blueprints.settings import settings_bp
 from blueprints.dashboard import dashboard_bp
 from blueprints.fees import fees_bp
 from blueprints.communications import communications_bp
+from blueprints.analytics import analytics_bp
+from blueprints.webhooks import webhooks_bp
 
 def register_blueprints(app):
     app.register_blueprint(auth_bp)
@@ -17,3 +19,5 @@ def register_blueprints(app):
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(fees_bp)
     app.register_blueprint(communications_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(webhooks_bp)
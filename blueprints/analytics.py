@@ -0,0 +1,255 @@
+from flask import Blueprint, request, jsonify
+from extensions import db
+from blueprints.decorators import login_required
+from models import Member, Payment, PaymentTransaction, ChurnScore, OutboundMessage
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, case, delete, insert
+import numpy as np
+import pandas as pd
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# Cohort matrices keyed by (computed_on, horizon). Retention only changes when
+# payments are recorded, so one computation per day is plenty.
+_COHORT_CACHE: dict[tuple[str, int], dict] = {}
+
+def _month_index(year, month):
+    # Months since year 0, so month arithmetic is plain integer subtraction
+    return year * 12 + (month - 1)
+
+def _load_cohort_arrays():
+    """Pull members and payments as compact int32 arrays (no ORM objects)."""
+    member_rows = db.session.execute(
+        select(
+            Member.id,
+            func.extract('year', Member.admission_date),
+            func.extract('month', Member.admission_date),
+        ).where(Member.admission_date.isnot(None))
+    ).all()
+    payment_rows = db.session.execute(
+        select(
+            Payment.member_id,
+            Payment.year,
+            Payment.month,
+            case((Payment.status == 'Paid', 1), else_=0),
+        )
+    ).all()
+    members = np.array(member_rows, dtype=np.int32).reshape(-1, 3)
+    payments = np.array(payment_rows, dtype=np.int32).reshape(-1, 4)
+    return members, payments
+
+def compute_cohort_matrix(horizon: int = 12, today: date | None = None) -> dict:
+    today = today or date.today()
+    members, payments = _load_cohort_arrays()
+
+    member_df = pd.DataFrame({
+        'member_id': members[:, 0],
+        'cohort': _month_index(members[:, 1], members[:, 2]),
+    })
+    cohort_sizes = member_df.groupby('cohort').size()
+
+    pay_df = pd.DataFrame({
+        'member_id': payments[:, 0],
+        'month_idx': _month_index(payments[:, 1], payments[:, 2]),
+        'paid': payments[:, 3],
+    })
+    pay_df = pay_df[pay_df['paid'] == 1].merge(member_df, on='member_id', how='inner')
+    pay_df['offset'] = pay_df['month_idx'] - pay_df['cohort']
+    pay_df = pay_df[(pay_df['offset'] >= 0) & (pay_df['offset'] < horizon)]
+    # A member counts once per month even if duplicate Paid rows slipped in
+    pay_df = pay_df.drop_duplicates(['member_id', 'month_idx'])
+
+    paid_counts = pd.crosstab(pay_df['cohort'], pay_df['offset'])
+    paid_counts = paid_counts.reindex(index=cohort_sizes.index, columns=range(horizon), fill_value=0)
+    matrix = paid_counts.to_numpy(dtype=np.float64) / cohort_sizes.to_numpy()[:, None]
+
+    # Months that have not happened yet are unknown, not zero
+    current_idx = _month_index(today.year, today.month)
+    elapsed = current_idx - cohort_sizes.index.to_numpy()[:, None]
+    matrix = np.where(np.arange(horizon)[None, :] <= elapsed, matrix, np.nan)
+
+    cohorts = []
+    for i, cohort in enumerate(cohort_sizes.index):
+        year, month0 = divmod(int(cohort), 12)
+        cohorts.append({
+            'cohort': f"{year:04d}-{month0 + 1:02d}",
+            'size': int(cohort_sizes.iloc[i]),
+            'retention': [None if np.isnan(v) else round(float(v), 4) for v in matrix[i]],
+        })
+
+    return {
+        'ok': True,
+        'computed_on': today.isoformat(),
+        'horizon': horizon,
+        'offsets': list(range(horizon)),
+        'cohorts': cohorts,
+    }
+
+def get_cohort_matrix(horizon: int = 12, refresh: bool = False) -> dict:
+    today = date.today()
+    key = (today.isoformat(), horizon)
+    if refresh or key not in _COHORT_CACHE:
+        # Drop entries from previous days so the cache cannot grow unbounded
+        for stale in [k for k in _COHORT_CACHE if k[0] != key[0]]:
+            _COHORT_CACHE.pop(stale, None)
+        _COHORT_CACHE[key] = compute_cohort_matrix(horizon, today)
+    return _COHORT_CACHE[key]
+
+# --- Churn risk ---
+
+# Logistic weights for the churn score. Hand-picked starting values: a long
+# unpaid streak dominates, long tenure pulls risk down.
+CHURN_BIAS = -2.5
+CHURN_W_UNPAID = 1.1
+CHURN_W_LATENESS = 0.04
+CHURN_W_CONTACT = 0.012
+CHURN_W_TENURE = -0.08
+CHURN_CONTACT_CAP_DAYS = 180
+CHURN_TENURE_CAP_MONTHS = 24
+CHURN_LATENESS_WINDOW = 6  # most recent transactions considered per member
+
+def compute_churn_features(today: date | None = None) -> pd.DataFrame:
+    """Build churn features for every active member in one vectorized pass."""
+    today = today or date.today()
+    current_idx = _month_index(today.year, today.month)
+
+    member_rows = db.session.execute(
+        select(
+            Member.id,
+            func.extract('year', Member.admission_date),
+            func.extract('month', Member.admission_date),
+            Member.last_contact_at,
+        ).where(Member.is_active.is_(True), Member.admission_date.isnot(None))
+    ).all()
+    members = pd.DataFrame(member_rows, columns=['member_id', 'adm_year', 'adm_month', 'last_contact_at'])
+    if members.empty:
+        return pd.DataFrame(columns=['member_id', 'unpaid_streak', 'avg_lateness_days',
+                                     'days_since_contact', 'tenure_months', 'score'])
+    members['cohort'] = _month_index(members['adm_year'].astype(np.int32), members['adm_month'].astype(np.int32))
+
+    # Consecutive unpaid months = months elapsed since the last Paid month
+    # (or since admission when the member never paid).
+    paid_rows = db.session.execute(
+        select(Payment.member_id, func.max(Payment.year * 12 + Payment.month - 1))
+        .where(Payment.status == 'Paid', Payment.year * 12 + Payment.month - 1 <= current_idx)
+        .group_by(Payment.member_id)
+    ).all()
+    last_paid = pd.Series(dict(paid_rows), dtype='float64')
+    last_paid_idx = members['member_id'].map(last_paid).fillna(members['cohort'] - 1)
+    members['unpaid_streak'] = (current_idx - last_paid_idx).clip(lower=0).astype(np.int32)
+
+    # Lateness: days between the start of the billed month and the payment
+    tx_rows = db.session.execute(
+        select(PaymentTransaction.member_id, PaymentTransaction.year,
+               PaymentTransaction.month, PaymentTransaction.created_at)
+        .where(PaymentTransaction.month.isnot(None), PaymentTransaction.created_at.isnot(None))
+    ).all()
+    tx = pd.DataFrame(tx_rows, columns=['member_id', 'year', 'month', 'created_at'])
+    if tx.empty:
+        lateness = pd.Series(dtype='float64')
+    else:
+        month_start = pd.to_datetime(pd.DataFrame({'year': tx['year'], 'month': tx['month'], 'day': 1}))
+        tx['lateness'] = ((pd.to_datetime(tx['created_at']) - month_start).dt.days).clip(lower=0)
+        tx = tx.sort_values('created_at')
+        recent = tx.groupby('member_id').cumcount(ascending=False) < CHURN_LATENESS_WINDOW
+        lateness = tx[recent].groupby('member_id')['lateness'].mean()
+    members['avg_lateness_days'] = members['member_id'].map(lateness).fillna(0.0)
+
+    contact = pd.to_datetime(members['last_contact_at'])
+    days_since = (pd.Timestamp(today) - contact).dt.days
+    members['days_since_contact'] = days_since.fillna(CHURN_CONTACT_CAP_DAYS).clip(0, CHURN_CONTACT_CAP_DAYS).astype(np.int32)
+    members['tenure_months'] = (current_idx - members['cohort']).clip(lower=0).astype(np.int32)
+
+    z = (CHURN_BIAS
+         + CHURN_W_UNPAID * members['unpaid_streak']
+         + CHURN_W_LATENESS * members['avg_lateness_days']
+         + CHURN_W_CONTACT * members['days_since_contact']
+         + CHURN_W_TENURE * members['tenure_months'].clip(upper=CHURN_TENURE_CAP_MONTHS))
+    members['score'] = 1.0 / (1.0 + np.exp(-z.to_numpy(dtype=np.float64)))
+    return members[['member_id', 'unpaid_streak', 'avg_lateness_days',
+                    'days_since_contact', 'tenure_months', 'score']]
+
+def run_churn_scoring(today: date | None = None) -> dict:
+    """Nightly job: recompute churn scores and replace the churn_score table."""
+    features = compute_churn_features(today)
+    now = datetime.utcnow()
+    rows = [
+        {
+            'member_id': int(r.member_id),
+            'score': round(float(r.score), 4),
+            'unpaid_streak': int(r.unpaid_streak),
+            'avg_lateness_days': round(float(r.avg_lateness_days), 1),
+            'days_since_contact': int(r.days_since_contact),
+            'tenure_months': int(r.tenure_months),
+            'computed_at': now,
+        }
+        for r in features.itertuples(index=False)
+    ]
+    try:
+        db.session.execute(delete(ChurnScore))
+        if rows:
+            db.session.execute(insert(ChurnScore), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'ok': True, 'scored': len(rows), 'computed_at': now.isoformat()}
+
+def delivery_summary(days: int = 30, now: datetime | None = None) -> dict:
+    """Delivery funnel for WhatsApp messages sent in the last ``days`` days."""
+    since = (now or datetime.utcnow()) - timedelta(days=days)
+    counts = dict(db.session.execute(
+        select(OutboundMessage.delivery_status, func.count())
+        .where(OutboundMessage.channel == 'whatsapp', OutboundMessage.sent_at >= since)
+        .group_by(OutboundMessage.delivery_status)
+    ).all())
+    total = sum(counts.values())
+    delivered = counts.get('delivered', 0) + counts.get('read', 0)
+
+    def rate(n):
+        return round(n / total, 4) if total else None
+    return {
+        'ok': True,
+        'days': days,
+        'sent': total,
+        'by_status': {
+            'no_callback': counts.get(None, 0),
+            'sent': counts.get('sent', 0),
+            'delivered': counts.get('delivered', 0),
+            'read': counts.get('read', 0),
+            'failed': counts.get('failed', 0),
+        },
+        'delivered_rate': rate(delivered),
+        'read_rate': rate(counts.get('read', 0)),
+        'failed_rate': rate(counts.get('failed', 0)),
+    }
+
+# --- Routes ---
+
+@analytics_bp.route('/api/analytics/cohorts', methods=['GET'])
+@login_required
+def cohort_retention():
+    try:
+        horizon = int(request.args.get('months') or 12)
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid months"}), 400
+    if not 1 <= horizon <= 60:
+        return jsonify({"ok": False, "error": "months must be between 1 and 60"}), 400
+    refresh = request.args.get('refresh') == '1'
+    return jsonify(get_cohort_matrix(horizon, refresh=refresh))
+
+@analytics_bp.route('/api/analytics/churn/run', methods=['POST'])
+@login_required
+def churn_run_now():
+    return jsonify(run_churn_scoring())
+
+@analytics_bp.route('/api/analytics/delivery', methods=['GET'])
+@login_required
+def delivery_stats():
+    try:
+        days = int(request.args.get('days') or 30)
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid days"}), 400
+    if not 1 <= days <= 365:
+        return jsonify({"ok": False, "error": "days must be between 1 and 365"}), 400
+    return jsonify(delivery_summary(days))
@@ -2,23 +2,17 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from werkzeug.security import check_password_hash, generate_password_hash
 from extensions import db, oauth
 from models import User, OAuthAccount, LoginLog
+from login_log import LoginLogBuffer
 import os
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
 
+# Written in batches by a background thread (started in create_app)
+login_events = LoginLogBuffer(db, LoginLog)
+
 def _log_login_event(user, method):
-    try:
-        entry = LoginLog(
-            user_id=user.id if user else None,
-            username=user.username if user else 'unknown',
-            method=method,
-            ip_address=request.remote_addr,
-        )
-        db.session.add(entry)
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
+    login_events.record(user, method, request.remote_addr)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -30,7 +24,7 @@ def login():
             session['user_id'] = user.id
             session['username'] = user.username
             _log_login_event(user, 'password')
-            next_url = request.args.get('next') or url_for('dashboard')
+            next_url = request.args.get('next') or url_for('dashboard.dashboard')
             return redirect(next_url)
         flash('Invalid username or password', 'danger')
     
@@ -67,5 +61,5 @@ def register():
         db.session.commit()
         session['user_id'] = user.id
         session['username'] = user.username
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('dashboard.dashboard'))
     return render_template('register.html')
@@ -1,12 +1,16 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify
 import os
-import requests
-import smtplib
-from email.message import EmailMessage
 from io import BytesIO
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import aliased
 from extensions import db
-from models import Member, Payment, User, Setting
+from blueprints.decorators import login_required, admin_required
+from models import Member, Payment, Setting, OutboundMessage, JobRun
+from outbox import enqueue_messages, drain_outbox, outbox_stats, requeue_dead
+from whatsapp_client import get_whatsapp_client
+from mailer import send_one
+from jobs import JobRunner
 
 communications_bp = Blueprint('communications', __name__)
 
@@ -17,52 +21,40 @@ def get_setting(key, default=None):
 def get_gym_name():
     return get_setting('gym_name', 'Zaidan Fitness')
 
-def login_required(f):
-    from functools import wraps
-    from flask import redirect, url_for
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def admin_required(f):
-    from functools import wraps
-    from flask import redirect, url_for
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        user_id = session.get('user_id')
-        user = db.session.get(User, user_id)
-        if not user or (user.role or 'staff') != 'admin':
-             return jsonify({'ok': False, 'error': 'Admin required'}), 403
-        return f(*args, **kwargs)
-    return decorated_function
-
 # --- WhatsApp Logic ---
 
-def _normalize_phone(phone: str) -> str:
+def _default_country_code() -> str:
+    # Prefer DB setting, fallback to env, default Pakistan '92'
+    return (get_setting('whatsapp_default_country_code') or os.getenv('WHATSAPP_DEFAULT_COUNTRY_CODE') or '92')
+
+def _normalize_phone_cc(phone: str, cc: str) -> str:
     if not phone:
         return ''
     phone = phone.strip()
     if phone.startswith('+'):
         return phone
-    # Prefer DB setting, fallback to env, default Pakistan '92'
-    cc = (get_setting('whatsapp_default_country_code') or os.getenv('WHATSAPP_DEFAULT_COUNTRY_CODE') or '92')
     if cc and not phone.startswith(cc):
         if not cc.startswith('+'):
             cc = '+' + cc
         return cc + phone
     return phone
 
+def _normalize_phone(phone: str) -> str:
+    if not phone:
+        return ''
+    return _normalize_phone_cc(phone, _default_country_code())
+
+def _graph_url(phone_id: str, path: str) -> str:
+    # WHATSAPP_GRAPH_URL lets tests and staging point at a local stand-in
+    base = (os.getenv('WHATSAPP_GRAPH_URL') or 'https://graph.facebook.com/v20.0').rstrip('/')
+    return f"{base}/{phone_id}/{path}"
+
 def send_whatsapp_message(to_phone: str, text: str) -> tuple[bool, str]:
     token = os.getenv('WHATSAPP_TOKEN')
     phone_id = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
     if not token or not phone_id:
         return False, 'WhatsApp configuration missing (token/phone id)'
-    url = f"https://graph.facebook.com/v20.0/{phone_id}/messages"
+    url = _graph_url(phone_id, 'messages')
     headers = {
         'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
@@ -74,7 +66,7 @@ def send_whatsapp_message(to_phone: str, text: str) -> tuple[bool, str]:
         'text': {'preview_url': False, 'body': text}
     }
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=20)
+        r = get_whatsapp_client().post(url, headers=headers, json=payload, timeout=20)
     except Exception as e:
         return False, f"request error: {e}"
     ok = 200 <= r.status_code < 300
@@ -89,7 +81,7 @@ def send_whatsapp_template(to_phone: str, template_name: str, lang_code: str = '
     phone_id = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
     if not token or not phone_id:
         return False, 'WhatsApp configuration missing (token/phone id)'
-    url = f"https://graph.facebook.com/v20.0/{phone_id}/messages"
+    url = _graph_url(phone_id, 'messages')
     headers = {
         'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
@@ -111,7 +103,7 @@ def send_whatsapp_template(to_phone: str, template_name: str, lang_code: str = '
         }
     }
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=20)
+        r = get_whatsapp_client().post(url, headers=headers, json=payload, timeout=20)
     except Exception as e:
         return False, f"request error: {e}"
     ok = 200 <= r.status_code < 300
@@ -121,84 +113,230 @@ def send_whatsapp_template(to_phone: str, template_name: str, lang_code: str = '
         data = {'text': r.text}
     return ok, (data if ok else f"{r.status_code}: {data}")
 
-def send_bulk_text_reminders(year: int, month: int) -> dict:
-    unpaid = Payment.query.filter_by(year=year, month=month, status='Unpaid').all()
-    sent, failed = 0, 0
-    price = (get_setting('monthly_price') or '8')
+def _reminder_key(member_id: int, year: int, month: int, channel: str, day: str) -> str:
+    # One fee reminder per member per channel per billing month per (local) send day;
+    # how often a member hears from us across days is the contact window's job
+    return f"fee-reminder:{channel}:{member_id}:{year}-{month:02d}:{day}"
+
+def _contact_window_hours() -> int:
+    return int(os.getenv('REMINDER_CONTACT_WINDOW_HOURS') or 72)
+
+def reminder_targets(year: int, month: int, contact_window_hours: int | None = None) -> list[dict]:
+    """Members to remind for ``year``/``month``, resolved in one joined select.
+
+    Only active members with an Unpaid row for the month are returned, minus
+    anyone contacted within ``contact_window_hours`` (0 disables the check).
+    ``months_owed`` counts every Unpaid month up to and including this one;
+    ``last_delivery`` is the delivery state of the member's latest WhatsApp
+    message (None if never messaged or no status callback yet).
+    """
+    window = _contact_window_hours() if contact_window_hours is None else contact_window_hours
+    period = year * 12 + month
+    owed = (
+        select(Payment.member_id, func.count().label('months_owed'))
+        .where(Payment.status == 'Unpaid', Payment.year * 12 + Payment.month <= period)
+        .group_by(Payment.member_id)
+        .subquery()
+    )
+    latest = (
+        select(OutboundMessage.member_id, func.max(OutboundMessage.id).label('last_id'))
+        .where(OutboundMessage.channel == 'whatsapp', OutboundMessage.member_id.is_not(None))
+        .group_by(OutboundMessage.member_id)
+        .subquery()
+    )
+    last_msg = aliased(OutboundMessage)
+    q = (
+        select(Member.id, Member.name, Member.phone, Member.email, Member.monthly_fee, owed.c.months_owed,
+               last_msg.delivery_status)
+        .join(Payment, and_(Payment.member_id == Member.id, Payment.year == year,
+                            Payment.month == month, Payment.status == 'Unpaid'))
+        .join(owed, owed.c.member_id == Member.id)
+        .outerjoin(latest, latest.c.member_id == Member.id)
+        .outerjoin(last_msg, last_msg.id == latest.c.last_id)
+        .where(Member.is_active.is_(True))
+        .order_by(Member.id)
+    )
+    if window > 0:
+        cutoff = datetime.utcnow() - timedelta(hours=window)
+        q = q.where(or_(Member.last_contact_at.is_(None), Member.last_contact_at < cutoff))
+
+    cc = _default_country_code()
+    try:
+        default_fee = float(get_setting('monthly_price') or 8)
+    except ValueError:
+        default_fee = 8.0
+    return [
+        {
+            'member_id': row.id,
+            'name': row.name,
+            'phone': _normalize_phone_cc(row.phone or '', cc),
+            'email': row.email,
+            'fee': float(row.monthly_fee or default_fee),
+            'months_owed': int(row.months_owed),
+            'last_delivery': row.delivery_status,
+        }
+        for row in db.session.execute(q)
+    ]
+
+def _spread(n: int, start: datetime, end: datetime) -> list[datetime]:
+    # Evenly spaced send times over [start, end); everything at ``start`` if the window is empty
+    step = max((end - start).total_seconds(), 0) / n if n else 0
+    return [start + timedelta(seconds=i * step) for i in range(n)]
+
+def _queue_reminders(targets: list[dict], build_payload, year: int, month: int, dry_run: bool,
+                     channel: str = 'whatsapp', limit: int | None = None,
+                     window: tuple[datetime, datetime] | None = None) -> dict:
+    """Queue reminders for ``targets`` on the outbox.
+
+    ``limit`` caps how many new messages are queued (members owing the most
+    months go first; the rest are reported as ``deferred``). ``window``
+    (UTC start, end) spreads their send times evenly instead of sending all
+    at once.
+    """
+    field = 'phone' if channel == 'whatsapp' else 'email'
+    reachable = [t for t in targets if t[field]]
+    if channel == 'whatsapp' and os.getenv('REMINDER_SKIP_FAILED_WHATSAPP', '0') not in ('0', 'false', 'False', ''):
+        # Graph reported the last message to this number as failed; don't spend quota on it again
+        reachable = [t for t in reachable if t['last_delivery'] != 'failed']
+    failed = len(targets) - len(reachable)
+    if dry_run:
+        return {"ok": True, "dry_run": True, "targets": targets,
+                "count": len(targets), "reachable": len(reachable), "failed": failed}
+    today = datetime.now().strftime('%Y-%m-%d')
+    deferred = 0
+    if limit is not None:
+        # Already-queued members don't use up the cap
+        keys = [_reminder_key(t['member_id'], year, month, channel, today) for t in reachable]
+        queued = set(db.session.execute(
+            select(OutboundMessage.idempotency_key).where(OutboundMessage.idempotency_key.in_(keys))
+        ).scalars())
+        fresh = [t for t, k in zip(reachable, keys) if k not in queued]
+        fresh.sort(key=lambda t: -t['months_owed'])
+        deferred = max(len(fresh) - max(limit, 0), 0)
+        reachable = fresh[:max(limit, 0)]
+    send_at = _spread(len(reachable), *window) if window else [None] * len(reachable)
+    res = enqueue_messages([{
+        'channel': channel,
+        'recipient': t[field],
+        'payload': build_payload(t),
+        'idempotency_key': _reminder_key(t['member_id'], year, month, channel, today),
+        'member_id': t['member_id'],
+        'next_attempt_at': at,
+    } for t, at in zip(reachable, send_at)])
+    out = {"ok": True, "queued": res['queued'], "duplicates": res['duplicates'], "failed": failed}
+    if limit is not None:
+        out["deferred"] = deferred
+    return out
+
+def send_bulk_text_reminders(year: int, month: int, dry_run: bool = False,
+                             contact_window_hours: int | None = None, **queue_opts) -> dict:
     currency = (get_setting('currency_code') or 'USD')
     gym = get_gym_name()
-    for p in unpaid:
-        member = db.session.get(Member, p.member_id)
-        if not member:
-            continue
-        phone = _normalize_phone(member.phone or '')
-        if not phone:
-            failed += 1
-            continue
-        msg = f"Hi {member.name}, your {gym} fee ({price} {currency}) for {month}/{year} is pending. Please pay to stay active."
-        ok, _ = send_whatsapp_message(phone, msg)
-        if ok:
-            sent += 1
-        else:
-            failed += 1
-    return {"ok": True, "sent": sent, "failed": failed}
-
-def send_bulk_template_reminders(year: int, month: int) -> dict:
+    targets = reminder_targets(year, month, contact_window_hours)
+
+    def build_payload(t):
+        msg = f"Hi {t['name']}, your {gym} fee ({t['fee']:g} {currency}) for {month}/{year} is pending. Please pay to stay active."
+        return {'type': 'text', 'text': msg}
+    return _queue_reminders(targets, build_payload, year, month, dry_run, **queue_opts)
+
+def send_bulk_template_reminders(year: int, month: int, dry_run: bool = False,
+                                 contact_window_hours: int | None = None, **queue_opts) -> dict:
     template_name = os.getenv('WHATSAPP_TEMPLATE_FEE_REMINDER_NAME')
     lang = os.getenv('WHATSAPP_TEMPLATE_LANG', 'en')
     if not template_name:
         return {"ok": False, "error": "WHATSAPP_TEMPLATE_FEE_REMINDER_NAME not set"}
-    unpaid = Payment.query.filter_by(year=year, month=month, status='Unpaid').all()
-    sent, failed = 0, 0
-    for p in unpaid:
-        m = db.session.get(Member, p.member_id)
-        if not m:
-            continue
-        phone = _normalize_phone(m.phone or '')
-        if not phone:
-            failed += 1
-            continue
-        month_name = datetime(year, month, 1).strftime('%B')
-        body_params = [m.name, month_name, str(year)]
-        ok, _ = send_whatsapp_template(phone, template_name, lang, body_params)
-        if ok:
-            sent += 1
-        else:
-            failed += 1
-    return {"ok": True, "sent": sent, "failed": failed}
+    month_name = datetime(year, month, 1).strftime('%B')
+    targets = reminder_targets(year, month, contact_window_hours)
+
+    def build_payload(t):
+        return {'type': 'template', 'template_name': template_name, 'lang_code': lang,
+                'body_params': [t['name'], month_name, str(year)]}
+    return _queue_reminders(targets, build_payload, year, month, dry_run, **queue_opts)
+
+
+def send_bulk_email_reminders(year: int, month: int, dry_run: bool = False,
+                              contact_window_hours: int | None = None) -> dict:
+    currency = (get_setting('currency_code') or 'USD')
+    gym = get_gym_name()
+    month_name = datetime(year, month, 1).strftime('%B')
+    targets = reminder_targets(year, month, contact_window_hours)
+
+    def build_payload(t):
+        body = (f"Hi {t['name']},\n\nYour {gym} fee ({t['fee']:g} {currency}) for {month_name} {year} is pending.")
+        if t['months_owed'] > 1:
+            body += f" You currently have {t['months_owed']} unpaid months."
+        body += f"\nPlease pay to stay active.\n\n{gym}"
+        return {'subject': f"{gym}: fee reminder for {month_name} {year}", 'body': body}
+    return _queue_reminders(targets, build_payload, year, month, dry_run, channel='email')
 
 
 # --- Email Logic ---
 
 def send_email(subject: str, body: str, to_email: str, attachments: list[tuple[str, bytes]]|None=None) -> tuple[bool, str]:
-    host = os.getenv('SMTP_HOST')
-    port = int(os.getenv('SMTP_PORT', '587'))
-    user = os.getenv('SMTP_USER')
-    pwd = os.getenv('SMTP_PASSWORD')
-    use_tls = os.getenv('SMTP_TLS', '1') not in ('0','false','False')
-    if not (host and user and pwd and to_email):
-        return False, 'SMTP config missing (host/user/password or recipient)'
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = user
-    msg['To'] = to_email
-    msg.set_content(body)
-    if attachments:
-        for filename, content in attachments:
-            msg.add_attachment(content, maintype='application', subtype='octet-stream', filename=filename)
+    return send_one(subject, body, to_email, attachments=attachments)
+
+def build_statements(year: int) -> list[dict]:
+    """Per-member payment statement for ``year``, one row per member with an email."""
     try:
-        if use_tls:
-            with smtplib.SMTP(host, port, timeout=30) as s:
-                s.ehlo(); s.starttls(); s.ehlo(); s.login(user, pwd); s.send_message(msg)
-        else:
-            with smtplib.SMTP(host, port, timeout=30) as s:
-                s.login(user, pwd); s.send_message(msg)
-        return True, 'sent'
-    except Exception as e:
-        return False, str(e)
+        default_fee = float(get_setting('monthly_price') or 8)
+    except ValueError:
+        default_fee = 8.0
+    rows = db.session.execute(
+        select(Member.id, Member.name, Member.email, Member.monthly_fee, Payment.month, Payment.status)
+        .join(Payment, Payment.member_id == Member.id)
+        .where(Payment.year == year, Member.is_active.is_(True),
+               Member.email.is_not(None), Member.email != '')
+        .order_by(Member.id, Payment.month)
+    )
+    statements: dict[int, dict] = {}
+    for row in rows:
+        st = statements.setdefault(row.id, {
+            'member_id': row.id, 'name': row.name, 'email': row.email,
+            'fee': float(row.monthly_fee or default_fee), 'months': [],
+        })
+        st['months'].append((row.month, row.status))
+    for st in statements.values():
+        st['unpaid'] = sum(1 for _, status in st['months'] if status == 'Unpaid')
+        st['outstanding'] = st['unpaid'] * st['fee']
+    return list(statements.values())
+
+def send_bulk_email_statements(year: int, dry_run: bool = False) -> dict:
+    currency = (get_setting('currency_code') or 'USD')
+    gym = get_gym_name()
+    statements = build_statements(year)
+    if dry_run:
+        return {"ok": True, "dry_run": True, "count": len(statements),
+                "targets": [{k: st[k] for k in ('member_id', 'name', 'email', 'unpaid', 'outstanding')}
+                            for st in statements]}
+    today = datetime.now().strftime('%Y-%m-%d')
+    messages = []
+    for st in statements:
+        lines = [f"{datetime(year, m, 1).strftime('%B'):<10} {status}" for m, status in st['months']]
+        body = (f"Hi {st['name']},\n\nYour {gym} payment statement for {year}:\n\n" + "\n".join(lines)
+                + f"\n\nOutstanding: {st['outstanding']:g} {currency} ({st['unpaid']} unpaid months)\n\n{gym}")
+        messages.append({
+            'channel': 'email',
+            'recipient': st['email'],
+            'payload': {'subject': f"{gym}: payment statement {year}", 'body': body},
+            # At most one statement per member per year per day
+            'idempotency_key': f"statement:email:{st['member_id']}:{year}:{today}",
+            'member_id': st['member_id'],
+        })
+    res = enqueue_messages(messages)
+    return {"ok": True, "queued": res['queued'], "duplicates": res['duplicates']}
 
 # --- Routes ---
 
+def _remind_options() -> tuple[dict, str | None]:
+    opts = {'dry_run': request.args.get('dry_run') in ('1', 'true', 'True')}
+    window = request.args.get('contact_window_hours')
+    if window not in (None, ''):
+        try:
+            opts['contact_window_hours'] = max(0, int(window))
+        except ValueError:
+            return opts, "invalid contact_window_hours"
+    return opts, None
+
 @communications_bp.route('/api/fees/remind', methods=['POST'])
 @login_required
 def fees_remind():
@@ -207,11 +345,14 @@ def fees_remind():
         month = int(request.args.get('month') or datetime.now().month)
     except ValueError:
         return jsonify({"ok": False, "error": "invalid year/month"}), 400
+    opts, err = _remind_options()
+    if err:
+        return jsonify({"ok": False, "error": err}), 400
     # Determine which method to use from environment
     if os.getenv('WHATSAPP_TEMPLATE_FEE_REMINDER_NAME'):
-         result = send_bulk_template_reminders(year, month)
+         result = send_bulk_template_reminders(year, month, **opts)
     else:
-         result = send_bulk_text_reminders(year, month)
+         result = send_bulk_text_reminders(year, month, **opts)
     return jsonify(result)
 
 @communications_bp.route('/api/fees/remind/template', methods=['POST'])
@@ -222,10 +363,55 @@ def fees_remind_template():
         month = int(request.args.get('month') or datetime.now().month)
     except ValueError:
         return jsonify({"ok": False, "error": "invalid year/month"}), 400
-    result = send_bulk_template_reminders(year, month)
+    opts, err = _remind_options()
+    if err:
+        return jsonify({"ok": False, "error": err}), 400
+    result = send_bulk_template_reminders(year, month, **opts)
     status = 200 if result.get('ok') else 400
     return jsonify(result), status
 
+@communications_bp.route('/api/fees/remind/email', methods=['POST'])
+@login_required
+def fees_remind_email():
+    try:
+        year = int(request.args.get('year') or datetime.now().year)
+        month = int(request.args.get('month') or datetime.now().month)
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid year/month"}), 400
+    opts, err = _remind_options()
+    if err:
+        return jsonify({"ok": False, "error": err}), 400
+    return jsonify(send_bulk_email_reminders(year, month, **opts))
+
+@communications_bp.route('/api/fees/statements/email', methods=['POST'])
+@login_required
+def fees_statements_email():
+    try:
+        year = int(request.args.get('year') or datetime.now().year)
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid year"}), 400
+    dry_run = request.args.get('dry_run') in ('1', 'true', 'True')
+    return jsonify(send_bulk_email_statements(year, dry_run=dry_run))
+
+@communications_bp.route('/api/reminders/plan', methods=['GET'])
+@login_required
+def reminder_plan_view():
+    from reminder_schedule import plan_status
+    day = None
+    if request.args.get('date'):
+        try:
+            day = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({"ok": False, "error": "invalid date"}), 400
+    return jsonify(plan_status(day))
+
+@communications_bp.route('/admin/reminders/plan/run', methods=['POST'])
+@admin_required
+def reminder_plan_run():
+    from reminder_schedule import plan_reminders
+    res = plan_reminders()
+    return jsonify(res), (200 if res.get('ok') else 400)
+
 @communications_bp.route('/admin/schedule/run-now', methods=['POST'])
 @admin_required
 def schedule_run_now():
@@ -236,3 +422,47 @@ def schedule_run_now():
          res = send_bulk_text_reminders(now.year, now.month)
     status = 200 if res.get('ok') else 400
     return jsonify(res), status
+
+@communications_bp.route('/admin/jobs', methods=['GET'])
+@admin_required
+def job_runs_view():
+    try:
+        limit = min(max(int(request.args.get('limit') or 50), 1), 500)
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'invalid limit'}), 400
+    runs = JobRunner(db, JobRun).history(limit=limit, job_name=request.args.get('job') or None)
+    return jsonify({'ok': True, 'runs': runs})
+
+@communications_bp.route('/admin/outbox', methods=['GET'])
+@admin_required
+def outbox_view():
+    dead = (OutboundMessage.query.filter_by(status='dead')
+            .order_by(OutboundMessage.id.desc()).limit(50).all())
+    stats = outbox_stats()
+    stats['dead_letters'] = [{
+        'id': m.id,
+        'channel': m.channel,
+        'recipient': m.recipient,
+        'attempts': m.attempts,
+        'last_error': m.last_error,
+        'created_at': m.created_at.isoformat() if m.created_at else None,
+    } for m in dead]
+    return jsonify({'ok': True, **stats})
+
+@communications_bp.route('/admin/outbox/drain', methods=['POST'])
+@admin_required
+def outbox_drain_now():
+    return jsonify(drain_outbox())
+
+@communications_bp.route('/admin/outbox/<int:message_id>/retry', methods=['POST'])
+@admin_required
+def outbox_retry(message_id):
+    if not requeue_dead(message_id):
+        return jsonify({'ok': False, 'error': 'Not found or not dead-lettered'}), 404
+    return jsonify({'ok': True})
+
+@communications_bp.route('/admin/whatsapp/metrics', methods=['GET'])
+@admin_required
+def whatsapp_metrics():
+    client = get_whatsapp_client()
+    return jsonify({'ok': True, 'pool_size': client.pool_size, 'latency': client.latency.snapshot()})
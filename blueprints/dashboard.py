@@ -1,20 +1,12 @@
-from flask import Blueprint, render_template, session, redirect, url_for, jsonify, request
+from flask import Blueprint, render_template, jsonify, request
 from extensions import db
+from blueprints.decorators import login_required
 from models import Member, Payment, User, AuditLog, Setting, Sale, SaleItem
 from datetime import datetime
 from sqlalchemy import func
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-def login_required(f):
-    from functools import wraps
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
 @dashboard_bp.route('/dashboard')
 @login_required
 def dashboard():
@@ -0,0 +1,34 @@
+"""Auth decorators shared by every blueprint.
+
+Roles come from ``role_cache``, so an admin check costs no query once the
+user has been seen.
+"""
+from functools import wraps
+
+from flask import session, redirect, url_for, jsonify
+
+from extensions import db
+from models import User
+from role_cache import RoleCache
+
+role_cache = RoleCache(db, User)
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return redirect(url_for('auth.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return redirect(url_for('auth.login'))
+        if not role_cache.is_admin(session.get('user_id')):
+            return jsonify({'ok': False, 'error': 'Admin required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
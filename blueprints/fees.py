@@ -1,21 +1,12 @@
-from flask import Blueprint, render_template, request, jsonify, session, url_for
+from flask import Blueprint, render_template, request, jsonify, url_for
 from extensions import db
+from blueprints.decorators import login_required
 from models import Member, Payment, PaymentTransaction, Setting
 from datetime import datetime
 from sqlalchemy import func
 
 fees_bp = Blueprint('fees', __name__)
 
-def login_required(f):
-    from functools import wraps
-    from flask import redirect, url_for
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
 def get_setting(key, default=None):
     s = Setting.query.filter_by(key=key).first()
     return s.value if s else default
@@ -1,20 +1,17 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, Response, render_template, request, jsonify, session
 from extensions import db
+from blueprints.decorators import login_required, admin_required
 from models import Product
-from datetime import datetime
+from catalog import current_version, snapshot, stock_levels, touch_products
+from product_search import find_by_sku, search_products
+from low_stock import refresh as refresh_low_stock, low_stock, send_digest
+from product_import import read_table, import_products, change_prices
+from stock_ledger import record_movements, valuation, audit, take_snapshot, ADJUSTMENT_REASONS, REASON_INITIAL, REASON_ADJUSTMENT
+from datetime import date, datetime, timedelta
+from sqlalchemy import null
 
 inventory_bp = Blueprint('inventory', __name__)
 
-def login_required(f):
-    from functools import wraps
-    from flask import session, redirect, url_for
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
 @inventory_bp.route('/products')
 @login_required
 def index():
@@ -24,14 +21,67 @@ def index():
 @login_required
 def list_products():
     q = request.args.get('search', '').lower().strip()
-    query = Product.query.filter_by(is_active=True)
-    
     if q:
-        query = query.filter(Product.name.ilike(f'%{q}%') | Product.sku.ilike(f'%{q}%'))
-        
-    products = query.order_by(Product.name).all()
+        # Every match by default (the inventory screen doesn't page); callers may cap it
+        limit = request.args.get('limit', type=int)
+        products = search_products(q, limit=min(max(limit, 1), 200) if limit else None)
+    else:
+        products = Product.query.filter_by(is_active=True).order_by(Product.name).all()
     return jsonify([p.to_dict() for p in products])
 
+@inventory_bp.route('/api/products/sku/<path:sku>', methods=['GET'])
+@login_required
+def product_by_sku(sku):
+    # Barcode scans: exact match on the unique sku index, no fuzzy search
+    p = find_by_sku(sku)
+    if not p: return jsonify({'error': 'Not found'}), 404
+    return jsonify(p.to_dict())
+
+@inventory_bp.route('/api/products/catalog', methods=['GET'])
+@login_required
+def catalog_snapshot():
+    """Active products with the catalog version, for tills that cache locally.
+
+    ``?since_version=N`` returns only products changed after N plus the ids
+    deactivated since. The ETag is the version, so an unchanged catalog
+    costs one primary-key lookup and a 304.
+    """
+    since = request.args.get('since_version', type=int)
+    etag = f'catalog-{current_version()}'
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = jsonify(snapshot(since))
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+@inventory_bp.route('/api/products/stock', methods=['GET'])
+@login_required
+def product_stock():
+    # Sales don't bump the catalog version, so tills poll stock separately
+    return jsonify({'stock': stock_levels()})
+
+def _reorder_level(value):
+    # Blank or null turns low-stock alerts off; null() so an insert doesn't fall back to the column default
+    return null() if value in (None, '') else int(value)
+
+@inventory_bp.route('/api/products/low-stock', methods=['GET'])
+@login_required
+def low_stock_products():
+    alerts = low_stock()
+    return jsonify({'count': len(alerts), 'products': alerts})
+
+@inventory_bp.route('/api/products/low-stock/notify', methods=['POST'])
+@login_required
+def low_stock_notify():
+    # Same digest the scheduler sends, on demand
+    try:
+        return jsonify({'ok': True, **send_digest()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
 @inventory_bp.route('/api/products', methods=['POST'])
 @login_required
 def add_product():
@@ -43,27 +93,77 @@ def add_product():
             stock=int(data.get('stock', 0)),
             category=data.get('category'),
             sku=data.get('sku'),
+            reorder_level=_reorder_level(data.get('reorder_level', 5)),
             is_active=True
         )
         db.session.add(p)
+        db.session.flush()
+        touch_products([p.id])
+        record_movements([{'product_id': p.id, 'delta': p.stock, 'reason': REASON_INITIAL,
+                           'ref': f"user:{session.get('user_id')}"}])
+        refresh_low_stock([p.id])
         db.session.commit()
         return jsonify(p.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@inventory_bp.route('/api/products/import', methods=['POST'])
+@login_required
+def import_products_file():
+    """Upsert products by SKU from a CSV/XLSX upload."""
+    f = request.files.get('file')
+    if not f:
+        return jsonify({'ok': False, 'error': 'No file uploaded'}), 400
+    try:
+        df = read_table(f, f.filename)
+    except Exception as e:
+        return jsonify({'ok': False, 'error': f'Failed to parse file: {e}'}), 400
+    try:
+        return jsonify(import_products(df, session.get('user_id')))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'ok': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'ok': False, 'error': str(e)}), 500
+
+@inventory_bp.route('/api/products/bulk-price', methods=['POST'])
+@login_required
+def bulk_price():
+    """``{"mode": "percent"|"absolute", "value": 10, "category": "Drinks"}``"""
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(change_prices(data.get('mode'), float(data.get('value')), data.get('category')))
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
 @inventory_bp.route('/api/products/<int:id>', methods=['PUT'])
 @login_required
 def update_product(id):
-    p = db.session.get(Product, id)
+    # Locked: the ledger delta must be taken against the stock being replaced
+    p = db.session.get(Product, id, with_for_update=True)
     if not p: return jsonify({'error': 'Not found'}), 404
     data = request.json
+    reason = data.get('stock_reason') or REASON_ADJUSTMENT
+    if reason not in ADJUSTMENT_REASONS:
+        db.session.rollback()
+        return jsonify({'error': f'stock_reason must be one of {list(ADJUSTMENT_REASONS)}'}), 400
     
     if 'name' in data: p.name = data['name']
     if 'price' in data: p.price = float(data['price'])
-    if 'stock' in data: p.stock = int(data['stock'])
+    if 'stock' in data:
+        new_stock = int(data['stock'])
+        record_movements([{'product_id': p.id, 'delta': new_stock - p.stock, 'reason': reason,
+                           'ref': f"user:{session.get('user_id')}"}])
+        p.stock = new_stock
     if 'category' in data: p.category = data['category']
     if 'sku' in data: p.sku = data['sku']
+    if 'reorder_level' in data: p.reorder_level = _reorder_level(data['reorder_level'])
     
+    touch_products([p.id])
+    db.session.flush()
+    refresh_low_stock([p.id])
     db.session.commit()
     return jsonify(p.to_dict())
 
@@ -73,5 +173,49 @@ def delete_product(id):
     p = db.session.get(Product, id)
     if not p: return jsonify({'error': 'Not found'}), 404
     p.is_active = False # Soft delete
+    touch_products([p.id])
+    db.session.flush()
+    refresh_low_stock([p.id])
     db.session.commit()
     return jsonify({'ok': True})
+
+def _ledger_day(value) -> date:
+    return date.fromisoformat(value) if value else date.today()
+
+@inventory_bp.route('/api/inventory/stock', methods=['GET'])
+@login_required
+def stock_on_date():
+    """Stock and its value at the end of ``?date=`` (default today)."""
+    try:
+        day = _ledger_day(request.args.get('date'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(valuation(day))
+
+@inventory_bp.route('/api/inventory/audit', methods=['GET'])
+@login_required
+def stock_audit():
+    """Opening/closing stock, movements and shrinkage; defaults to the month so far."""
+    try:
+        end = _ledger_day(request.args.get('to'))
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end.replace(day=1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start > end:
+        return jsonify({'error': 'from is after to'}), 400
+    return jsonify(audit(start, end))
+
+@inventory_bp.route('/api/inventory/snapshot', methods=['POST'])
+@admin_required
+def stock_snapshot():
+    # The nightly job snapshots yesterday; this backfills or repeats a day by hand
+    data = request.get_json(silent=True) or {}
+    try:
+        day = date.fromisoformat(data['date']) if data.get('date') else date.today() - timedelta(days=1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(take_snapshot(day))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
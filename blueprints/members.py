@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, request, jsonify, session
+from flask import Blueprint, render_template, request, jsonify
 from extensions import db
-from models import Member, Payment, Setting, PaymentTransaction
+from blueprints.decorators import login_required
+from models import Member, Payment, Setting, PaymentTransaction, ChurnScore
 from datetime import datetime
 import os
 import secrets
@@ -20,16 +21,6 @@ except ImportError:
 
 members_bp = Blueprint('members', __name__)
 
-def login_required(f):
-    from functools import wraps
-    from flask import redirect, url_for
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
 @members_bp.route('/members')
 @login_required
 def index():
@@ -57,6 +48,7 @@ def list_members():
     status = request.args.get('status')
     active = request.args.get('active')
     training = request.args.get('training_type')
+    sort = request.args.get('sort')
     
     query = Member.query
     
@@ -67,11 +59,18 @@ def list_members():
     if training:
         query = query.filter(Member.training_type == training)
         
-    members = query.all()
+    if sort == 'churn_risk':
+        # Ranked call list: scores come precomputed from the nightly churn job
+        rows = (query.outerjoin(ChurnScore, ChurnScore.member_id == Member.id)
+                .add_columns(ChurnScore.score)
+                .order_by(ChurnScore.score.is_(None), ChurnScore.score.desc(), Member.id)
+                .all())
+    else:
+        rows = [(m, None) for m in query.all()]
     
     # Filter in python for complex logic or search
     results = []
-    for m in members:
+    for m, churn_risk in rows:
         if q:
             if q not in m.name.lower() and q not in (m.phone or '') and q != str(m.id):
                 continue
@@ -80,6 +79,8 @@ def list_members():
         m_dict = m.to_dict()
         if status and m_dict['current_fee_status'] != status:
             continue
+        if sort == 'churn_risk':
+            m_dict['churn_risk'] = churn_risk
             
         results.append(m_dict)
         
@@ -1,26 +1,67 @@
 from flask import Blueprint, render_template, request, jsonify, session
 from extensions import db
-from models import Sale, SaleItem, Product, User
-from datetime import datetime
+from blueprints.decorators import login_required, admin_required
+from models import Sale, SaleItem, Product, User, InvoiceSequence
+from invoice_sequence import next_invoice_number, next_invoice_numbers
+from sales_rollup import record_sales, rebuild as rebuild_rollups, sales_report
+from stock_ledger import record_movements, REASON_SALE, REASON_OVERSOLD
+from low_stock import refresh as refresh_low_stock
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, update, case, bindparam, or_, and_, func
+from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError
+import os
 import secrets
 
 pos_bp = Blueprint('pos', __name__)
 
-def login_required(f):
-    from functools import wraps
-    from flask import redirect, url_for
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
 @pos_bp.route('/pos')
 @login_required
 def index():
     return render_template('pos.html')
 
+class CheckoutError(Exception):
+    pass
+
+def _cart_quantities(items) -> dict[int, int]:
+    # Merge repeated lines for the same product so each gets one stock update
+    qty_by_product: dict[int, int] = {}
+    for item in items:
+        try:
+            pid = int(item['product_id'])
+            qty = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError('Invalid cart item')
+        if qty <= 0:
+            raise CheckoutError('Quantity must be positive')
+        qty_by_product[pid] = qty_by_product.get(pid, 0) + qty
+    return qty_by_product
+
+def _reserve_stock(qty_by_product: dict[int, int]) -> dict[int, Product]:
+    """Load the cart's products in one query and decrement their stock.
+
+    Each decrement is a conditional UPDATE (``stock >= qty``), so two
+    terminals selling the last unit cannot both succeed. Rows are updated in
+    id order to keep lock order consistent across concurrent checkouts.
+    """
+    products = {p.id: p for p in db.session.execute(
+        select(Product).where(Product.id.in_(qty_by_product))
+    ).scalars()}
+    missing = set(qty_by_product) - set(products)
+    if missing:
+        raise CheckoutError(f'Unknown product id(s): {sorted(missing)}')
+    for pid in sorted(qty_by_product):
+        qty = qty_by_product[pid]
+        res = db.session.execute(
+            update(Product)
+            .where(Product.id == pid, Product.stock >= qty)
+            .values(stock=Product.stock - qty)
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount != 1:
+            raise CheckoutError(f'Insufficient stock for {products[pid].name}')
+    return products
+
 @pos_bp.route('/api/pos/checkout', methods=['POST'])
 @login_required
 def checkout():
@@ -30,23 +71,15 @@ def checkout():
         return jsonify({'error': 'No items'}), 400
         
     try:
-        # Calculate totals and verify stock
+        qty_by_product = _cart_quantities(items)
+        products = _reserve_stock(qty_by_product)
+
         subtotal = 0.0
         sale_items = []
-        
-        for item in items:
-            product = db.session.get(Product, item['product_id'])
-            if not product:
-                continue
-            
-            qty = int(item['quantity'])
-            if product.stock < qty:
-                return jsonify({'error': f'Insufficient stock for {product.name}'}), 400
-                
-            product.stock -= qty
+        for pid, qty in qty_by_product.items():
+            product = products[pid]
             line_total = product.price * qty
             subtotal += line_total
-            
             sale_items.append(SaleItem(
                 product_id=product.id,
                 name=product.name,
@@ -59,7 +92,8 @@ def checkout():
         discount = float(data.get('discount', 0))
         total = subtotal + tax - discount
         
-        invoice_number = f"INV-{datetime.now().strftime('%Y%m%d')}-{secrets.token_hex(3).upper()}"
+        # Allocated inside the checkout transaction, so a failed sale gives its number back
+        invoice_number = next_invoice_number(db, InvoiceSequence)
         
         sale = Sale(
             invoice_number=invoice_number,
@@ -73,23 +107,311 @@ def checkout():
             verification_hash=secrets.token_hex(16)
         )
         
+        sale.items = sale_items
         db.session.add(sale)
-        db.session.commit() # Commit to get sale ID
-        
-        for si in sale_items:
-            si.sale_id = sale.id
-            db.session.add(si)
-            
+        db.session.flush()  # assigns sale.id inside the same transaction
+        record_sales([sale])
+        record_movements({'product_id': pid, 'delta': -qty, 'reason': REASON_SALE, 'ref': invoice_number}
+                         for pid, qty in qty_by_product.items())
+        refresh_low_stock(qty_by_product)
+        # Stock, ledger, sale, items and report rollups commit together or not at all
         db.session.commit()
         
-        return jsonify({'ok': True, 'invoice_number': invoice_number, 'sale_id': sale.id})
+        # Sales don't bump the catalog version; the till updates its cached stock from this
+        stock = dict(db.session.execute(
+            select(Product.id, Product.stock).where(Product.id.in_(qty_by_product))
+        ).all())
+        return jsonify({'ok': True, 'invoice_number': invoice_number, 'sale_id': sale.id, 'stock': stock})
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+def _offline_order(order: dict) -> dict:
+    """Validate one queued offline order; raises CheckoutError."""
+    lines = []
+    for item in order.get('items') or []:
+        try:
+            pid = int(item.get('product_id') or item['id'])
+            qty = int(item.get('quantity', 1))
+            price = item.get('price', item.get('unit_price'))
+            price = float(price) if price not in (None, '') else None
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError('Invalid cart item')
+        if qty <= 0:
+            raise CheckoutError('Quantity must be positive')
+        lines.append({'product_id': pid, 'quantity': qty, 'price': price, 'name': item.get('name')})
+    if not lines:
+        raise CheckoutError('No items')
+    try:
+        tax = float(order.get('tax') or 0)
+        discount = float(order.get('discount') or 0)
+    except (TypeError, ValueError):
+        raise CheckoutError('Invalid tax or discount')
+    created_at = None
+    if order.get('created_at'):
+        try:
+            created_at = datetime.fromisoformat(str(order['created_at']).replace('Z', '+00:00'))
+        except ValueError:
+            raise CheckoutError('Invalid created_at')
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        'client_ref': str(order.get('client_id') or order.get('client_ref') or '')[:64] or None,
+        'invoice_number': (order.get('invoice_number') or '').strip()[:32] or None,
+        'lines': lines,
+        'tax': tax,
+        'discount': discount,
+        'customer_name': (order.get('customer_name') or '').strip() or None,
+        'payment_method': (order.get('payment_method') or 'cash').lower(),
+        'created_at': created_at,
+    }
+
+def _sync_offline_orders(orders: list, user_id) -> list[dict]:
+    """Insert a batch of offline sales in one transaction.
+
+    Orders already stored (same ``client_id`` or invoice number) or repeated
+    within the batch come back as ``duplicate``; invalid ones as ``rejected``.
+    The sale already happened at the till, so stock is never a reason to
+    reject: each product gets one aggregated decrement, floored at zero.
+    Whatever the floor cut off goes to the ledger as an ``oversold``
+    movement, so the ledger still sums to the stored stock.
+    """
+    results: list[dict | None] = [None] * len(orders)
+    accepted = []
+    for i, raw in enumerate(orders):
+        try:
+            accepted.append((i, _offline_order(raw if isinstance(raw, dict) else {})))
+        except CheckoutError as e:
+            results[i] = {'index': i, 'status': 'rejected', 'error': str(e)}
+
+    refs = {o['client_ref'] for _, o in accepted if o['client_ref']}
+    invoices = {o['invoice_number'] for _, o in accepted if o['invoice_number']}
+    existing_ref, existing_inv = {}, {}
+    if refs or invoices:
+        for sid, ref, inv in db.session.execute(
+            select(Sale.id, Sale.client_ref, Sale.invoice_number)
+            .where(or_(Sale.client_ref.in_(refs), Sale.invoice_number.in_(invoices)))
+        ):
+            if ref:
+                existing_ref[ref] = (sid, inv)
+            existing_inv[inv] = (sid, inv)
+
+    product_ids = {line['product_id'] for _, o in accepted for line in o['lines']}
+    # Locked so the stock read here is the stock the decrement below applies to
+    products = {p.id: p for p in db.session.execute(
+        select(Product).where(Product.id.in_(product_ids)).with_for_update()
+    ).scalars()} if product_ids else {}
+
+    fresh = []
+    seen_refs, seen_invoices = set(), set()
+    for i, o in accepted:
+        ref, inv = o['client_ref'], o['invoice_number']
+        hit = existing_ref.get(ref) if ref else None
+        hit = hit or (existing_inv.get(inv) if inv else None)
+        if hit or (ref and ref in seen_refs) or (inv and inv in seen_invoices):
+            results[i] = {'index': i, 'client_id': ref, 'status': 'duplicate',
+                          'sale_id': hit[0] if hit else None, 'invoice_number': hit[1] if hit else inv}
+            continue
+        missing = sorted({line['product_id'] for line in o['lines']} - set(products))
+        if missing:
+            results[i] = {'index': i, 'client_id': ref, 'status': 'rejected',
+                          'error': f'Unknown product id(s): {missing}'}
+            continue
+        seen_refs.add(ref)
+        seen_invoices.add(inv)
+        fresh.append((i, o))
+
+    if fresh:
+        # One block of invoice numbers for every order the terminal did not number itself
+        need = sum(1 for _, o in fresh if not o['invoice_number'])
+        numbers = iter(next_invoice_numbers(db, InvoiceSequence, need) if need else [])
+        qty_by_product: dict[int, int] = {}
+        sales = []
+        movements = []
+        for i, o in fresh:
+            sale_items = []
+            subtotal = 0.0
+            for line in o['lines']:
+                product = products[line['product_id']]
+                price = product.price if line['price'] is None else line['price']
+                subtotal += price * line['quantity']
+                qty_by_product[product.id] = qty_by_product.get(product.id, 0) + line['quantity']
+                sale_items.append(SaleItem(product_id=product.id, name=line['name'] or product.name,
+                                           quantity=line['quantity'], unit_price=price,
+                                           total_price=price * line['quantity']))
+            invoice_number = o['invoice_number'] or next(numbers)
+            movements.extend({'product_id': item.product_id, 'delta': -item.quantity,
+                              'reason': REASON_SALE, 'ref': invoice_number} for item in sale_items)
+            sale = Sale(
+                invoice_number=invoice_number,
+                client_ref=o['client_ref'],
+                customer_name=o['customer_name'],
+                subtotal=subtotal,
+                tax=o['tax'],
+                discount=o['discount'],
+                total=subtotal + o['tax'] - o['discount'],
+                payment_method=o['payment_method'],
+                channel='offline',
+                user_id=user_id,
+                verification_hash=secrets.token_hex(16),
+                synced_from_offline=True,
+                created_at=o['created_at'] or datetime.utcnow(),
+                items=sale_items,
+            )
+            sales.append((i, sale))
+        db.session.add_all([sale for _, sale in sales])
+
+        stock = Product.__table__.c.stock
+        db.session.execute(
+            update(Product.__table__)
+            .where(Product.__table__.c.id == bindparam('pid'))
+            .values(stock=case((stock >= bindparam('qty'), stock - bindparam('qty')), else_=0)),
+            [{'pid': pid, 'qty': qty} for pid, qty in sorted(qty_by_product.items())],
+        )
+        for pid, qty in qty_by_product.items():
+            before = products[pid].stock
+            cut_off = (before - qty if before >= qty else 0) - (before - qty)
+            movements.append({'product_id': pid, 'delta': cut_off, 'reason': REASON_OVERSOLD, 'ref': 'offline-sync'})
+        db.session.flush()
+        record_sales([sale for _, sale in sales])
+        record_movements(movements)
+        refresh_low_stock(qty_by_product)
+        for i, sale in sales:
+            results[i] = {'index': i, 'client_id': sale.client_ref, 'status': 'created',
+                          'sale_id': sale.id, 'invoice_number': sale.invoice_number}
+    db.session.commit()
+    return results
+
+@pos_bp.route('/api/offline-sync', methods=['POST'])
+@login_required
+def offline_sync():
+    data = request.get_json(silent=True) or {}
+    orders = data.get('orders') or data.get('sales') or []
+    if not isinstance(orders, list) or not orders:
+        return jsonify({'error': 'No orders'}), 400
+    max_batch = int(os.getenv('OFFLINE_SYNC_MAX_BATCH') or 1000)
+    if len(orders) > max_batch:
+        return jsonify({'error': f'At most {max_batch} orders per sync'}), 413
+
+    for attempt in range(2):
+        try:
+            results = _sync_offline_orders(orders, session.get('user_id'))
+            break
+        except IntegrityError:
+            # Another terminal synced some of the same orders concurrently; the retry sees them as duplicates
+            db.session.rollback()
+            if attempt:
+                return jsonify({'error': 'Sync conflict, please retry'}), 409
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+
+    counts = {status: sum(1 for r in results if r['status'] == status)
+              for status in ('created', 'duplicate', 'rejected')}
+    return jsonify({'ok': True, **counts, 'results': results})
+
+SALES_PAGE_SIZE = 50
+SALES_MAX_PAGE_SIZE = 200
+
+def _sales_cursor(sale: Sale) -> str:
+    return f"{sale.created_at.isoformat()}|{sale.id}"
+
+def _sales_filters(args) -> list:
+    """Translate query-string filters into WHERE clauses; raises ValueError."""
+    clauses = []
+    if args.get('from'):
+        clauses.append(Sale.created_at >= datetime.fromisoformat(args['from']))
+    if args.get('to'):
+        # A bare date means the whole day
+        to = datetime.fromisoformat(args['to'])
+        clauses.append(Sale.created_at < to + timedelta(days=1) if len(args['to']) == 10 else Sale.created_at <= to)
+    if args.get('method'):
+        clauses.append(Sale.payment_method == args['method'].lower())
+    if args.get('user_id'):
+        clauses.append(Sale.user_id == int(args['user_id']))
+    if args.get('channel'):
+        clauses.append(Sale.channel == args['channel'])
+    return clauses
+
 @pos_bp.route('/api/sales', methods=['GET'])
 @login_required
 def list_sales():
-    sales = Sale.query.order_by(Sale.created_at.desc()).limit(50).all()
-    return jsonify([s.to_dict() for s in sales])
+    """Newest-first sales, one keyset page at a time.
+
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page;
+    it seeks on the (created_at, id) index, so deep pages cost the same as
+    the first. Items are loaded with one extra IN query per page.
+    ``summary=1`` returns count and totals for the filtered range instead.
+    """
+    args = request.args
+    try:
+        clauses = _sales_filters(args)
+        limit = min(max(int(args.get('limit') or SALES_PAGE_SIZE), 1), SALES_MAX_PAGE_SIZE)
+        cursor = None
+        if args.get('cursor'):
+            ts, _, sid = args['cursor'].rpartition('|')
+            cursor = (datetime.fromisoformat(ts), int(sid))
+    except ValueError:
+        return jsonify({'error': 'Invalid filter or cursor'}), 400
+
+    if args.get('summary') in ('1', 'true'):
+        rows = db.session.execute(
+            select(Sale.payment_method, func.count(Sale.id), func.coalesce(func.sum(Sale.total), 0.0))
+            .where(*clauses)
+            .group_by(Sale.payment_method)
+        ).all()
+        return jsonify({
+            'count': sum(r[1] for r in rows),
+            'total': round(sum(float(r[2]) for r in rows), 2),
+            'by_method': {(r[0] or ''): {'count': r[1], 'total': round(float(r[2]), 2)} for r in rows},
+        })
+
+    include_items = args.get('items', '1') not in ('0', 'false')
+    stmt = select(Sale).where(*clauses)
+    if cursor:
+        stmt = stmt.where(or_(Sale.created_at < cursor[0],
+                              and_(Sale.created_at == cursor[0], Sale.id < cursor[1])))
+    if include_items:
+        stmt = stmt.options(selectinload(Sale.items))
+    # One extra row tells us whether another page exists
+    sales = db.session.execute(
+        stmt.order_by(Sale.created_at.desc(), Sale.id.desc()).limit(limit + 1)
+    ).scalars().all()
+    page = sales[:limit]
+    return jsonify({
+        'sales': [s.to_dict(include_items=include_items) for s in page],
+        'next_cursor': _sales_cursor(page[-1]) if len(sales) > limit else None,
+    })
+
+def _report_range(args) -> tuple:
+    """``from``/``to`` as local dates, defaulting to the last 30 days."""
+    end = date.fromisoformat(args['to']) if args.get('to') else date.today()
+    start = date.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=29)
+    if start > end:
+        raise ValueError('from is after to')
+    return start, end
+
+@pos_bp.route('/api/pos/reports', methods=['GET'])
+@login_required
+def reports():
+    try:
+        start, end = _report_range(request.args)
+        top = min(max(int(request.args.get('top') or 10), 1), 100)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(sales_report(start, end, top))
+
+@pos_bp.route('/api/pos/reports/rebuild', methods=['POST'])
+@admin_required
+def reports_rebuild():
+    # Backfill or repair the rollups from the raw sales of a date range
+    try:
+        start, end = _report_range(request.get_json(silent=True) or request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(rebuild_rollups(start, end))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
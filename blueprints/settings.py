@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from extensions import db
+from blueprints.decorators import login_required
 from models import Setting
 
 settings_bp = Blueprint('settings', __name__)
@@ -18,6 +19,7 @@ def set_setting(key, value):
     db.session.commit()
 
 @settings_bp.route('/settings', methods=['GET', 'POST'])
+@login_required
 def index():
     if request.method == 'POST':
         gym_name = request.form.get('gym_name')
@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify
+import hashlib
+import hmac
+import os
+from delivery_status import parse_graph_statuses, status_buffer
+
+webhooks_bp = Blueprint('webhooks', __name__)
+
+def _valid_signature(body: bytes, header: str | None) -> bool:
+    secret = os.getenv('WHATSAPP_APP_SECRET')
+    if not secret:
+        # Unsigned callbacks could forge delivery failures and suppress reminders;
+        # only accept them when explicitly allowed for local debugging
+        return os.getenv('WHATSAPP_WEBHOOK_ALLOW_UNSIGNED', '0') in ('1', 'true', 'True')
+    if not header or not header.startswith('sha256='):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, header[len('sha256='):])
+
+@webhooks_bp.route('/webhooks/whatsapp', methods=['GET'])
+def whatsapp_verify():
+    # Meta's subscription handshake
+    token = os.getenv('WHATSAPP_VERIFY_TOKEN')
+    if (request.args.get('hub.mode') == 'subscribe' and token
+            and hmac.compare_digest(request.args.get('hub.verify_token') or '', token)):
+        return request.args.get('hub.challenge') or '', 200
+    return 'Forbidden', 403
+
+@webhooks_bp.route('/webhooks/whatsapp', methods=['POST'])
+def whatsapp_callback():
+    body = request.get_data()
+    if not _valid_signature(body, request.headers.get('X-Hub-Signature-256')):
+        return jsonify({'ok': False, 'error': 'bad signature'}), 403
+    events = parse_graph_statuses(request.get_json(silent=True) or {})
+    if events:
+        # Written by the background flusher; acknowledge straight away
+        status_buffer.add(events)
+    return jsonify({'ok': True, 'buffered': len(events)})
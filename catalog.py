@@ -0,0 +1,98 @@
+"""Versioned product catalog for POS clients.
+
+Every edit that changes what a till shows (name, price, category, sku,
+active flag, manual stock adjustments) calls ``touch_products`` in its own
+transaction (or ``touch_where`` for set-based updates such as bulk price
+changes). That bumps the single ``catalog_version`` counter and stamps the
+new value on the changed products. The counter row stays locked until the
+transaction commits, so versions become visible in commit order and a
+client that holds version N can safely ask for "everything stamped after N".
+
+Sales do not bump the version: that would serialise every checkout on the
+counter row and make every till reload its cached catalog after each sale
+anywhere. Tills take stock from the checkout response and from
+``stock_levels`` instead.
+
+``snapshot`` returns either the full active catalog or, given
+``since_version``, only the products changed since then plus the ids that
+were deactivated.
+"""
+from sqlalchemy import select, update
+
+from extensions import db, upsert_insert
+from models import CatalogVersion, Product
+
+_ROW_ID = 1
+
+
+def current_version() -> int:
+    return db.session.execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == _ROW_ID)
+    ).scalar() or 0
+
+
+def _bump() -> int:
+    table = CatalogVersion.__table__
+    stmt = upsert_insert(table)
+    if stmt is not None:
+        stmt = (
+            stmt.values(id=_ROW_ID, version=1)
+            .on_conflict_do_update(index_elements=['id'], set_={'version': table.c.version + 1})
+            .returning(table.c.version)
+        )
+        return db.session.execute(stmt).scalar_one()
+    res = db.session.execute(update(table).where(table.c.id == _ROW_ID).values(version=table.c.version + 1))
+    if res.rowcount == 0:
+        db.session.execute(table.insert().values(id=_ROW_ID, version=1))
+        return 1
+    return current_version()
+
+
+def touch_products(product_ids) -> int | None:
+    """Stamp the given products with a new catalog version; caller commits."""
+    ids = sorted(set(product_ids))
+    if not ids:
+        return None
+    version = _bump()
+    db.session.execute(
+        update(Product).where(Product.id.in_(ids)).values(catalog_version=version)
+        .execution_options(synchronize_session=False)
+    )
+    return version
+
+
+def snapshot(since_version: int | None = None) -> dict:
+    version = current_version()
+    # A client ahead of the server (e.g. after a restore) gets a full reload
+    full = since_version is None or since_version > version
+    stmt = select(Product).order_by(Product.name, Product.id)
+    if full:
+        stmt = stmt.where(Product.is_active.is_(True))
+    else:
+        stmt = stmt.where(Product.catalog_version > since_version)
+    rows = db.session.execute(stmt).scalars().all()
+    return {
+        'version': version,
+        'full': full,
+        'products': [p.to_dict() for p in rows if p.is_active],
+        'removed': [] if full else [p.id for p in rows if not p.is_active],
+    }
+
+
+def stock_levels() -> dict[int, int]:
+    """Current stock of every active product, read without touching the version."""
+    return dict(db.session.execute(
+        select(Product.id, Product.stock).where(Product.is_active.is_(True))
+    ).all())
+
+
+def touch_where(*criteria, **values) -> int:
+    """Set ``values`` on every product matching ``criteria`` and stamp them in one UPDATE; caller commits.
+
+    Returns the number of products changed.
+    """
+    version = _bump()
+    return db.session.execute(
+        update(Product).where(*criteria).values(catalog_version=version, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
@@ -0,0 +1,111 @@
+"""WhatsApp delivery-status ingestion.
+
+The webhook only parses the callback and appends it to an in-memory
+``StatusBuffer``; a background thread writes the buffer out every
+``WHATSAPP_STATUS_FLUSH_SECONDS`` or as soon as ``WHATSAPP_STATUS_FLUSH_SIZE``
+events are waiting. Each flush is one multi-row insert into
+``message_status`` plus one UPDATE per status on ``outbound_message``, so a
+burst of callbacks costs a handful of statements instead of a commit each.
+Events still buffered when a worker is killed are lost; the outbox row then
+simply keeps its previous delivery state.
+"""
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, update, select, or_
+
+from batch_buffer import BatchBuffer
+from extensions import db, upsert_insert
+from models import MessageStatus, OutboundMessage
+
+# Later states win; 'failed' can follow any of them
+STATUS_ORDER = ('sent', 'delivered', 'read', 'failed')
+_PRECEDING = {
+    'sent': (),
+    'delivered': ('sent',),
+    'read': ('sent', 'delivered'),
+    'failed': ('sent', 'delivered', 'read'),
+}
+
+
+def parse_graph_statuses(payload: dict) -> list[dict]:
+    """Flatten a Graph webhook body into ``message_status`` rows."""
+    events = []
+    for entry in (payload or {}).get('entry') or []:
+        for change in entry.get('changes') or []:
+            for st in (change.get('value') or {}).get('statuses') or []:
+                status = st.get('status')
+                if not st.get('id') or status not in STATUS_ORDER:
+                    continue
+                err = (st.get('errors') or [{}])[0]
+                try:
+                    occurred = datetime.fromtimestamp(int(st.get('timestamp')), timezone.utc).replace(tzinfo=None)
+                except (TypeError, ValueError):
+                    occurred = None
+                events.append({
+                    'provider_message_id': st['id'][:128],
+                    'status': status,
+                    'recipient': (st.get('recipient_id') or '')[:32] or None,
+                    'occurred_at': occurred,
+                    'error_code': err.get('code'),
+                    'error_title': (err.get('title') or '')[:255] or None,
+                })
+    return events
+
+
+def _insert_ignoring_duplicates(rows: list[dict]) -> None:
+    stmt = upsert_insert(MessageStatus)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=['provider_message_id', 'status'])
+        db.session.execute(stmt, rows)
+        return
+    seen = set(db.session.execute(
+        select(MessageStatus.provider_message_id, MessageStatus.status)
+        .where(MessageStatus.provider_message_id.in_({r['provider_message_id'] for r in rows}))
+    ).tuples())
+    rows = [r for r in rows if (r['provider_message_id'], r['status']) not in seen]
+    if rows:
+        db.session.execute(insert(MessageStatus), rows)
+
+
+def write_statuses(events: list[dict]) -> int:
+    """Persist a batch of parsed events in one transaction."""
+    if not events:
+        return 0
+    now = datetime.utcnow()
+    unique = {(e['provider_message_id'], e['status']): dict(e, received_at=now) for e in events}
+    try:
+        _insert_ignoring_duplicates(list(unique.values()))
+        for status in STATUS_ORDER:
+            ids = {pid for pid, s in unique if s == status}
+            if not ids:
+                continue
+            db.session.execute(
+                update(OutboundMessage)
+                .where(OutboundMessage.provider_message_id.in_(ids),
+                       or_(OutboundMessage.delivery_status.is_(None),
+                           OutboundMessage.delivery_status.in_(_PRECEDING[status])))
+                .values(delivery_status=status, delivery_updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(unique)
+
+
+class StatusBuffer(BatchBuffer):
+    thread_name = 'whatsapp-status-flush'
+
+    def __init__(self, flush_size: int | None = None, flush_seconds: float | None = None,
+                 max_pending: int = 50000):
+        super().__init__(flush_size or int(os.getenv('WHATSAPP_STATUS_FLUSH_SIZE') or 200),
+                         flush_seconds or float(os.getenv('WHATSAPP_STATUS_FLUSH_SECONDS') or 5),
+                         max_pending)
+
+    def write(self, batch: list[dict]) -> int:
+        return write_statuses(batch)
+
+
+status_buffer = StatusBuffer()
@@ -5,3 +5,20 @@ from authlib.integrations.flask_client import OAuth
 db = SQLAlchemy()
 migrate = Migrate()
 oauth = OAuth()
+
+
+def upsert_insert(model, session=None):
+    """An INSERT for ``model`` that supports ``on_conflict_*``, or None.
+
+    SQLite and Postgres get their dialect's insert; on other databases
+    callers fall back to UPDATE-then-INSERT. ``session`` defaults to
+    ``db.session`` (``app_legacy`` passes its own).
+    """
+    dialect = (session or db.session).get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert(model)
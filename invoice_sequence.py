@@ -0,0 +1,77 @@
+"""Per-day invoice numbers from a counter table.
+
+Each day has one ``invoice_sequence`` row holding the last number handed
+out. A checkout claims a block of ``count`` numbers with a single upsert that
+bumps the counter and returns its new value, so there is no read-before-write
+and no probing for a free random suffix. The counter row stays locked until
+the caller's transaction ends, which serialises allocation across gunicorn
+workers; if the sale is rolled back the bump is rolled back with it, so the
+numbers of a day stay gapless and sort in issue order
+(``INV-20261019-000123``). The functions take ``db`` and the model, as
+``app_legacy`` numbers its invoices with its own SQLAlchemy instance.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import upsert_insert
+
+DEFAULT_PREFIX = 'INV'
+
+
+def invoice_day(now: datetime | None = None) -> date:
+    # Server-local wall clock, like the sales rollup and stock ledger days
+    return (now or datetime.now()).date()
+
+
+def format_invoice(day: date, number: int, prefix: str = DEFAULT_PREFIX) -> str:
+    return f"{prefix}-{day.strftime('%Y%m%d')}-{number:06d}"
+
+
+def _bump(db, model, day: date, count: int) -> int:
+    """Add ``count`` to the day's counter and return the new last value."""
+    table = model.__table__
+    stmt = upsert_insert(table, db.session)
+    if stmt is not None:
+        stmt = (
+            stmt
+            .values(day=day, last_value=count)
+            .on_conflict_do_update(index_elements=['day'], set_={'last_value': table.c.last_value + count})
+            .returning(table.c.last_value)
+        )
+        return db.session.execute(stmt).scalar_one()
+
+    res = db.session.execute(update(table).where(table.c.day == day).values(last_value=table.c.last_value + count))
+    if res.rowcount != 1:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(day=day, last_value=count))
+            return count
+        except IntegrityError:
+            # Another worker created the day's row first
+            db.session.execute(update(table).where(table.c.day == day).values(last_value=table.c.last_value + count))
+    return db.session.execute(select(table.c.last_value).where(table.c.day == day)).scalar_one()
+
+
+def allocate(db, model, count: int = 1, day: date | None = None) -> tuple[date, int]:
+    """Reserve ``count`` consecutive numbers; returns the day and the first one.
+
+    Must run inside the transaction that stores the invoices, so a rollback
+    returns the block.
+    """
+    if count < 1:
+        raise ValueError('count must be positive')
+    day = day or invoice_day()
+    last = _bump(db, model, day, count)
+    return day, last - count + 1
+
+
+def next_invoice_numbers(db, model, count: int = 1, prefix: str = DEFAULT_PREFIX,
+                         day: date | None = None) -> list[str]:
+    day, first = allocate(db, model, count, day)
+    return [format_invoice(day, n, prefix) for n in range(first, first + count)]
+
+
+def next_invoice_number(db, model, prefix: str = DEFAULT_PREFIX) -> str:
+    return next_invoice_numbers(db, model, 1, prefix)[0]
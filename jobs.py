@@ -0,0 +1,128 @@
+"""Run-once locking and run history for scheduled jobs.
+
+Every gunicorn worker starts its own APScheduler, so each trigger fires once
+per worker. Before running, a worker inserts a ``job_run`` row keyed by
+``(job_name, run_key)`` where the key identifies the trigger (its minute for
+cron jobs, its interval bucket for interval jobs). The unique constraint
+lets exactly one insert succeed; the others see an IntegrityError and skip.
+The same row then records duration, rows affected and any error.
+
+The runner takes the ``db`` and model explicitly so ``app_legacy`` can use it
+with its own SQLAlchemy instance.
+"""
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+STATUS_RUNNING = 'running'
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+# Cron triggers fire within the same second on every worker, so the minute
+# of the firing identifies the trigger.
+CRON_PERIOD_SECONDS = 60
+
+
+def run_key(period_seconds: int = CRON_PERIOD_SECONDS, now: datetime | None = None) -> str:
+    now = now or datetime.utcnow()
+    epoch = int((now - datetime(1970, 1, 1)).total_seconds())
+    bucket = datetime(1970, 1, 1) + timedelta(seconds=epoch - epoch % period_seconds)
+    return bucket.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _rows_from(result) -> int | None:
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    return None
+
+
+class JobRunner:
+    def __init__(self, db, model):
+        self.db = db
+        self.model = model
+
+    def claim(self, job_name: str, key: str):
+        """Insert the lock row; returns it, or None if another worker owns this run."""
+        run = self.model(job_name=job_name, run_key=key, status=STATUS_RUNNING,
+                         owner=_owner(), started_at=datetime.utcnow())
+        self.db.session.add(run)
+        try:
+            self.db.session.commit()
+        except IntegrityError:
+            self.db.session.rollback()
+            return None
+        return run
+
+    def run_once(self, job_name: str, key: str, fn):
+        """Run ``fn()`` unless this ``(job_name, key)`` was already claimed.
+
+        ``fn`` may return the number of rows it affected. Exceptions are
+        recorded on the run row rather than raised, matching the old
+        swallow-and-continue behaviour of the scheduler jobs.
+        """
+        run = self.claim(job_name, key)
+        if run is None:
+            return None
+        started = time.perf_counter()
+        try:
+            result = fn()
+            run.status = STATUS_OK
+            run.rows_affected = _rows_from(result)
+        except Exception as e:
+            self.db.session.rollback()
+            run.status = STATUS_ERROR
+            run.error = f"{e}\n{traceback.format_exc()}"[:4000]
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = int((time.perf_counter() - started) * 1000)
+        self.db.session.commit()
+        return run
+
+    def scheduled(self, app, job_name: str, fn, period_seconds: int = CRON_PERIOD_SECONDS):
+        """Wrap ``fn`` for ``scheduler.add_job``: app context + run-once lock."""
+        def job():
+            with app.app_context():
+                try:
+                    self.run_once(job_name, run_key(period_seconds), fn)
+                except Exception:
+                    # Lock table unreachable: skip this trigger rather than risk a double run
+                    self.db.session.rollback()
+        job.__name__ = f"{job_name}_job"
+        return job
+
+    def history(self, limit: int = 50, job_name: str | None = None) -> list[dict]:
+        q = self.model.query
+        if job_name:
+            q = q.filter_by(job_name=job_name)
+        runs = q.order_by(self.model.started_at.desc(), self.model.id.desc()).limit(limit).all()
+        return [{
+            'id': r.id,
+            'job_name': r.job_name,
+            'run_key': r.run_key,
+            'status': r.status,
+            'owner': r.owner,
+            'started_at': r.started_at.isoformat() if r.started_at else None,
+            'finished_at': r.finished_at.isoformat() if r.finished_at else None,
+            'duration_ms': r.duration_ms,
+            'rows_affected': r.rows_affected,
+            'error': r.error,
+        } for r in runs]
+
+    def prune(self, keep_days: int = 14) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=keep_days)
+        res = self.db.session.execute(
+            delete(self.model).where(self.model.started_at < cutoff)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.session.commit()
+        return res.rowcount
@@ -0,0 +1,43 @@
+"""Buffered login-event logging.
+
+A successful login only appends a dict to ``LoginLogBuffer``; the
+background flusher writes the pending events with one multi-row insert
+every ``LOGIN_LOG_FLUSH_SECONDS`` or once ``LOGIN_LOG_FLUSH_SIZE`` are
+waiting. The timestamp is taken at login, not at flush.
+"""
+import os
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from batch_buffer import BatchBuffer
+
+
+class LoginLogBuffer(BatchBuffer):
+    thread_name = 'login-log-flush'
+
+    def __init__(self, db, model, flush_size: int | None = None, flush_seconds: float | None = None,
+                 max_pending: int = 10000):
+        super().__init__(flush_size or int(os.getenv('LOGIN_LOG_FLUSH_SIZE') or 100),
+                         flush_seconds or float(os.getenv('LOGIN_LOG_FLUSH_SECONDS') or 5),
+                         max_pending)
+        self.db = db
+        self.model = model
+
+    def record(self, user, method: str, ip_address: str | None) -> None:
+        self.add([{
+            'user_id': user.id if user else None,
+            'username': user.username if user else 'unknown',
+            'method': method,
+            'ip_address': (ip_address or '')[:64] or None,
+            'created_at': datetime.utcnow(),
+        }])
+
+    def write(self, batch: list[dict]) -> int:
+        try:
+            self.db.session.execute(insert(self.model), batch)
+            self.db.session.commit()
+        except Exception:
+            self.db.session.rollback()
+            raise
+        return len(batch)
@@ -0,0 +1,119 @@
+"""Low-stock alert set.
+
+``low_stock_alert`` holds exactly the active products whose stock is at or
+below their ``reorder_level``. Every write that changes stock, the level or
+the active flag calls ``refresh`` with the product ids it touched, in its
+own transaction. That re-checks only those products, so the set never needs
+a scan of the catalog.
+
+``send_digest`` groups the alerts nobody has been told about yet into one
+message per recipient and hands them to the outbox. Recipients come from
+``LOW_STOCK_ALERT_EMAILS`` and ``LOW_STOCK_ALERT_WHATSAPP`` (comma
+separated); with neither set, alerts are only listed in the UI.
+"""
+import hashlib
+import os
+from datetime import datetime
+
+from sqlalchemy import select, delete, update, insert
+
+from extensions import db, upsert_insert
+from models import Product, LowStockAlert
+from outbox import enqueue_messages
+
+
+def refresh(product_ids) -> None:
+    """Bring the alert rows for ``product_ids`` in line with their stock; caller commits."""
+    ids = sorted(set(product_ids))
+    if not ids:
+        return
+    rows = db.session.execute(
+        select(Product.id, Product.stock, Product.reorder_level, Product.is_active)
+        .where(Product.id.in_(ids))
+    ).all()
+    low = [
+        {'product_id': pid, 'stock': stock, 'reorder_level': level, 'since': datetime.utcnow()}
+        for pid, stock, level, active in rows
+        if active and level is not None and stock <= level
+    ]
+    low_ids = {r['product_id'] for r in low}
+    cleared = [pid for pid in ids if pid not in low_ids]
+    if cleared:
+        db.session.execute(delete(LowStockAlert).where(LowStockAlert.product_id.in_(cleared)))
+    if not low:
+        return
+
+    table = LowStockAlert.__table__
+    stmt = upsert_insert(table)
+    if stmt is not None:
+        # Already-alerted products keep their ``since`` and ``notified_at``
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['product_id'],
+            set_={'stock': stmt.excluded.stock, 'reorder_level': stmt.excluded.reorder_level},
+        ), low)
+        return
+    for row in low:
+        res = db.session.execute(
+            update(table).where(table.c.product_id == row['product_id'])
+            .values(stock=row['stock'], reorder_level=row['reorder_level'])
+        )
+        if res.rowcount == 0:
+            db.session.execute(insert(table), [row])
+
+
+def low_stock() -> list[dict]:
+    """Current alerts, emptiest shelves first."""
+    rows = db.session.execute(
+        select(LowStockAlert, Product.name, Product.sku, Product.category)
+        .join(Product, Product.id == LowStockAlert.product_id)
+        .order_by(LowStockAlert.stock - LowStockAlert.reorder_level, Product.name)
+    ).all()
+    return [{
+        'product_id': a.product_id,
+        'name': name,
+        'sku': sku or '',
+        'category': category or '',
+        'stock': a.stock,
+        'reorder_level': a.reorder_level,
+        'since': a.since.isoformat(),
+        'notified_at': a.notified_at.isoformat() if a.notified_at else None,
+    } for a, name, sku, category in rows]
+
+
+def _recipients() -> list[tuple[str, str]]:
+    out = []
+    for channel, var in (('email', 'LOW_STOCK_ALERT_EMAILS'), ('whatsapp', 'LOW_STOCK_ALERT_WHATSAPP')):
+        out.extend((channel, r.strip()) for r in (os.getenv(var) or '').split(',') if r.strip())
+    return out
+
+
+def send_digest() -> dict:
+    """Queue one message per recipient listing the alerts not yet notified."""
+    recipients = _recipients()
+    if not recipients:
+        return {'alerts': 0, 'queued': 0}
+    pending = [a for a in low_stock() if a['notified_at'] is None]
+    if not pending:
+        return {'alerts': 0, 'queued': 0}
+
+    lines = [f"- {a['name']}{' (' + a['sku'] + ')' if a['sku'] else ''}: {a['stock']} left "
+             f"(reorder at {a['reorder_level']})" for a in pending]
+    text = 'Low stock:\n' + '\n'.join(lines)
+    # Same alerts, same key: a digest retried after a crash is not queued twice
+    digest = hashlib.sha1('|'.join(f"{a['product_id']}@{a['since']}" for a in pending).encode()).hexdigest()[:16]
+    messages = []
+    for channel, recipient in recipients:
+        payload = ({'subject': f'Low stock: {len(pending)} product(s)', 'body': text}
+                   if channel == 'email' else {'text': text})
+        messages.append({'channel': channel, 'recipient': recipient, 'payload': payload,
+                         'idempotency_key': f'low-stock:{digest}:{channel}:{recipient}'[:120]})
+
+    db.session.execute(
+        update(LowStockAlert)
+        .where(LowStockAlert.product_id.in_([a['product_id'] for a in pending]))
+        .values(notified_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    # enqueue_messages commits, so the notified marks and the messages land together
+    res = enqueue_messages(messages)
+    return {'alerts': len(pending), 'queued': res['queued']}
@@ -0,0 +1,201 @@
+"""SMTP sending over reused, authenticated sessions.
+
+Opening a connection, STARTTLS and AUTH costs several round trips plus a TLS
+handshake, so bulk sends keep one ``SMTPSession`` per worker thread and push
+every message of that worker's share through it. A dropped connection is
+re-established once and the message retried; recipient-level rejections are
+reported per message without touching the session.
+"""
+import math
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+DEFAULT_MAX_SESSIONS = 4
+# Below this many messages per session an extra connection costs more than it saves
+MIN_MESSAGES_PER_SESSION = 25
+
+# Errors that mean the connection itself is unusable and worth one reconnect
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def smtp_config_from_env() -> dict:
+    return {
+        'host': os.getenv('SMTP_HOST'),
+        'port': int(os.getenv('SMTP_PORT', '587')),
+        'user': os.getenv('SMTP_USER'),
+        'password': os.getenv('SMTP_PASSWORD'),
+        'use_tls': os.getenv('SMTP_TLS', '1') not in ('0', 'false', 'False'),
+        'sender': os.getenv('SMTP_FROM') or os.getenv('SMTP_USER'),
+    }
+
+
+def max_sessions_from_env() -> int:
+    return int(os.getenv('EMAIL_MAX_WORKERS') or DEFAULT_MAX_SESSIONS)
+
+
+def build_message(subject: str, body: str, to_email: str, sender: str,
+                  attachments: list[tuple[str, bytes]] | None = None, html: str | None = None) -> EmailMessage:
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg.set_content(body)
+    if html:
+        msg.add_alternative(html, subtype='html')
+    for filename, content in attachments or []:
+        msg.add_attachment(content, maintype='application', subtype='octet-stream', filename=filename)
+    return msg
+
+
+class SMTPSession:
+    """One authenticated SMTP connection, opened lazily and reopened on drop.
+
+    Not thread-safe: give each worker thread its own session.
+    """
+
+    def __init__(self, host: str, port: int = 587, user: str | None = None, password: str | None = None,
+                 use_tls: bool = True, timeout: float = 30, **_):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.connects = 0
+        self._smtp: smtplib.SMTP | None = None
+
+    def connect(self) -> None:
+        self.close()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.user and self.password:
+                smtp.login(self.user, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.connects += 1
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+    def send(self, msg: EmailMessage) -> None:
+        if self._smtp is None:
+            self.connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPResponseException as e:
+            # 421: server is closing the channel (e.g. a per-connection message cap)
+            if e.smtp_code != 421:
+                raise
+            self.connect()
+            self._smtp.send_message(msg)
+        except _CONNECTION_ERRORS:
+            # Server hung up (idle timeout, dropped socket): retry once on a fresh connection
+            self.connect()
+            self._smtp.send_message(msg)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def send_one(subject: str, body: str, to_email: str, attachments: list[tuple[str, bytes]] | None = None,
+             html: str | None = None, config: dict | None = None) -> tuple[bool, str]:
+    cfg = config or smtp_config_from_env()
+    if not (cfg.get('host') and cfg.get('user') and cfg.get('password') and to_email):
+        return False, 'SMTP config missing (host/user/password or recipient)'
+    msg = build_message(subject, body, to_email, cfg.get('sender') or cfg['user'], attachments, html)
+    try:
+        with SMTPSession(**cfg) as s:
+            s.send(msg)
+        return True, 'sent'
+    except Exception as e:
+        return False, str(e)
+
+
+def send_bulk_email(messages: list[dict], config: dict | None = None, max_sessions: int | None = None,
+                    on_result=None) -> dict:
+    """Send many emails over a few long-lived SMTP sessions.
+
+    Each message is a dict with ``to``, ``subject``, ``body`` and optional
+    ``html``, ``attachments`` and ``meta`` (copied into its result row).
+    Messages are split round-robin across up to ``max_sessions`` workers,
+    each holding one connection for its whole share. ``on_result(row)`` is
+    called from the worker thread as each message finishes. Returns the same
+    ``sent``/``failed``/``results``/``report`` shape as
+    ``messaging.dispatch_concurrent``.
+    """
+    cfg = config or smtp_config_from_env()
+    max_sessions = max_sessions or max_sessions_from_env()
+    if not messages:
+        return {'sent': 0, 'failed': 0, 'results': [], 'report': {'messages': 0, 'sessions': 0, 'connects': 0}}
+    if not (cfg.get('host') and cfg.get('user') and cfg.get('password')):
+        results = [dict(m.get('meta') or {}, ok=False, error='SMTP config missing (host/user/password)')
+                   for m in messages]
+        if on_result:
+            for row in results:
+                on_result(row)
+        return {'sent': 0, 'failed': len(results), 'results': results,
+                'report': {'messages': len(results), 'sessions': 0, 'connects': 0}}
+
+    sender = cfg.get('sender') or cfg['user']
+    n_sessions = max(1, min(max_sessions, math.ceil(len(messages) / MIN_MESSAGES_PER_SESSION)))
+    shares = [list(range(i, len(messages), n_sessions)) for i in range(n_sessions)]
+    results: list[dict | None] = [None] * len(messages)
+    connects = []
+    lock = threading.Lock()
+
+    def work(indexes: list[int]) -> None:
+        session = SMTPSession(**cfg)
+        try:
+            for i in indexes:
+                m = messages[i]
+                row = dict(m.get('meta') or {})
+                started = time.perf_counter()
+                try:
+                    if not m.get('to'):
+                        raise ValueError('missing recipient')
+                    session.send(build_message(m.get('subject') or '', m.get('body') or '', m['to'],
+                                               sender, m.get('attachments'), m.get('html')))
+                    row.update(ok=True, response='sent')
+                except Exception as e:
+                    row.update(ok=False, error=str(e))
+                row['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                results[i] = row
+                if on_result:
+                    on_result(row)
+        finally:
+            session.close()
+            with lock:
+                connects.append(session.connects)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_sessions) as pool:
+        list(pool.map(work, shares))
+    elapsed = time.perf_counter() - started
+
+    sent = sum(1 for r in results if r['ok'])
+    report = {
+        'messages': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        'sessions': n_sessions,
+        'connects': sum(connects),
+    }
+    return {'sent': sent, 'failed': len(results) - sent, 'results': results, 'report': report}
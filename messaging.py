@@ -0,0 +1,104 @@
+"""Concurrent message dispatch with a shared rate limit.
+
+Used by the bulk reminder senders so a few hundred WhatsApp messages go out
+in parallel without exceeding the Cloud API throughput tier.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# WhatsApp Cloud API default throughput is 80 messages/second per business
+# phone number; numbers upgraded by Meta get up to 1000/s.
+DEFAULT_RATE_PER_SEC = 80
+DEFAULT_MAX_WORKERS = 16
+
+
+class TokenBucket:
+    """Thread-safe token bucket. ``acquire`` blocks until a token is free."""
+
+    def __init__(self, rate: float, capacity: float | None = None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        # Reserve the token up front (the balance may go negative) and sleep
+        # off the debt outside the lock, so waiters are served in order.
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+
+
+def whatsapp_rate_limit() -> tuple[float, int]:
+    rate = float(os.getenv('WHATSAPP_RATE_PER_SEC') or DEFAULT_RATE_PER_SEC)
+    workers = int(os.getenv('WHATSAPP_MAX_WORKERS') or DEFAULT_MAX_WORKERS)
+    return rate, workers
+
+
+def dispatch_concurrent(jobs: list[dict], send_fn, max_workers: int = DEFAULT_MAX_WORKERS,
+                        rate_per_sec: float = DEFAULT_RATE_PER_SEC, bucket: TokenBucket | None = None,
+                        on_result=None) -> dict:
+    """Run ``send_fn(**job['args'])`` for every job on a bounded thread pool.
+
+    ``send_fn`` must return ``(ok, response)`` like the ``send_whatsapp_*``
+    helpers and must not touch the database session, since it runs outside
+    the request thread. Each job may carry a ``meta`` dict that is copied into
+    its result row. ``on_result(row)``, if given, is called from the worker
+    thread as each message finishes. Returns per-message results plus a
+    throughput report.
+    """
+    bucket = bucket or TokenBucket(rate_per_sec)
+
+    def run(job: dict) -> dict:
+        bucket.acquire()
+        started = time.perf_counter()
+        try:
+            ok, resp = send_fn(**job['args'])
+        except Exception as e:
+            ok, resp = False, f"dispatch error: {e}"
+        row = dict(job.get('meta') or {})
+        row['ok'] = bool(ok)
+        row['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        if ok:
+            row['response'] = resp
+        else:
+            row['error'] = resp
+        if on_result:
+            on_result(row)
+        return row
+
+    started = time.perf_counter()
+    if jobs:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+            results = list(pool.map(run, jobs))
+    else:
+        results = []
+    elapsed = time.perf_counter() - started
+
+    sent = sum(1 for r in results if r['ok'])
+    latencies = sorted(r['latency_ms'] for r in results)
+    report = {
+        'messages': len(results),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        'p50_latency_ms': latencies[len(latencies) // 2] if latencies else None,
+        'max_latency_ms': latencies[-1] if latencies else None,
+        'max_workers': max_workers,
+        'rate_per_sec': bucket.rate,
+    }
+    return {'sent': sent, 'failed': len(results) - sent, 'results': results, 'report': report}
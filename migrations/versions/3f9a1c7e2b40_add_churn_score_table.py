@@ -0,0 +1,39 @@
+"""Add churn_score table for nightly churn-risk scoring
+
+Revision ID: 3f9a1c7e2b40
+Revises: d74031182a92
+Create Date: 2026-10-19 09:12:31.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7e2b40'
+down_revision = 'd74031182a92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('churn_score',
+    sa.Column('member_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('unpaid_streak', sa.SmallInteger(), nullable=False),
+    sa.Column('avg_lateness_days', sa.Float(), nullable=False),
+    sa.Column('days_since_contact', sa.SmallInteger(), nullable=False),
+    sa.Column('tenure_months', sa.SmallInteger(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+    sa.PrimaryKeyConstraint('member_id')
+    )
+    with op.batch_alter_table('churn_score', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_churn_score_score'), ['score'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('churn_score', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_churn_score_score'))
+
+    op.drop_table('churn_score')
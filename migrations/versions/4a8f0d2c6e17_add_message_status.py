@@ -0,0 +1,48 @@
+"""Add message_status table and outbound_message delivery state
+
+Revision ID: 4a8f0d2c6e17
+Revises: e7c41b9a2f05
+Create Date: 2026-10-19 15:47:12.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8f0d2c6e17'
+down_revision = 'e7c41b9a2f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('message_status',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('provider_message_id', sa.String(length=128), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('recipient', sa.String(length=32), nullable=True),
+    sa.Column('occurred_at', sa.DateTime(), nullable=True),
+    sa.Column('error_code', sa.Integer(), nullable=True),
+    sa.Column('error_title', sa.String(length=255), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('provider_message_id', 'status', name='uq_message_status')
+    )
+    with op.batch_alter_table('message_status', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_message_status_received_at'), ['received_at'], unique=False)
+
+    with op.batch_alter_table('outbound_message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('delivery_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('delivery_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('outbound_message', schema=None) as batch_op:
+        batch_op.drop_column('delivery_updated_at')
+        batch_op.drop_column('delivery_status')
+
+    with op.batch_alter_table('message_status', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_message_status_received_at'))
+
+    op.drop_table('message_status')
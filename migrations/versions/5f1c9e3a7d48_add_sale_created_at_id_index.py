@@ -0,0 +1,26 @@
+"""Add (created_at, id) index on sale for keyset pagination
+
+Revision ID: 5f1c9e3a7d48
+Revises: c28e5a7f4b61
+Create Date: 2026-10-19 17:05:12.660390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f1c9e3a7d48'
+down_revision = 'c28e5a7f4b61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.create_index('ix_sale_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_index('ix_sale_created_at_id')
@@ -0,0 +1,51 @@
+"""Add product name/sku search index (FTS5 trigram on SQLite, pg_trgm on Postgres)
+
+Revision ID: 7b4d2e9f1a36
+Revises: e3b7a1f9c052
+Create Date: 2026-10-19 18:44:51.204617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4d2e9f1a36'
+down_revision = 'e3b7a1f9c052'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    if dialect == 'sqlite':
+        if (bind.dialect.server_version_info or (0,)) < (3, 34):
+            # No trigram tokenizer before SQLite 3.34; product search falls back to ILIKE
+            return
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+                   "name, sku, content='product', content_rowid='id', tokenize='trigram')")
+        op.execute("CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN "
+                   "INSERT INTO product_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku); END")
+        op.execute("CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN "
+                   "INSERT INTO product_fts(product_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku); END")
+        op.execute("CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, sku ON product BEGIN "
+                   "INSERT INTO product_fts(product_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku); "
+                   "INSERT INTO product_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku); END")
+        # Index the products that already exist
+        op.execute("INSERT INTO product_fts(product_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_product_sku_trgm ON product USING gin (sku gin_trgm_ops)")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('product_fts_ai', 'product_fts_ad', 'product_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS product_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_product_sku_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_product_name_trgm")
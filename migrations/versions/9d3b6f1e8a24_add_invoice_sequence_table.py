@@ -0,0 +1,28 @@
+"""Add invoice_sequence table
+
+Revision ID: 9d3b6f1e8a24
+Revises: 4a8f0d2c6e17
+Create Date: 2026-10-19 16:20:05.417362
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3b6f1e8a24'
+down_revision = '4a8f0d2c6e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('invoice_sequence',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade():
+    op.drop_table('invoice_sequence')
@@ -0,0 +1,40 @@
+"""Add sales_daily_product and sales_hourly rollup tables
+
+Revision ID: a6e2d8b4c173
+Revises: 5f1c9e3a7d48
+Create Date: 2026-10-19 17:52:40.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e2d8b4c173'
+down_revision = '5f1c9e3a7d48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_daily_product',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=140), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    op.create_table('sales_hourly',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('hour', sa.Integer(), nullable=False),
+    sa.Column('payment_method', sa.String(length=40), nullable=False),
+    sa.Column('sales_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'hour', 'payment_method')
+    )
+
+
+def downgrade():
+    op.drop_table('sales_hourly')
+    op.drop_table('sales_daily_product')
@@ -0,0 +1,42 @@
+"""Add job_run lock/history table
+
+Revision ID: b51e7a3c9d20
+Revises: 8c2d4e6f1a93
+Create Date: 2026-10-19 14:12:30.184275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b51e7a3c9d20'
+down_revision = '8c2d4e6f1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_run',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_name', sa.String(length=64), nullable=False),
+    sa.Column('run_key', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('owner', sa.String(length=120), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_ms', sa.Integer(), nullable=True),
+    sa.Column('rows_affected', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job_name', 'run_key', name='uq_job_run_key')
+    )
+    with op.batch_alter_table('job_run', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_job_run_started_at'), ['started_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job_run', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_job_run_started_at'))
+
+    op.drop_table('job_run')
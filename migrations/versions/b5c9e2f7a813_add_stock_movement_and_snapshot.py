@@ -0,0 +1,54 @@
+"""Add stock_movement ledger and stock_snapshot tables
+
+Revision ID: b5c9e2f7a813
+Revises: 7b4d2e9f1a36
+Create Date: 2026-10-19 19:20:13.552901
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5c9e2f7a813'
+down_revision = '7b4d2e9f1a36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_movement',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.String(length=30), nullable=False),
+    sa.Column('ref', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stock_movement', schema=None) as batch_op:
+        batch_op.create_index('ix_stock_movement_product_created', ['product_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_stock_movement_created_at', ['created_at'], unique=False)
+
+    op.create_table('stock_snapshot',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    # Existing stock becomes each product's opening balance
+    op.execute(
+        "INSERT INTO stock_movement (product_id, delta, reason, ref, created_at) "
+        "SELECT id, stock, 'initial', 'migration', CURRENT_TIMESTAMP FROM product WHERE stock <> 0"
+    )
+
+
+def downgrade():
+    op.drop_table('stock_snapshot')
+    with op.batch_alter_table('stock_movement', schema=None) as batch_op:
+        batch_op.drop_index('ix_stock_movement_created_at')
+        batch_op.drop_index('ix_stock_movement_product_created')
+
+    op.drop_table('stock_movement')
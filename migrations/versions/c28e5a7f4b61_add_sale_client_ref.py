@@ -0,0 +1,28 @@
+"""Add sale.client_ref for offline sync
+
+Revision ID: c28e5a7f4b61
+Revises: 9d3b6f1e8a24
+Create Date: 2026-10-19 16:41:37.052118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c28e5a7f4b61'
+down_revision = '9d3b6f1e8a24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_ref', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_sale_client_ref', ['client_ref'])
+
+
+def downgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_sale_client_ref', type_='unique')
+        batch_op.drop_column('client_ref')
@@ -0,0 +1,43 @@
+"""Add product.reorder_level and low_stock_alert
+
+Revision ID: d41f8a6c2e95
+Revises: b5c9e2f7a813
+Create Date: 2026-10-19 19:58:36.407112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f8a6c2e95'
+down_revision = 'b5c9e2f7a813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reorder_level', sa.Integer(), nullable=True, server_default='5'))
+
+    op.create_table('low_stock_alert',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('reorder_level', sa.Integer(), nullable=False),
+    sa.Column('since', sa.DateTime(), nullable=False),
+    sa.Column('notified_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    # Seed the alert set once; from here on it is maintained as stock changes
+    op.execute(
+        "INSERT INTO low_stock_alert (product_id, stock, reorder_level, since) "
+        "SELECT id, stock, reorder_level, CURRENT_TIMESTAMP FROM product "
+        "WHERE is_active AND reorder_level IS NOT NULL AND stock <= reorder_level"
+    )
+
+
+def downgrade():
+    op.drop_table('low_stock_alert')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('reorder_level')
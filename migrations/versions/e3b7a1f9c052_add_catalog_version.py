@@ -0,0 +1,35 @@
+"""Add catalog_version counter and product.catalog_version
+
+Revision ID: e3b7a1f9c052
+Revises: a6e2d8b4c173
+Create Date: 2026-10-19 18:20:09.731845
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b7a1f9c052'
+down_revision = 'a6e2d8b4c173'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('catalog_version', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_product_catalog_version'), ['catalog_version'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_catalog_version'))
+        batch_op.drop_column('catalog_version')
+
+    op.drop_table('catalog_version')
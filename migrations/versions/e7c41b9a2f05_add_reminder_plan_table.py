@@ -0,0 +1,33 @@
+"""Add reminder_plan table
+
+Revision ID: e7c41b9a2f05
+Revises: b51e7a3c9d20
+Create Date: 2026-10-19 15:03:48.220917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c41b9a2f05'
+down_revision = 'b51e7a3c9d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reminder_plan',
+    sa.Column('plan_date', sa.Date(), nullable=False),
+    sa.Column('window_start', sa.DateTime(), nullable=False),
+    sa.Column('window_end', sa.DateTime(), nullable=False),
+    sa.Column('daily_cap', sa.Integer(), nullable=False),
+    sa.Column('planned', sa.Integer(), nullable=False),
+    sa.Column('deferred', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('plan_date')
+    )
+
+
+def downgrade():
+    op.drop_table('reminder_plan')
@@ -2,6 +2,7 @@ from datetime import datetime
 from extensions import db
 import os
 import json
+from sqlalchemy import DDL, event
 
 # Helper functions that models depend on
 def get_setting(key: str, default: str | None = None) -> str | None:
@@ -117,6 +118,57 @@ class Product(db.Model):
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Catalog version of the last change shown to tills (see catalog.py)
+    catalog_version = db.Column(db.Integer, nullable=False, default=0, index=True)
+    # Alert when stock falls to this level or below; None turns alerts off (see low_stock.py)
+    reorder_level = db.Column(db.Integer, nullable=True, default=5)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'price': float(self.price or 0.0),
+            'stock': self.stock,
+            'category': self.category or '',
+            'sku': self.sku or '',
+            'reorder_level': self.reorder_level,
+            'is_active': bool(self.is_active),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+# Product name/sku search index: an FTS5 trigram table on SQLite, pg_trgm GIN
+# indexes on Postgres (used by ILIKE). The triggers skip stock-only updates.
+def _sqlite_has_trigram(ddl, target, bind, **kw) -> bool:
+    # The trigram tokenizer needs SQLite 3.34+; older builds skip the index and search falls back to ILIKE
+    return bind.dialect.name == 'sqlite' and (bind.dialect.server_version_info or (0,)) >= (3, 34)
+
+_PRODUCT_SEARCH_DDL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+        "name, sku, content='product', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN "
+        "INSERT INTO product_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku); END",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN "
+        "INSERT INTO product_fts(product_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku); END",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, sku ON product BEGIN "
+        "INSERT INTO product_fts(product_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku); "
+        "INSERT INTO product_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku); END",
+        "INSERT INTO product_fts(product_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_product_sku_trgm ON product USING gin (sku gin_trgm_ops)",
+    ],
+}
+for _dialect, _statements in _PRODUCT_SEARCH_DDL.items():
+    for _sql in _statements:
+        _ddl = DDL(_sql)
+        _ddl = _ddl.execute_if(callable_=_sqlite_has_trigram) if _dialect == 'sqlite' else _ddl.execute_if(dialect=_dialect)
+        event.listen(Product.__table__, 'after_create', _ddl)
+# The FTS table outlives a dropped product table otherwise
+event.listen(Product.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS product_fts").execute_if(dialect='sqlite'))
 
 class Sale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -133,9 +185,36 @@ class Sale(db.Model):
     verification_hash = db.Column(db.String(64), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     synced_from_offline = db.Column(db.Boolean, nullable=False, default=False)
+    client_ref = db.Column(db.String(64), unique=True, nullable=True)  # id generated by an offline terminal
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     items = db.relationship('SaleItem', backref='sale', cascade='all, delete-orphan')
 
+    # Keyset pagination of /api/sales walks (created_at, id) newest first
+    __table_args__ = (
+        db.Index('ix_sale_created_at_id', 'created_at', 'id'),
+    )
+
+    def to_dict(self, include_items: bool = False):
+        data = {
+            'id': self.id,
+            'invoice_number': self.invoice_number,
+            'customer_name': self.customer_name or '',
+            'subtotal': float(self.subtotal or 0.0),
+            'tax': float(self.tax or 0.0),
+            'discount': float(self.discount or 0.0),
+            'total': float(self.total or 0.0),
+            'payment_method': self.payment_method or '',
+            'note': self.note or '',
+            'channel': self.channel,
+            'status': self.status,
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'synced_from_offline': bool(self.synced_from_offline),
+        }
+        if include_items:
+            data['items'] = [item.to_dict() for item in self.items]
+        return data
+
 class SaleItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), nullable=False)
@@ -145,6 +224,16 @@ class SaleItem(db.Model):
     unit_price = db.Column(db.Float, nullable=False, default=0.0)
     total_price = db.Column(db.Float, nullable=False, default=0.0)
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'name': self.name,
+            'quantity': self.quantity,
+            'unit_price': float(self.unit_price or 0.0),
+            'total_price': float(self.total_price or 0.0),
+        }
+
 class LoginLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=True)
@@ -152,3 +241,131 @@ class LoginLog(db.Model):
     method = db.Column(db.String(30), nullable=False)
     ip_address = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChurnScore(db.Model):
+    # One row per active member, rewritten wholesale by the nightly churn job
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, index=True)
+    unpaid_streak = db.Column(db.SmallInteger, nullable=False, default=0)
+    avg_lateness_days = db.Column(db.Float, nullable=False, default=0.0)
+    days_since_contact = db.Column(db.SmallInteger, nullable=False, default=0)
+    tenure_months = db.Column(db.SmallInteger, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class OutboundMessage(db.Model):
+    # Persistent send queue drained by outbox.drain_outbox
+    __table_args__ = (
+        db.Index('idx_outbound_status_next', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # 'whatsapp' | 'email'
+    recipient = db.Column(db.String(255), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/sending/sent/dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(500), nullable=True)
+    idempotency_key = db.Column(db.String(120), unique=True, nullable=False)
+    lease_token = db.Column(db.String(32), nullable=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'), nullable=True)
+    provider_message_id = db.Column(db.String(128), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Latest Graph status callback (sent/delivered/read/failed), see delivery_status.py
+    delivery_status = db.Column(db.String(20), nullable=True)
+    delivery_updated_at = db.Column(db.DateTime, nullable=True)
+
+class JobRun(db.Model):
+    # Run lock + history for scheduled jobs; the unique key lets exactly one worker claim a trigger
+    __table_args__ = (
+        db.UniqueConstraint('job_name', 'run_key', name='uq_job_run_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(64), nullable=False)
+    run_key = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running/ok/error
+    owner = db.Column(db.String(120), nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+    rows_affected = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+class ReminderPlan(db.Model):
+    # One row per day: the send window and cap the daily fee reminders were spread over
+    plan_date = db.Column(db.Date, primary_key=True)
+    window_start = db.Column(db.DateTime, nullable=False)  # UTC
+    window_end = db.Column(db.DateTime, nullable=False)  # UTC
+    daily_cap = db.Column(db.Integer, nullable=False)
+    planned = db.Column(db.Integer, nullable=False, default=0)
+    deferred = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MessageStatus(db.Model):
+    # Raw WhatsApp status callbacks; Graph may repeat a callback, hence the unique pair
+    __table_args__ = (
+        db.UniqueConstraint('provider_message_id', 'status', name='uq_message_status'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    provider_message_id = db.Column(db.String(128), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # sent/delivered/read/failed
+    recipient = db.Column(db.String(32), nullable=True)
+    occurred_at = db.Column(db.DateTime, nullable=True)
+    error_code = db.Column(db.Integer, nullable=True)
+    error_title = db.Column(db.String(255), nullable=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class InvoiceSequence(db.Model):
+    # Last invoice number handed out per day (see invoice_sequence.py)
+    day = db.Column(db.Date, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+class SalesDailyProduct(db.Model):
+    # Units and line revenue per local day and product (see sales_rollup.py)
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(140), nullable=False)  # name on the latest sale, for deleted products
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class SalesHourly(db.Model):
+    # Sale count and revenue per local day, hour and payment method (see sales_rollup.py)
+    day = db.Column(db.Date, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True)
+    payment_method = db.Column(db.String(40), primary_key=True, default='')
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class CatalogVersion(db.Model):
+    # Single-row counter bumped by every product change (see catalog.py)
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class StockMovement(db.Model):
+    # Every change to product.stock, written in the same transaction (see stock_ledger.py)
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(30), nullable=False)  # initial/sale/oversold/restock/adjustment/damage
+    ref = db.Column(db.String(64), nullable=True)  # invoice number, user:<id>, ...
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_stock_movement_product_created', 'product_id', 'created_at'),
+        db.Index('ix_stock_movement_created_at', 'created_at'),
+    )
+
+class StockSnapshot(db.Model):
+    # Stock and price per product at the end of a local day (see stock_ledger.py)
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    stock = db.Column(db.Integer, nullable=False, default=0)
+    unit_price = db.Column(db.Float, nullable=False, default=0.0)
+
+class LowStockAlert(db.Model):
+    # Products currently at or below their reorder level, kept up to date by low_stock.refresh
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    stock = db.Column(db.Integer, nullable=False)
+    reorder_level = db.Column(db.Integer, nullable=False)
+    since = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    notified_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,232 @@
+"""Persistent outbound message queue (WhatsApp / email).
+
+Producers call ``enqueue_messages`` and return straight away; the scheduler
+calls ``drain_outbox`` every few seconds. Rows are claimed with a lease token,
+so several gunicorn workers can drain the same table without double sends.
+Failed sends are retried with exponential backoff and end up in the ``dead``
+state after ``OUTBOX_MAX_ATTEMPTS`` tries.
+"""
+import json
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, insert, func
+
+from extensions import db
+from models import OutboundMessage, Member
+from messaging import dispatch_concurrent, whatsapp_rate_limit
+from mailer import send_bulk_email
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+LEASE_SECONDS = 300  # a claimed row becomes claimable again if its worker dies
+
+
+def _max_attempts() -> int:
+    return int(os.getenv('OUTBOX_MAX_ATTEMPTS') or 5)
+
+
+def _backoff(attempts: int) -> timedelta:
+    base = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS') or 30)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), 3600))
+
+
+def enqueue_messages(messages: list[dict]) -> dict:
+    """Queue messages in one bulk insert.
+
+    Each message needs ``channel``, ``recipient``, ``payload`` (JSON-able
+    dict) and ``idempotency_key``; ``member_id`` and ``next_attempt_at`` are
+    optional. Keys that are already queued are skipped, so re-running a
+    reminder for the same month is harmless.
+    """
+    if not messages:
+        return {'queued': 0, 'duplicates': 0}
+    keys = [m['idempotency_key'] for m in messages]
+    existing = set(db.session.execute(
+        select(OutboundMessage.idempotency_key).where(OutboundMessage.idempotency_key.in_(keys))
+    ).scalars())
+    now = datetime.utcnow()
+    rows, seen = [], set()
+    for m in messages:
+        key = m['idempotency_key']
+        if key in existing or key in seen:
+            continue
+        seen.add(key)
+        rows.append({
+            'channel': m['channel'],
+            'recipient': m['recipient'],
+            'payload': json.dumps(m['payload']),
+            'status': STATUS_PENDING,
+            'attempts': 0,
+            'next_attempt_at': m.get('next_attempt_at') or now,
+            'idempotency_key': key,
+            'member_id': m.get('member_id'),
+            'created_at': now,
+        })
+    try:
+        if rows:
+            db.session.execute(insert(OutboundMessage), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'queued': len(rows), 'duplicates': len(messages) - len(rows)}
+
+
+def claim_batch(limit: int = 100, now: datetime | None = None) -> list[OutboundMessage]:
+    """Atomically lease up to ``limit`` due messages for this worker."""
+    now = now or datetime.utcnow()
+    token = secrets.token_hex(16)
+    due = (
+        select(OutboundMessage.id)
+        .where(
+            OutboundMessage.status.in_((STATUS_PENDING, STATUS_SENDING)),
+            OutboundMessage.next_attempt_at <= now,
+        )
+        .order_by(OutboundMessage.next_attempt_at, OutboundMessage.id)
+        .limit(limit)
+    )
+    ids = list(db.session.execute(due).scalars())
+    if not ids:
+        return []
+    # The status/next_attempt_at guard makes the claim a compare-and-set:
+    # a row another worker leased in the meantime no longer matches.
+    db.session.execute(
+        update(OutboundMessage)
+        .where(
+            OutboundMessage.id.in_(ids),
+            OutboundMessage.status.in_((STATUS_PENDING, STATUS_SENDING)),
+            OutboundMessage.next_attempt_at <= now,
+        )
+        .values(status=STATUS_SENDING, lease_token=token,
+                next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return list(db.session.execute(
+        select(OutboundMessage).where(OutboundMessage.lease_token == token).order_by(OutboundMessage.id)
+    ).scalars())
+
+
+def _deliver(channel: str, recipient: str, payload: dict) -> tuple[bool, object]:
+    from blueprints.communications import send_whatsapp_message, send_whatsapp_template, send_email
+    if channel == 'whatsapp':
+        if payload.get('type') == 'template':
+            return send_whatsapp_template(recipient, payload['template_name'],
+                                          payload.get('lang_code') or 'en', payload.get('body_params'))
+        return send_whatsapp_message(recipient, payload.get('text') or '')
+    if channel == 'email':
+        return send_email(payload.get('subject') or '', payload.get('body') or '', recipient)
+    return False, f'unknown channel {channel!r}'
+
+
+def _provider_id(resp) -> str | None:
+    if isinstance(resp, dict):
+        msgs = resp.get('messages') or []
+        if msgs and isinstance(msgs[0], dict):
+            return msgs[0].get('id')
+    return None
+
+
+def drain_outbox(batch_size: int = 200) -> dict:
+    """Send one batch of due messages and record the outcome of each."""
+    batch = claim_batch(batch_size)
+    if not batch:
+        return {'ok': True, 'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+
+    by_channel: dict[str, list[dict]] = {}
+    for msg in batch:
+        by_channel.setdefault(msg.channel, []).append({
+            'args': {'channel': msg.channel, 'recipient': msg.recipient, 'payload': json.loads(msg.payload)},
+            'meta': {'id': msg.id, 'attempts': msg.attempts, 'member_id': msg.member_id},
+        })
+
+    results, reports = [], {}
+    for channel, jobs in by_channel.items():
+        if channel == 'email':
+            # Reuse a few authenticated SMTP sessions instead of one connection per message
+            out = send_bulk_email([{
+                'to': j['args']['recipient'],
+                'subject': j['args']['payload'].get('subject'),
+                'body': j['args']['payload'].get('body'),
+                'meta': j['meta'],
+            } for j in jobs])
+        else:
+            rate, workers = whatsapp_rate_limit()
+            out = dispatch_concurrent(jobs, _deliver, max_workers=workers, rate_per_sec=rate)
+        results.extend(out['results'])
+        reports[channel] = out['report']
+
+    now = datetime.utcnow()
+    updates, contacted = [], []
+    sent = retried = dead = 0
+    for r in results:
+        attempts = r['attempts'] + 1
+        if r['ok']:
+            sent += 1
+            updates.append({'id': r['id'], 'status': STATUS_SENT, 'attempts': attempts, 'sent_at': now,
+                            'last_error': None, 'lease_token': None,
+                            'provider_message_id': _provider_id(r.get('response'))})
+            if r.get('member_id'):
+                contacted.append(r['member_id'])
+        elif attempts >= _max_attempts():
+            dead += 1
+            updates.append({'id': r['id'], 'status': STATUS_DEAD, 'attempts': attempts,
+                            'last_error': str(r.get('error'))[:500], 'lease_token': None})
+        else:
+            retried += 1
+            updates.append({'id': r['id'], 'status': STATUS_PENDING, 'attempts': attempts,
+                            'next_attempt_at': now + _backoff(attempts),
+                            'last_error': str(r.get('error'))[:500], 'lease_token': None})
+    try:
+        db.session.execute(update(OutboundMessage), updates)
+        if contacted:
+            db.session.execute(
+                update(Member).where(Member.id.in_(set(contacted))).values(last_contact_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'ok': True, 'claimed': len(batch), 'sent': sent, 'retried': retried, 'dead': dead, 'report': reports}
+
+
+def outbox_stats(now: datetime | None = None) -> dict:
+    now = now or datetime.utcnow()
+    depth = dict(db.session.execute(
+        select(OutboundMessage.status, func.count()).group_by(OutboundMessage.status)
+    ).all())
+    oldest_pending = db.session.execute(
+        select(func.min(OutboundMessage.created_at)).where(OutboundMessage.status == STATUS_PENDING)
+    ).scalar()
+
+    def sent_since(delta: timedelta) -> int:
+        return db.session.execute(
+            select(func.count()).select_from(OutboundMessage).where(OutboundMessage.sent_at >= now - delta)
+        ).scalar() or 0
+
+    last_5m = sent_since(timedelta(minutes=5))
+    last_hour = sent_since(timedelta(hours=1))
+    return {
+        'depth': {s: depth.get(s, 0) for s in (STATUS_PENDING, STATUS_SENDING, STATUS_SENT, STATUS_DEAD)},
+        'oldest_pending_age_s': int((now - oldest_pending).total_seconds()) if oldest_pending else None,
+        'sent_last_5m': last_5m,
+        'sent_last_hour': last_hour,
+        'send_rate_per_min': round(last_5m / 5.0, 2),
+    }
+
+
+def requeue_dead(message_id: int) -> bool:
+    res = db.session.execute(
+        update(OutboundMessage)
+        .where(OutboundMessage.id == message_id, OutboundMessage.status == STATUS_DEAD)
+        .values(status=STATUS_PENDING, attempts=0, next_attempt_at=datetime.utcnow(), last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return res.rowcount > 0
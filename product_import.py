@@ -0,0 +1,182 @@
+"""Bulk product import and price changes.
+
+``import_products`` upserts a supplier CSV/XLSX by SKU. Rows are parsed and
+validated up front, then written in chunks: one locked SELECT for the
+chunk's existing SKUs, one executemany UPDATE and one executemany INSERT.
+Stock counts that change are booked in the stock ledger and re-checked for
+low-stock alerts, and every touched product gets one catalog version. The
+whole file commits or rolls back as a unit and the response lists each
+rejected line.
+
+``change_prices`` applies a percentage or fixed amount to every active
+product (optionally one category) in a single UPDATE.
+"""
+import math
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+from sqlalchemy import select, insert, update, func, case, cast, Numeric
+
+from extensions import db
+from models import Product
+from catalog import touch_products, touch_where
+from stock_ledger import record_movements, REASON_INITIAL, REASON_IMPORT
+from low_stock import refresh as refresh_low_stock
+
+CHUNK_SIZE = 500
+
+# Lower-cased header -> field, for the headers supplier sheets actually use
+COLUMN_ALIASES = {
+    'sku': 'sku', 'barcode': 'sku', 'code': 'sku', 'item code': 'sku', 'product code': 'sku',
+    'name': 'name', 'product': 'name', 'product name': 'name', 'item': 'name', 'item name': 'name',
+    'price': 'price', 'unit price': 'price', 'retail price': 'price', 'sale price': 'price',
+    'stock': 'stock', 'qty': 'stock', 'quantity': 'stock', 'on hand': 'stock',
+    'category': 'category', 'group': 'category',
+}
+
+PRICE_MODES = ('percent', 'absolute')
+
+
+def read_table(f, filename: str) -> pd.DataFrame:
+    """Read an uploaded CSV or Excel file with every cell as text."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        df = pd.read_csv(f, dtype=str, keep_default_na=False)
+    elif name.endswith(('.xlsx', '.xls', '.xltm')):
+        df = pd.read_excel(f, dtype=str, keep_default_na=False,
+                           engine='openpyxl' if name.endswith(('.xlsx', '.xltm')) else None)
+    else:
+        raise ValueError('Supported formats: CSV, Excel (.xlsx, .xls, .xltm)')
+    return df
+
+
+def _number(raw: str, what: str) -> Decimal | None:
+    raw = raw.replace(',', '').strip()
+    if not raw:
+        return None
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise ValueError(f'Invalid {what}: {raw!r}')
+    if not value.is_finite() or value < 0:
+        raise ValueError(f'Invalid {what}: {raw!r}')
+    return value
+
+
+def parse_rows(df: pd.DataFrame) -> tuple[list[tuple[int, dict]], list[dict]]:
+    """Validate the sheet; returns ``(line, row)`` pairs and the rejected lines."""
+    columns = {}
+    for col in df.columns:
+        field = COLUMN_ALIASES.get(str(col).strip().lower())
+        if field and field not in columns:
+            columns[field] = col
+    if 'sku' not in columns:
+        raise ValueError('The file needs a SKU column')
+
+    rows, rejects, seen = [], [], {}
+    for line, record in enumerate(df.to_dict('records'), start=2):  # line 1 is the header
+        cell = {f: str(record[c]).strip() for f, c in columns.items()}
+        sku = cell['sku']
+        try:
+            if not sku:
+                raise ValueError('Missing SKU')
+            if sku in seen:
+                raise ValueError(f'Duplicate SKU (also on line {seen[sku]})')
+            price = _number(cell.get('price', ''), 'price')
+            stock = _number(cell.get('stock', ''), 'stock')
+            if stock is not None and stock != stock.to_integral_value():
+                raise ValueError(f'Invalid stock: {cell["stock"]!r}')
+        except ValueError as e:
+            rejects.append({'line': line, 'sku': sku, 'error': str(e)})
+            continue
+        seen[sku] = line
+        rows.append((line, {
+            'sku': sku[:60],
+            'name': cell.get('name', '')[:140] or None,
+            'price': float(price) if price is not None else None,
+            'stock': int(stock) if stock is not None else None,
+            'category': cell.get('category', '')[:80] or None,
+        }))
+    return rows, rejects
+
+
+def import_products(df: pd.DataFrame, user_id=None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Create or update products by SKU; caller handles rollback on error."""
+    rows, rejects = parse_rows(df)
+    ref = f'user:{user_id}'
+    created = updated = unchanged = 0
+    touched, movements = [], []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        existing = {p.sku: p for p in db.session.execute(
+            select(Product.id, Product.sku, Product.name, Product.price, Product.stock,
+                   Product.category, Product.is_active)
+            .where(Product.sku.in_([r['sku'] for _, r in chunk]))
+            .with_for_update()
+        ).all()}
+        inserts, updates = [], []
+        for line, r in chunk:
+            cur = existing.get(r['sku'])
+            if cur is None:
+                if not r['name']:
+                    rejects.append({'line': line, 'sku': r['sku'], 'error': 'Name is required for a new product'})
+                    continue
+                inserts.append({'sku': r['sku'], 'name': r['name'], 'price': r['price'] or 0.0,
+                                'stock': r['stock'] or 0, 'category': r['category'], 'is_active': True})
+                continue
+            # Blank cells keep the current value
+            new = {
+                'id': cur.id,
+                'name': r['name'] or cur.name,
+                'price': cur.price if r['price'] is None else r['price'],
+                'stock': cur.stock if r['stock'] is None else r['stock'],
+                'category': r['category'] or cur.category,
+                'is_active': True,
+            }
+            if all(new[k] == getattr(cur, k) for k in new):
+                unchanged += 1
+                continue
+            updates.append(new)
+            movements.append({'product_id': cur.id, 'delta': new['stock'] - cur.stock,
+                              'reason': REASON_IMPORT, 'ref': ref})
+        if updates:
+            db.session.execute(update(Product), updates)
+            touched.extend(u['id'] for u in updates)
+            updated += len(updates)
+        if inserts:
+            db.session.execute(insert(Product), inserts)
+            stock_by_sku = {r['sku']: r['stock'] for r in inserts}
+            for pid, sku in db.session.execute(
+                select(Product.id, Product.sku).where(Product.sku.in_(stock_by_sku))
+            ).all():
+                touched.append(pid)
+                movements.append({'product_id': pid, 'delta': stock_by_sku[sku],
+                                  'reason': REASON_INITIAL, 'ref': ref})
+            created += len(inserts)
+    touch_products(touched)
+    record_movements(movements)
+    refresh_low_stock(touched)
+    db.session.commit()
+    rejects.sort(key=lambda r: r['line'])
+    return {'ok': True, 'created': created, 'updated': updated, 'unchanged': unchanged,
+            'rejected': len(rejects), 'rejects': rejects}
+
+
+def change_prices(mode: str, value: float, category: str | None = None) -> dict:
+    """Raise or cut active prices by ``value`` percent or by a fixed amount."""
+    if mode not in PRICE_MODES:
+        raise ValueError(f'mode must be one of {list(PRICE_MODES)}')
+    if not math.isfinite(value) or (mode == 'percent' and value <= -100):
+        raise ValueError('Invalid value')
+    if mode == 'percent':
+        price = Product.price * (1 + value / 100.0)
+    else:
+        price = Product.price + value
+    # Rounded to cents and floored at zero inside the same statement
+    price = func.round(cast(case((price < 0, 0), else_=price), Numeric(12, 4)), 2)
+    criteria = [Product.is_active.is_(True)]
+    if category:
+        criteria.append(func.lower(Product.category) == category.strip().lower())
+    count = touch_where(*criteria, price=price)
+    db.session.commit()
+    return {'ok': True, 'updated': count, 'mode': mode, 'value': value, 'category': category or None}
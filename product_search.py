@@ -0,0 +1,54 @@
+"""Indexed product lookups for the POS and inventory screens.
+
+``find_by_sku`` is the barcode path: one equality probe on the unique
+``product.sku`` index. ``search_products`` serves the search box: on SQLite
+it matches through the ``product_fts`` trigram table (see models.py), on
+Postgres the ILIKE is answered from the pg_trgm GIN indexes. Queries
+shorter than a trigram, or a database without the FTS table (created
+before it existed, or on SQLite older than 3.34), fall back to a plain
+ILIKE.
+"""
+from sqlalchemy import select, text, column
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Product
+
+MIN_TRIGRAM_CHARS = 3
+
+
+def find_by_sku(sku: str) -> Product | None:
+    return db.session.execute(
+        select(Product).where(Product.sku == sku.strip(), Product.is_active.is_(True))
+    ).scalar_one_or_none()
+
+
+def _ilike(q: str, limit: int | None) -> list[Product]:
+    return db.session.execute(
+        select(Product)
+        .where(Product.is_active.is_(True), Product.name.ilike(f'%{q}%') | Product.sku.ilike(f'%{q}%'))
+        .order_by(Product.name)
+        .limit(limit)
+    ).scalars().all()
+
+
+def search_products(q: str, limit: int | None = None) -> list[Product]:
+    """Active products matching ``q`` by name, all of them unless ``limit`` is given."""
+    q = q.strip()
+    dialect = db.session.get_bind().dialect.name
+    if dialect != 'sqlite' or len(q) < MIN_TRIGRAM_CHARS:
+        return _ilike(q, limit)
+    # Quote as one FTS phrase so user input can't use query syntax
+    phrase = '"' + q.replace('"', '""') + '"'
+    matches = text("SELECT rowid FROM product_fts WHERE product_fts MATCH :q").bindparams(q=phrase)
+    try:
+        return db.session.execute(
+            select(Product)
+            .where(Product.id.in_(matches.columns(column('rowid'))), Product.is_active.is_(True))
+            .order_by(Product.name)
+            .limit(limit)
+        ).scalars().all()
+    except OperationalError:
+        # No product_fts table in this database
+        db.session.rollback()
+        return _ilike(q, limit)
@@ -0,0 +1,111 @@
+"""Daily fee-reminder plan spread over a send window.
+
+Instead of queuing every reminder for the moment the cron job fires, the
+plan gives each message its own ``next_attempt_at`` evenly spaced across
+the window (``SCHEDULE_TIME_HH:MM`` + ``REMINDER_WINDOW_MINUTES``), so the
+outbox drains a steady trickle. At most ``REMINDER_DAILY_CAP`` WhatsApp
+messages are queued per day; members beyond the cap are picked up by the
+next day's plan. Progress lives in the outbox rows themselves, so a restart
+simply keeps draining them, and the ``reminder_plan`` row stops a second
+run on the same day from planning again.
+"""
+import os
+from datetime import datetime, date, time, timedelta, timezone
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import OutboundMessage, ReminderPlan
+
+
+def window_config() -> dict:
+    return {
+        'start': time(int(os.getenv('SCHEDULE_TIME_HH', '9')), int(os.getenv('SCHEDULE_TIME_MM', '0'))),
+        'minutes': int(os.getenv('REMINDER_WINDOW_MINUTES') or 180),
+        'daily_cap': int(os.getenv('REMINDER_DAILY_CAP') or 1000),
+    }
+
+
+def _to_utc(local: datetime) -> datetime:
+    # Scheduler times are local wall-clock; the outbox works in naive UTC
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _day_bounds_utc(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time())
+    return _to_utc(start), _to_utc(start + timedelta(days=1))
+
+
+def _whatsapp_queued_between(start: datetime, end: datetime) -> int:
+    return db.session.execute(
+        select(func.count()).select_from(OutboundMessage)
+        .where(OutboundMessage.channel == 'whatsapp',
+               OutboundMessage.created_at >= start, OutboundMessage.created_at < end)
+    ).scalar() or 0
+
+
+def plan_reminders(now: datetime | None = None) -> dict:
+    """Queue today's reminders spread over the window; no-op if already planned."""
+    from blueprints.communications import send_bulk_template_reminders, send_bulk_text_reminders
+    now = now or datetime.now()
+    day = now.date()
+    if db.session.get(ReminderPlan, day) is not None:
+        return plan_status(day)
+
+    cfg = window_config()
+    start = max(datetime.combine(day, cfg['start']), now)
+    end = max(datetime.combine(day, cfg['start']) + timedelta(minutes=cfg['minutes']), start)
+    window = (_to_utc(start), _to_utc(end))
+    cap_left = max(cfg['daily_cap'] - _whatsapp_queued_between(*_day_bounds_utc(day)), 0)
+
+    if os.getenv('WHATSAPP_TEMPLATE_FEE_REMINDER_NAME'):
+        res = send_bulk_template_reminders(now.year, now.month, limit=cap_left, window=window)
+    else:
+        res = send_bulk_text_reminders(now.year, now.month, limit=cap_left, window=window)
+    if not res.get('ok'):
+        return res
+
+    db.session.add(ReminderPlan(plan_date=day, window_start=window[0], window_end=window[1],
+                                daily_cap=cfg['daily_cap'], planned=res.get('queued', 0),
+                                deferred=res.get('deferred', 0)))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Planned concurrently elsewhere; the outbox keys already de-duplicated the messages
+        db.session.rollback()
+    return plan_status(day)
+
+
+def plan_status(day: date | None = None) -> dict:
+    day = day or datetime.now().date()
+    plan = db.session.get(ReminderPlan, day)
+    if plan is None:
+        return {'ok': True, 'date': day.isoformat(), 'planned': 0, 'exists': False}
+    start, end = _day_bounds_utc(day)
+    reminders = (
+        OutboundMessage.idempotency_key.like('fee-reminder:whatsapp:%'),
+        OutboundMessage.created_at >= start,
+        OutboundMessage.created_at < end,
+    )
+    by_status = dict(db.session.execute(
+        select(OutboundMessage.status, func.count()).where(*reminders).group_by(OutboundMessage.status)
+    ).all())
+    next_send = db.session.execute(
+        select(func.min(OutboundMessage.next_attempt_at))
+        .where(*reminders, OutboundMessage.status == 'pending')
+    ).scalar()
+    return {
+        'ok': True,
+        'exists': True,
+        'date': day.isoformat(),
+        'window_start': plan.window_start.isoformat(),
+        'window_end': plan.window_end.isoformat(),
+        'daily_cap': plan.daily_cap,
+        'planned': plan.planned,
+        'deferred': plan.deferred,
+        'sent': by_status.get('sent', 0),
+        'dead': by_status.get('dead', 0),
+        'remaining': by_status.get('pending', 0) + by_status.get('sending', 0),
+        'next_send_at': next_send.isoformat() if next_send else None,
+    }
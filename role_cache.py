@@ -0,0 +1,104 @@
+"""Cached user roles for the admin checks.
+
+Admin checks used to load the ``User`` row on every request. ``RoleCache``
+keeps each user's role at two levels:
+
+- on ``flask.g``, so a request looks a user up at most once;
+- in a process-wide map for ``ROLE_CACHE_TTL_SECONDS`` (30).
+
+Users written by a session are noted at flush and dropped from the cache
+only once that session commits, so a concurrent request cannot re-cache the
+old committed role in between; a rollback drops the notes. A lookup that
+raced with a commit is not cached. Other workers pick the change up once
+their entries expire.
+"""
+import os
+import threading
+import time
+
+from flask import g, has_app_context
+from sqlalchemy import event, select
+
+_PENDING_KEY = 'role_cache_users'
+
+
+def _ttl() -> float:
+    return float(os.getenv('ROLE_CACHE_TTL_SECONDS') or 30)
+
+
+class RoleCache:
+    def __init__(self, db, user_model):
+        self.db = db
+        self.user_model = user_model
+        self._roles: dict[int, tuple[float, str | None]] = {}
+        # Bumped by every invalidation; a lookup that saw it change doesn't store its result
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        def after_flush(session, flush_context):
+            ids = {obj.id for obj in (*session.new, *session.dirty, *session.deleted)
+                   if isinstance(obj, user_model)}
+            if ids:
+                session.info.setdefault(_PENDING_KEY, set()).update(ids)
+
+        def after_commit(session):
+            for uid in session.info.pop(_PENDING_KEY, ()):
+                self.invalidate_user(uid)
+
+        def after_soft_rollback(session, previous_transaction):
+            # A savepoint rollback leaves the outer transaction's writes pending
+            if not session.in_transaction():
+                session.info.pop(_PENDING_KEY, None)
+
+        event.listen(db.session, 'after_flush', after_flush)
+        event.listen(db.session, 'after_commit', after_commit)
+        event.listen(db.session, 'after_soft_rollback', after_soft_rollback)
+
+    def _request_cache(self) -> dict | None:
+        if not has_app_context():
+            return None
+        if '_role_cache' not in g:
+            g._role_cache = {}
+        return g._role_cache
+
+    def role(self, user_id) -> str | None:
+        """The user's role ('staff' when unset), or None if there is no such user."""
+        if not user_id:
+            return None
+        local = self._request_cache()
+        if local is not None and user_id in local:
+            return local[user_id]
+        now = time.monotonic()
+        with self._lock:
+            hit = self._roles.get(user_id)
+            generation = self._generation
+        if hit and hit[0] > now:
+            role = hit[1]
+        else:
+            row = self.db.session.execute(
+                select(self.user_model.role).where(self.user_model.id == user_id)
+            ).first()
+            role = (row[0] or 'staff') if row else None
+            with self._lock:
+                if self._generation == generation:
+                    self._roles[user_id] = (now + _ttl(), role)
+        if local is not None:
+            local[user_id] = role
+        return role
+
+    def is_admin(self, user_id) -> bool:
+        return self.role(user_id) == 'admin'
+
+    def invalidate_user(self, user_id=None) -> None:
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._roles.clear()
+            else:
+                self._roles.pop(user_id, None)
+        local = self._request_cache()
+        if local is not None:
+            if user_id is None:
+                local.clear()
+            else:
+                local.pop(user_id, None)
@@ -0,0 +1,295 @@
+"""Background mirroring of POS sales to Google Sheets and Drive.
+
+Checkout only inserts a ``sale_mirror_queue`` row in the sale's own
+transaction. A background thread wakes every
+``SALE_MIRROR_INTERVAL_SECONDS``, leases up to ``SALE_MIRROR_BATCH`` due
+rows and writes them out with one Sheets ``values().append`` carrying every
+row, plus one Drive CSV for the whole batch. Each target is tracked
+separately on the queue row, so a Drive failure never re-appends rows that
+already reached the sheet. Failures back off exponentially and give up
+after ``SALE_MIRROR_MAX_ATTEMPTS``; a configured target whose credentials
+or client library are missing counts as a failure, not as done.
+
+Credentials and discovery clients are built once per process and reused;
+the service-account token is refreshed by google-auth only when it expires.
+"""
+import csv
+import io
+import json
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import selectinload
+
+try:
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaIoBaseUpload
+    HAVE_GOOGLE = True
+except Exception:
+    HAVE_GOOGLE = False
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_DONE = 'done'
+STATUS_DEAD = 'dead'
+
+LEASE_SECONDS = 300
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive.file']
+
+
+def _interval_seconds() -> float:
+    return float(os.getenv('SALE_MIRROR_INTERVAL_SECONDS') or 30)
+
+
+def _batch_size() -> int:
+    return int(os.getenv('SALE_MIRROR_BATCH') or 500)
+
+
+def _max_attempts() -> int:
+    return int(os.getenv('SALE_MIRROR_MAX_ATTEMPTS') or 8)
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(30 * 2 ** max(attempts - 1, 0), 3600))
+
+
+class GoogleServices:
+    """Service-account credentials and discovery clients, built once.
+
+    httplib2 is not thread-safe, so callers hold ``lock`` while using a
+    client; in practice only the mirror thread does.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._credentials = None
+        self._services: dict[tuple[str, str], object] = {}
+
+    def unavailable_reason(self) -> str | None:
+        """Why no client can be built, or None when credentials and library are in place."""
+        if not HAVE_GOOGLE:
+            return 'google-api-python-client not installed'
+        sa_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE')
+        if not sa_file or not os.path.exists(sa_file):
+            return 'GOOGLE_SERVICE_ACCOUNT_FILE missing or unreadable'
+        return None
+
+    def available(self) -> bool:
+        return self.unavailable_reason() is None
+
+    def service(self, api: str, version: str):
+        with self.lock:
+            if (api, version) not in self._services:
+                if self._credentials is None:
+                    self._credentials = service_account.Credentials.from_service_account_file(
+                        os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE'), scopes=SCOPES)
+                # SALES_SHEET_API_ENDPOINT points Sheets at a proxy or local stand-in
+                endpoint = os.getenv('SALES_SHEET_API_ENDPOINT') if api == 'sheets' else None
+                self._services[(api, version)] = build(
+                    api, version, credentials=self._credentials, cache_discovery=False,
+                    client_options={'api_endpoint': endpoint} if endpoint else None)
+            return self._services[(api, version)]
+
+    def reset(self) -> None:
+        with self.lock:
+            self._credentials = None
+            self._services.clear()
+
+
+def targets_configured() -> bool:
+    """Whether a sheet or Drive folder is set up to mirror sales to."""
+    return bool(os.getenv('SALES_SHEET_ID') or os.getenv('DRIVE_FOLDER_ID'))
+
+
+def sheet_row(sale) -> list:
+    return [
+        sale.invoice_number,
+        sale.created_at.isoformat() if sale.created_at else '',
+        sale.customer_name or '',
+        sale.total,
+        sale.payment_method or '',
+        json.dumps([item.to_dict() for item in sale.items]),
+    ]
+
+
+def sales_csv(sales) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['invoice_number', 'created_at', 'customer', 'payment_method', 'sale_total',
+                     'item', 'qty', 'price', 'total'])
+    for sale in sales:
+        head = [sale.invoice_number, sale.created_at.isoformat() if sale.created_at else '',
+                sale.customer_name or '', sale.payment_method or '', sale.total]
+        for item in sale.items:
+            writer.writerow(head + [item.name, item.quantity, item.unit_price, item.total_price])
+    return out.getvalue().encode('utf-8')
+
+
+class SaleMirror:
+    def __init__(self, db, queue_model, sale_model, services: GoogleServices | None = None):
+        self.db = db
+        self.queue_model = queue_model
+        self.sale_model = sale_model
+        self.services = services or GoogleServices()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def enqueue(self, sale_id: int) -> None:
+        """Queue a sale; the row commits (or rolls back) with the caller's transaction."""
+        self.db.session.add(self.queue_model(sale_id=sale_id, status=STATUS_PENDING,
+                                             next_attempt_at=datetime.utcnow()))
+
+    def claim(self, limit: int, now: datetime | None = None) -> list:
+        Q = self.queue_model
+        now = now or datetime.utcnow()
+        token = secrets.token_hex(16)
+        ids = list(self.db.session.execute(
+            select(Q.sale_id)
+            .where(Q.status.in_((STATUS_PENDING, STATUS_SENDING)), Q.next_attempt_at <= now)
+            .order_by(Q.next_attempt_at, Q.sale_id)
+            .limit(limit)
+        ).scalars())
+        if not ids:
+            return []
+        # Compare-and-set: rows another worker leased meanwhile no longer match
+        self.db.session.execute(
+            update(Q)
+            .where(Q.sale_id.in_(ids), Q.status.in_((STATUS_PENDING, STATUS_SENDING)), Q.next_attempt_at <= now)
+            .values(status=STATUS_SENDING, lease_token=token, next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.session.commit()
+        return list(self.db.session.execute(
+            select(Q).where(Q.lease_token == token).order_by(Q.sale_id)
+        ).scalars())
+
+    def _append_to_sheet(self, sales) -> None:
+        sheets = self.services.service('sheets', 'v4')
+        sheets.spreadsheets().values().append(
+            spreadsheetId=os.getenv('SALES_SHEET_ID'),
+            range=os.getenv('SALES_SHEET_RANGE', 'Sheet1!A:F'),
+            valueInputOption='USER_ENTERED',
+            insertDataOption='INSERT_ROWS',
+            body={'values': [sheet_row(s) for s in sales]},
+        ).execute()
+
+    def _upload_csv(self, sales) -> None:
+        drive = self.services.service('drive', 'v3')
+        media = MediaIoBaseUpload(io.BytesIO(sales_csv(sales)), mimetype='text/csv', resumable=False)
+        name = f"sales_{sales[0].invoice_number}_to_{sales[-1].invoice_number}.csv"
+        drive.files().create(body={'name': name, 'parents': [os.getenv('DRIVE_FOLDER_ID')]},
+                             media_body=media, fields='id').execute()
+
+    def flush(self, limit: int | None = None) -> dict:
+        """Mirror one batch of due sales; returns counts for the admin view."""
+        rows = self.claim(limit or _batch_size())
+        if not rows:
+            return {'claimed': 0, 'done': 0, 'retried': 0, 'dead': 0}
+        sales = {s.id: s for s in self.db.session.execute(
+            select(self.sale_model)
+            .where(self.sale_model.id.in_([r.sale_id for r in rows]))
+            .options(selectinload(self.sale_model.items))
+        ).scalars()}
+
+        unavailable = self.services.unavailable_reason()
+        targets = {
+            'sheet_done': (self._append_to_sheet, bool(os.getenv('SALES_SHEET_ID'))),
+            'drive_done': (self._upload_csv, bool(os.getenv('DRIVE_FOLDER_ID'))),
+        }
+        errors = {}
+        outcome = {r.sale_id: {'sheet_done': r.sheet_done, 'drive_done': r.drive_done} for r in rows}
+        for flag, (write, configured) in targets.items():
+            todo = [r.sale_id for r in rows if not getattr(r, flag) and r.sale_id in sales]
+            if not todo:
+                continue
+            if not configured:
+                # Nothing to mirror to; don't keep the rows waiting for a target that isn't set up
+                for sid in todo:
+                    outcome[sid][flag] = True
+                continue
+            if unavailable:
+                # A target is set but can't be reached: retry and end up dead, never silently done
+                errors[flag] = unavailable
+                continue
+            try:
+                with self.services.lock:
+                    write([sales[sid] for sid in todo])
+                for sid in todo:
+                    outcome[sid][flag] = True
+            except Exception as e:
+                errors[flag] = str(e)[:500]
+
+        now = datetime.utcnow()
+        updates = []
+        done = retried = dead = 0
+        for r in rows:
+            flags = outcome[r.sale_id]
+            row = {'sale_id': r.sale_id, 'lease_token': None, **flags}
+            if r.sale_id not in sales or all(flags.values()):
+                done += 1
+                row.update(status=STATUS_DONE, mirrored_at=now, last_error=None)
+            else:
+                attempts = r.attempts + 1
+                error = '; '.join(errors[f] for f, ok in flags.items() if not ok and f in errors)
+                if attempts >= _max_attempts():
+                    dead += 1
+                    row.update(status=STATUS_DEAD, attempts=attempts, last_error=error)
+                else:
+                    retried += 1
+                    row.update(status=STATUS_PENDING, attempts=attempts, last_error=error,
+                               next_attempt_at=now + _backoff(attempts))
+            updates.append(row)
+        try:
+            self.db.session.execute(update(self.queue_model), updates)
+            self.db.session.commit()
+        except Exception:
+            self.db.session.rollback()
+            raise
+        return {'claimed': len(rows), 'done': done, 'retried': retried, 'dead': dead, 'errors': errors}
+
+    def drain(self) -> dict:
+        """Flush until nothing is due (used by the admin 'mirror now' action)."""
+        total = {'claimed': 0, 'done': 0, 'retried': 0, 'dead': 0}
+        while True:
+            res = self.flush()
+            for k in total:
+                total[k] += res[k]
+            if res['claimed'] < _batch_size() or not res['done']:
+                return total
+
+    def stats(self) -> dict:
+        Q = self.queue_model
+        counts = dict(self.db.session.execute(select(Q.status, func.count()).group_by(Q.status)).all())
+        oldest = self.db.session.execute(
+            select(func.min(Q.created_at)).where(Q.status.in_((STATUS_PENDING, STATUS_SENDING)))
+        ).scalar()
+        return {
+            'by_status': counts,
+            'oldest_pending': oldest.isoformat() if oldest else None,
+            'interval_seconds': _interval_seconds(),
+        }
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def start(self, app) -> None:
+        """Start the background mirror thread (once per process)."""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                self._wake.wait(_interval_seconds())
+                self._wake.clear()
+                with app.app_context():
+                    try:
+                        self.flush()
+                    except Exception:
+                        self.db.session.rollback()
+
+        self._thread = threading.Thread(target=loop, name='sale-mirror', daemon=True)
+        self._thread.start()
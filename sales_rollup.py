@@ -0,0 +1,182 @@
+"""Pre-aggregated POS sales for reporting.
+
+Checkout adds each sale into two small rollup tables in its own
+transaction:
+
+- ``sales_daily_product``: quantity and line revenue per (day, product_id),
+  so best-sellers follow the product rather than whatever name was printed
+  on old receipts;
+- ``sales_hourly``: sale count and revenue per (day, hour, payment method),
+  which answers the hour-of-day, weekday and payment-mix questions.
+
+Days and hours are server-local wall clock, matching the reminder
+scheduler. Reports read only the rollups, so their cost depends on the
+date range, not on the size of the sales history. ``rebuild`` recomputes a
+range from ``sale``/``sale_item`` for backfills or repairs.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, insert, update, func
+
+from extensions import db, upsert_insert
+from models import Sale, SaleItem, Product, SalesDailyProduct, SalesHourly
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def _local(ts: datetime) -> datetime:
+    # Sales are stored in naive UTC; reports bucket by local wall clock
+    return ts.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def _utc(local: datetime) -> datetime:
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _aggregate(sales) -> tuple[list[dict], list[dict]]:
+    products: dict[tuple, dict] = {}
+    hourly: dict[tuple, dict] = {}
+    for sale in sales:
+        when = _local(sale.created_at or datetime.utcnow())
+        key = (when.date(), when.hour, sale.payment_method or '')
+        h = hourly.setdefault(key, {'day': key[0], 'hour': key[1], 'payment_method': key[2],
+                                    'sales_count': 0, 'revenue': 0.0})
+        h['sales_count'] += 1
+        h['revenue'] += float(sale.total or 0.0)
+        for item in sale.items:
+            if item.product_id is None:
+                continue
+            pkey = (when.date(), item.product_id)
+            p = products.setdefault(pkey, {'day': pkey[0], 'product_id': pkey[1], 'name': item.name,
+                                           'quantity': 0, 'revenue': 0.0})
+            p['quantity'] += item.quantity
+            p['revenue'] += float(item.total_price or 0.0)
+    return list(products.values()), list(hourly.values())
+
+
+def _upsert_add(model, keys: tuple[str, ...], rows: list[dict], counters: tuple[str, ...]) -> None:
+    """Insert rows or add their counters onto the existing ones."""
+    if not rows:
+        return
+    table = model.__table__
+    stmt = upsert_insert(table)
+    if stmt is not None:
+        set_ = {c: table.c[c] + stmt.excluded[c] for c in counters}
+        if 'name' in table.c:
+            set_['name'] = stmt.excluded.name
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=set_), rows)
+        return
+    for row in rows:
+        res = db.session.execute(
+            update(table)
+            .where(*(table.c[k] == row[k] for k in keys))
+            .values({c: table.c[c] + row[c] for c in counters})
+        )
+        if res.rowcount == 0:
+            db.session.execute(insert(table), [row])
+
+
+def record_sales(sales) -> None:
+    """Add freshly inserted sales (with items) to the rollups; caller commits."""
+    products, hourly = _aggregate(sales)
+    _upsert_add(SalesDailyProduct, ('day', 'product_id'), products, ('quantity', 'revenue'))
+    _upsert_add(SalesHourly, ('day', 'hour', 'payment_method'), hourly, ('sales_count', 'revenue'))
+
+
+class _WithItems:
+    """A sale plus preloaded items, without touching the lazy relationship."""
+
+    def __init__(self, sale, items):
+        self.created_at = sale.created_at
+        self.payment_method = sale.payment_method
+        self.total = sale.total
+        self.items = items
+
+
+def rebuild(start: date, end: date, batch_size: int = 1000) -> dict:
+    """Recompute the rollups for local days ``start``..``end`` inclusive."""
+    lo = _utc(datetime.combine(start, time()))
+    hi = _utc(datetime.combine(end + timedelta(days=1), time()))
+    db.session.execute(delete(SalesDailyProduct).where(SalesDailyProduct.day.between(start, end)))
+    db.session.execute(delete(SalesHourly).where(SalesHourly.day.between(start, end)))
+    sales = db.session.execute(
+        select(Sale).where(Sale.created_at >= lo, Sale.created_at < hi)
+        .execution_options(yield_per=batch_size)
+    ).scalars()
+    count = 0
+    for chunk in sales.partitions():
+        # Items for the whole chunk in one IN query
+        items = defaultdict(list)
+        for item in db.session.execute(
+            select(SaleItem).where(SaleItem.sale_id.in_([s.id for s in chunk]))
+        ).scalars():
+            items[item.sale_id].append(item)
+        products, hourly = _aggregate(_WithItems(s, items[s.id]) for s in chunk)
+        _upsert_add(SalesDailyProduct, ('day', 'product_id'), products, ('quantity', 'revenue'))
+        _upsert_add(SalesHourly, ('day', 'hour', 'payment_method'), hourly, ('sales_count', 'revenue'))
+        count += len(chunk)
+    db.session.commit()
+    return {'ok': True, 'sales': count, 'from': start.isoformat(), 'to': end.isoformat()}
+
+
+def sales_report(start: date, end: date, top: int = 10) -> dict:
+    """Best-sellers, hour/weekday revenue and payment mix for local days ``start``..``end``."""
+    best = db.session.execute(
+        select(
+            SalesDailyProduct.product_id,
+            func.coalesce(Product.name, func.max(SalesDailyProduct.name)),
+            func.sum(SalesDailyProduct.quantity).label('quantity'),
+            func.sum(SalesDailyProduct.revenue).label('revenue'),
+        )
+        .outerjoin(Product, Product.id == SalesDailyProduct.product_id)
+        .where(SalesDailyProduct.day.between(start, end))
+        .group_by(SalesDailyProduct.product_id, Product.name)
+        .order_by(func.sum(SalesDailyProduct.quantity).desc(), SalesDailyProduct.product_id)
+        .limit(top)
+    ).all()
+
+    rows = db.session.execute(
+        select(SalesHourly.day, SalesHourly.hour, SalesHourly.payment_method,
+               SalesHourly.sales_count, SalesHourly.revenue)
+        .where(SalesHourly.day.between(start, end))
+    ).all()
+    df = pd.DataFrame(rows, columns=['day', 'hour', 'payment_method', 'sales_count', 'revenue'])
+    if df.empty:
+        heat = np.zeros((7, 24))
+        counts = np.zeros((7, 24), dtype=np.int64)
+        methods = {}
+    else:
+        weekday = pd.to_datetime(df['day']).dt.weekday.to_numpy()
+        cell = weekday * 24 + df['hour'].to_numpy()
+        heat = np.bincount(cell, weights=df['revenue'].to_numpy(), minlength=168).reshape(7, 24)
+        counts = np.bincount(cell, weights=df['sales_count'].to_numpy(), minlength=168).reshape(7, 24).astype(np.int64)
+        by_method = df.groupby('payment_method')[['sales_count', 'revenue']].sum()
+        total_rev = float(by_method['revenue'].sum())
+        methods = {
+            (m or 'unknown'): {
+                'count': int(r.sales_count),
+                'revenue': round(float(r.revenue), 2),
+                'share': round(float(r.revenue) / total_rev, 4) if total_rev else None,
+            }
+            for m, r in by_method.iterrows()
+        }
+
+    return {
+        'ok': True,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'sales': int(counts.sum()),
+        'revenue': round(float(heat.sum()), 2),
+        'best_sellers': [
+            {'product_id': pid, 'name': name, 'quantity': int(qty), 'revenue': round(float(rev), 2)}
+            for pid, name, qty, rev in best
+        ],
+        'by_hour': np.round(heat.sum(axis=0), 2).tolist(),
+        'by_weekday': dict(zip(WEEKDAYS, np.round(heat.sum(axis=1), 2).tolist())),
+        # Rows are weekdays (Mon..Sun), columns hours 0..23
+        'heatmap': {'revenue': np.round(heat, 2).tolist(), 'sales': counts.tolist()},
+        'payment_methods': methods,
+    }
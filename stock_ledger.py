@@ -0,0 +1,195 @@
+"""Stock movement ledger with daily snapshots.
+
+``product.stock`` stays the live figure the tills check, but every change to
+it also inserts a ``stock_movement`` row (delta, reason, ref) in the same
+transaction, so the ledger always sums to the live stock. A nightly job
+writes ``stock_snapshot`` rows: each product's stock and price at the end of
+a local day.
+
+A question about a past date starts from the nearest snapshot on or before
+it and adds the movements in between; dates before the first snapshot walk
+back from the next one, or from the live stock. Either way only the
+movements of one window are read, never the whole history.
+
+Days are server-local wall clock, like the sales rollups.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import select, delete, insert, func, case
+
+from extensions import db
+from models import Product, StockMovement, StockSnapshot
+
+REASON_INITIAL = 'initial'
+REASON_SALE = 'sale'
+# Offline sales of stock the system no longer had; gives back what the zero floor cut off
+REASON_OVERSOLD = 'oversold'
+REASON_RESTOCK = 'restock'
+REASON_ADJUSTMENT = 'adjustment'
+REASON_DAMAGE = 'damage'
+# Stock counts set by a product import (see product_import.py)
+REASON_IMPORT = 'import'
+
+# Reasons an admin can give when editing stock by hand
+ADJUSTMENT_REASONS = (REASON_ADJUSTMENT, REASON_RESTOCK, REASON_DAMAGE)
+# Stock that left the shelf without being sold
+SHRINKAGE_REASONS = (REASON_ADJUSTMENT, REASON_DAMAGE)
+
+
+def _day_start(day: date) -> datetime:
+    # Movements are stored in naive UTC; convert a local midnight to match
+    return datetime.combine(day, time()).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def record_movements(rows) -> None:
+    """Insert ledger rows ``{'product_id', 'delta', 'reason', 'ref'}``; caller commits."""
+    now = datetime.utcnow()
+    rows = [{'ref': None, **r, 'created_at': now} for r in rows if r['delta']]
+    if rows:
+        db.session.execute(insert(StockMovement), rows)
+
+
+def _deltas(lo: datetime | None, hi: datetime | None) -> dict[int, int]:
+    stmt = select(StockMovement.product_id, func.sum(StockMovement.delta)).group_by(StockMovement.product_id)
+    if lo is not None:
+        stmt = stmt.where(StockMovement.created_at >= lo)
+    if hi is not None:
+        stmt = stmt.where(StockMovement.created_at < hi)
+    return {pid: int(total) for pid, total in db.session.execute(stmt).all()}
+
+
+def _live_at(cut: datetime) -> list[tuple[int, int, float]]:
+    """(product_id, stock, price) as of ``cut``: live stock minus later movements.
+
+    One statement, so stock and ledger are read from the same view.
+    """
+    later = (
+        select(StockMovement.product_id, func.sum(StockMovement.delta).label('delta'))
+        .where(StockMovement.created_at >= cut)
+        .group_by(StockMovement.product_id)
+        .subquery()
+    )
+    return db.session.execute(
+        select(Product.id, Product.stock - func.coalesce(later.c.delta, 0), Product.price)
+        .outerjoin(later, later.c.product_id == Product.id)
+    ).all()
+
+
+def _snapshot_stock(day: date) -> dict[int, int]:
+    return dict(db.session.execute(
+        select(StockSnapshot.product_id, StockSnapshot.stock).where(StockSnapshot.day == day)
+    ).all())
+
+
+def take_snapshot(day: date | None = None) -> dict:
+    """Write the snapshot for the end of local ``day`` (default: yesterday)."""
+    day = day or date.today() - timedelta(days=1)
+    rows = [
+        {'day': day, 'product_id': pid, 'stock': int(stock), 'unit_price': float(price or 0.0)}
+        for pid, stock, price in _live_at(_day_start(day + timedelta(days=1)))
+        if stock  # a missing row reads as zero
+    ]
+    db.session.execute(delete(StockSnapshot).where(StockSnapshot.day == day))
+    if rows:
+        db.session.execute(insert(StockSnapshot), rows)
+    db.session.commit()
+    return {'ok': True, 'day': day.isoformat(), 'products': len(rows)}
+
+
+def stock_on(day: date) -> dict[int, int]:
+    """Stock per product at the end of local ``day``; products at zero are left out."""
+    cut = _day_start(day + timedelta(days=1))
+    before = db.session.execute(select(func.max(StockSnapshot.day)).where(StockSnapshot.day <= day)).scalar()
+    if before is not None:
+        stock = _snapshot_stock(before)
+        for pid, delta in _deltas(_day_start(before + timedelta(days=1)), cut).items():
+            stock[pid] = stock.get(pid, 0) + delta
+    else:
+        after = db.session.execute(select(func.min(StockSnapshot.day)).where(StockSnapshot.day > day)).scalar()
+        if after is not None:
+            stock = _snapshot_stock(after)
+            for pid, delta in _deltas(cut, _day_start(after + timedelta(days=1))).items():
+                stock[pid] = stock.get(pid, 0) - delta
+        else:
+            stock = {pid: int(s) for pid, s, _ in _live_at(cut)}
+    return {pid: s for pid, s in stock.items() if s}
+
+
+def _products(day: date) -> dict[int, tuple[str, float]]:
+    """Name and unit price per product, priced as on ``day`` when a snapshot exists."""
+    products = {pid: (name, float(price or 0.0)) for pid, name, price in db.session.execute(
+        select(Product.id, Product.name, Product.price)
+    ).all()}
+    for pid, price in db.session.execute(
+        select(StockSnapshot.product_id, StockSnapshot.unit_price).where(StockSnapshot.day == day)
+    ).all():
+        if pid in products:
+            products[pid] = (products[pid][0], float(price))
+    return products
+
+
+def valuation(day: date) -> dict:
+    """Units on hand and their value (at selling price) at the end of ``day``."""
+    stock = stock_on(day)
+    products = _products(day)
+    rows = []
+    for pid, units in sorted(stock.items()):
+        name, price = products.get(pid, ('', 0.0))
+        rows.append({'product_id': pid, 'name': name, 'stock': units,
+                     'unit_price': price, 'value': round(units * price, 2)})
+    return {
+        'ok': True,
+        'date': day.isoformat(),
+        'units': sum(stock.values()),
+        'value': round(sum(r['value'] for r in rows), 2),
+        'products': rows,
+    }
+
+
+def audit(start: date, end: date) -> dict:
+    """Opening stock, movements by reason, shrinkage and closing stock for local days ``start``..``end``."""
+    opening = stock_on(start - timedelta(days=1))
+    moves: dict[int, dict[str, int]] = {}
+    shrink: dict[int, int] = {}
+    for pid, reason, net, lost in db.session.execute(
+        select(
+            StockMovement.product_id,
+            StockMovement.reason,
+            func.sum(StockMovement.delta),
+            func.sum(case((StockMovement.delta < 0, -StockMovement.delta), else_=0)),
+        )
+        .where(StockMovement.created_at >= _day_start(start),
+               StockMovement.created_at < _day_start(end + timedelta(days=1)))
+        .group_by(StockMovement.product_id, StockMovement.reason)
+    ).all():
+        moves.setdefault(pid, {})[reason] = int(net)
+        if reason in SHRINKAGE_REASONS:
+            shrink[pid] = shrink.get(pid, 0) + int(lost)
+
+    products = _products(end)
+    rows = []
+    for pid in sorted(set(opening) | set(moves)):
+        name, price = products.get(pid, ('', 0.0))
+        closing = opening.get(pid, 0) + sum(moves.get(pid, {}).values())
+        rows.append({
+            'product_id': pid,
+            'name': name,
+            'opening': opening.get(pid, 0),
+            'movements': moves.get(pid, {}),
+            'closing': closing,
+            'shrinkage': shrink.get(pid, 0),
+            'unit_price': price,
+            'closing_value': round(closing * price, 2),
+            'shrinkage_value': round(shrink.get(pid, 0) * price, 2),
+        })
+    return {
+        'ok': True,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'opening_units': sum(r['opening'] for r in rows),
+        'closing_units': sum(r['closing'] for r in rows),
+        'closing_value': round(sum(r['closing_value'] for r in rows), 2),
+        'shrinkage_units': sum(r['shrinkage'] for r in rows),
+        'shrinkage_value': round(sum(r['shrinkage_value'] for r in rows), 2),
+        'products': rows,
+    }
@@ -0,0 +1,189 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway SQLite file before app.py is imported, so the
+# suite never touches the real gym.db.
+_DB_FD, _DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(_DB_FD)
+os.environ['DATABASE_URL'] = 'sqlite:///' + _DB_PATH
+# Tests flush the WhatsApp status and login buffers explicitly; keep the background flushers idle
+os.environ['WHATSAPP_STATUS_FLUSH_SECONDS'] = '3600'
+os.environ['LOGIN_LOG_FLUSH_SECONDS'] = '3600'
+
+
+@pytest.fixture
+def app():
+    from app import app as flask_app
+    from extensions import db
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Recreated tables reuse ids; don't let cached roles leak between tests
+        from blueprints.decorators import role_cache
+        role_cache.invalidate_user()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def legacy_app(monkeypatch):
+    """The legacy monolith (app_legacy) with fresh tables, inside its app context."""
+    pytest.importorskip('authlib')
+    # app_legacy binds its own SQLAlchemy at import: give it a database of its own
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + path)
+    import app_legacy
+    with app_legacy.app.app_context():
+        app_legacy.db.drop_all()
+        app_legacy.db.create_all()
+        yield app_legacy
+        app_legacy.db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as c:
+        with c.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['username'] = 'tester'
+        yield c
+
+
+class GraphStandIn:
+    """Minimal local stand-in for graph.facebook.com used by WhatsApp tests.
+
+    Records every request; recipients listed in ``reject`` get a 400 reply.
+    """
+
+    def __init__(self, delay=0.0):
+        import itertools
+        import json
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        stand_in = self
+        self.requests = []
+        self.reject = set()
+        self.delay = delay
+        self._lock = threading.Lock()
+        ids = itertools.count(1)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if stand_in.delay:
+                    time.sleep(stand_in.delay)
+                is_json = (self.headers.get('Content-Type') or '').startswith('application/json')
+                payload = json.loads(body) if is_json else {}
+                with stand_in._lock:
+                    stand_in.requests.append({'path': self.path, 'json': payload, 'at': time.monotonic()})
+                    n = next(ids)
+                if payload.get('to') in stand_in.reject:
+                    status, reply = 400, {'error': {'message': 'invalid recipient'}}
+                elif self.path.endswith('/media'):
+                    status, reply = 200, {'id': f'media-{n}'}
+                else:
+                    status, reply = 200, {'messages': [{'id': f'wamid.{n}'}]}
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/v20.0'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def messages(self):
+        return [r for r in self.requests if r['path'].endswith('/messages')]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def graph_api(monkeypatch):
+    stand_in = GraphStandIn()
+    monkeypatch.setenv('WHATSAPP_GRAPH_URL', stand_in.url)
+    monkeypatch.setenv('WHATSAPP_TOKEN', 'test-token')
+    monkeypatch.setenv('WHATSAPP_PHONE_NUMBER_ID', '1234')
+    yield stand_in
+    stand_in.close()
+
+
+class SMTPStandIn:
+    """Local aiosmtpd server accepting any login; records delivered messages.
+
+    ``max_per_connection`` makes it answer 421 once a connection has carried
+    that many messages, like providers that cap messages per session.
+    """
+
+    def __init__(self, max_per_connection=None, delay=0.0):
+        import asyncio
+        import socket
+        import threading
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.smtp import AuthResult
+
+        stand_in = self
+        self.messages = []
+        self.peers = set()
+        self.max_per_connection = max_per_connection
+        self._per_peer = {}
+        self._lock = threading.Lock()
+
+        class Handler:
+            async def handle_DATA(self, server, session, envelope):
+                if delay:
+                    await asyncio.sleep(delay)
+                with stand_in._lock:
+                    stand_in.peers.add(session.peer)
+                    n = stand_in._per_peer.get(session.peer, 0)
+                    if stand_in.max_per_connection and n >= stand_in.max_per_connection:
+                        return '421 Too many messages on this connection'
+                    stand_in._per_peer[session.peer] = n + 1
+                    stand_in.messages.append({'to': envelope.rcpt_tos, 'data': envelope.content})
+                return '250 OK'
+
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        self.controller = Controller(
+            Handler(), hostname='127.0.0.1', port=self.port,
+            authenticator=lambda *a: AuthResult(success=True), auth_require_tls=False,
+        )
+        self.controller.start()
+
+    @property
+    def config(self):
+        return {'host': '127.0.0.1', 'port': self.port, 'user': 'gym@example.com',
+                'password': 'secret', 'use_tls': False, 'sender': 'gym@example.com'}
+
+    def close(self):
+        self.controller.stop()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    pytest.importorskip('aiosmtpd')
+    stand_in = SMTPStandIn()
+    monkeypatch.setenv('SMTP_HOST', '127.0.0.1')
+    monkeypatch.setenv('SMTP_PORT', str(stand_in.port))
+    monkeypatch.setenv('SMTP_USER', 'gym@example.com')
+    monkeypatch.setenv('SMTP_PASSWORD', 'secret')
+    monkeypatch.setenv('SMTP_TLS', '0')
+    yield stand_in
+    stand_in.close()
@@ -0,0 +1,50 @@
+from datetime import date
+
+from extensions import db
+from models import Member, Payment
+from blueprints.analytics import compute_cohort_matrix, _COHORT_CACHE
+
+
+def add_member(name, admission, paid_months):
+    m = Member(name=name, admission_date=admission)
+    db.session.add(m)
+    db.session.flush()
+    for year, month in paid_months:
+        db.session.add(Payment(member_id=m.id, year=year, month=month, status='Paid'))
+    return m
+
+
+def test_cohort_matrix_fractions(app):
+    add_member('A', date(2025, 1, 5), [(2025, 1), (2025, 2), (2025, 3)])
+    add_member('B', date(2025, 1, 20), [(2025, 1)])
+    add_member('C', date(2025, 2, 1), [(2025, 3)])
+    db.session.add(Payment(member_id=1, year=2025, month=4, status='Unpaid'))
+    db.session.commit()
+
+    res = compute_cohort_matrix(horizon=4, today=date(2025, 3, 15))
+    by_cohort = {c['cohort']: c for c in res['cohorts']}
+
+    assert by_cohort['2025-01']['size'] == 2
+    assert by_cohort['2025-01']['retention'] == [1.0, 0.5, 0.5, None]
+    assert by_cohort['2025-02']['retention'] == [0.0, 1.0, None, None]
+
+
+def test_cohort_endpoint_is_cached_per_day(client):
+    _COHORT_CACHE.clear()
+    add_member('A', date.today(), [(date.today().year, date.today().month)])
+    db.session.commit()
+
+    first = client.get('/api/analytics/cohorts?months=3').get_json()
+    assert first['cohorts'][0]['retention'][0] == 1.0
+
+    add_member('B', date.today(), [])
+    db.session.commit()
+    cached = client.get('/api/analytics/cohorts?months=3').get_json()
+    assert cached == first
+    fresh = client.get('/api/analytics/cohorts?months=3&refresh=1').get_json()
+    assert fresh['cohorts'][0]['size'] == 2
+
+
+def test_cohort_matrix_empty(app):
+    res = compute_cohort_matrix(horizon=3)
+    assert res['cohorts'] == []
@@ -0,0 +1,87 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip('twilio')
+import auto_messenger  # noqa: E402
+
+
+class TwilioStandIn:
+    """Records ``messages.create`` calls; numbers in ``reject`` raise."""
+
+    def __init__(self):
+        self.sent = []
+        self.reject = set()
+        self._lock = threading.Lock()
+        self.messages = self
+
+    def create(self, body, from_, to):
+        if to.replace('whatsapp:', '') in self.reject:
+            raise RuntimeError('Twilio: invalid To number')
+        with self._lock:
+            self.sent.append(to)
+
+
+@pytest.fixture
+def messenger(monkeypatch, smtp_server):
+    twilio = TwilioStandIn()
+    monkeypatch.setattr(auto_messenger, 'client', twilio)
+    monkeypatch.setattr(auto_messenger, 'EMAIL_ADDRESS', 'gym@example.com')
+    monkeypatch.setattr(auto_messenger, 'EMAIL_PASSWORD', 'secret')
+    monkeypatch.setattr(auto_messenger, 'SMTP_HOST', '127.0.0.1')
+    monkeypatch.setattr(auto_messenger, 'SMTP_PORT', smtp_server.port)
+    monkeypatch.setattr(auto_messenger, 'SMTP_TLS', False)
+    monkeypatch.setattr(auto_messenger, 'WHATSAPP_RATE_PER_SEC', 1000)
+    auto_messenger.app.config['TESTING'] = True
+    return auto_messenger.app.test_client(), twilio
+
+
+def test_parallel_send_streams_ndjson(messenger, smtp_server):
+    client, twilio = messenger
+    twilio.reject.add('+920000000003')
+    emails = [f'm{i}@example.com' for i in range(60)]
+    numbers = [f'+92000000000{i}' for i in range(8)]
+    r = client.post('/send?stream=1', json={'emails': emails, 'whatsapps': numbers + ['whatsapp:+920000000001']})
+    assert r.mimetype == 'application/x-ndjson'
+    lines = [json.loads(x) for x in r.get_data(as_text=True).splitlines()]
+    summary = lines[-1]
+    assert summary['done'] is True
+    assert summary['summary'] == {'email': {'sent': 60, 'failed': 0}, 'whatsapp': {'sent': 7, 'failed': 1}}
+    results = lines[:-1]
+    assert len(results) == 68
+    assert {r['to'] for r in results if r['channel'] == 'email'} == set(emails)
+    assert [r['to'] for r in results if not r['ok']] == ['+920000000003']
+    assert len(smtp_server.messages) == 60
+    # 60 messages over reused sessions, not one connection each
+    assert len(smtp_server.peers) <= auto_messenger.EMAIL_SESSIONS
+
+
+def test_sequential_send_shares_one_smtp_session(messenger, smtp_server):
+    client, _ = messenger
+    r = client.post('/send', json={'emails': ['a@example.com', 'b@example.com', 'c@example.com']})
+    data = r.get_json()
+    assert all(x['ok'] for x in data['results']['email'])
+    assert len(smtp_server.peers) == 1
+
+
+def test_dry_run_reports_plan(messenger):
+    client, twilio = messenger
+    r = client.post('/send', json={'emails': ['a@example.com'] * 2, 'whatsapps': ['+92001', '+92002'], 'dry_run': True})
+    plan = r.get_json()['plan']
+    assert plan['email'] == {'recipients': 1, 'smtp_sessions': 1}
+    assert plan['whatsapp']['recipients'] == 2
+    assert twilio.sent == []
+
+
+def test_parallel_send_survives_a_dead_worker(messenger, monkeypatch):
+    client, _ = messenger
+
+    def crash(*args, **kwargs):
+        raise RuntimeError('dispatcher crashed')
+    monkeypatch.setattr(auto_messenger, 'dispatch_concurrent', crash)
+    r = client.post('/send?stream=1', json={'emails': ['a@example.com', {'bad': 1}],
+                                             'whatsapps': ['+92001', ['+92002']]})
+    lines = [json.loads(x) for x in r.get_data(as_text=True).splitlines()]
+    assert lines[-1]['summary'] == {'email': {'sent': 1, 'failed': 0}, 'whatsapp': {'sent': 0, 'failed': 1}}
+    assert {'channel': 'whatsapp', 'to': '+92001', 'ok': False, 'error': 'dispatcher crashed'} in lines
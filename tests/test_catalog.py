@@ -0,0 +1,42 @@
+def _add(client, name, **extra):
+    return client.post('/api/products', json={'name': name, 'price': 5, 'stock': 10, **extra}).get_json()
+
+
+def test_snapshot_etag_and_deltas(client):
+    bar = _add(client, 'Protein Bar', sku='PB-1')
+    shake = _add(client, 'Shake')
+
+    r = client.get('/api/products/catalog')
+    body = r.get_json()
+    assert body['full'] is True and body['version'] == 2
+    assert [p['name'] for p in body['products']] == ['Protein Bar', 'Shake']
+    assert r.headers['ETag'] == '"catalog-2"'
+
+    # Nothing changed: 304 without a body
+    r = client.get('/api/products/catalog?since_version=2', headers={'If-None-Match': '"catalog-2"'})
+    assert r.status_code == 304 and r.data == b''
+
+    client.put(f"/api/products/{bar['id']}", json={'price': 6})
+    client.delete(f"/api/products/{shake['id']}")
+
+    delta = client.get('/api/products/catalog?since_version=2', headers={'If-None-Match': '"catalog-2"'}).get_json()
+    assert delta['full'] is False and delta['version'] == 4
+    assert [(p['name'], p['price'], p['stock']) for p in delta['products']] == [('Protein Bar', 6.0, 10)]
+    assert delta['removed'] == [shake['id']]
+
+    # Sales leave the version alone: tills get stock from the checkout reply and /stock
+    sale = client.post('/api/pos/checkout', json={'items': [{'product_id': bar['id'], 'quantity': 3}]}).get_json()
+    assert sale['stock'] == {str(bar['id']): 7}
+    r = client.get('/api/products/catalog?since_version=4', headers={'If-None-Match': '"catalog-4"'})
+    assert r.status_code == 304
+    assert client.get('/api/products/stock').get_json() == {'stock': {str(bar['id']): 7}}
+
+    assert client.get('/api/products/catalog?since_version=4').get_json()['products'] == []
+    # A client ahead of the server reloads everything
+    ahead = client.get('/api/products/catalog?since_version=99').get_json()
+    assert ahead['full'] is True and [p['name'] for p in ahead['products']] == ['Protein Bar']
+
+
+def test_product_list_serializes(client):
+    _add(client, 'Creatine', sku='CR-1')
+    assert [p['sku'] for p in client.get('/api/products?search=cr').get_json()] == ['CR-1']
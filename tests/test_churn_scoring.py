@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+from extensions import db
+from models import Member, Payment, PaymentTransaction, ChurnScore
+from blueprints.analytics import compute_churn_features, run_churn_scoring
+
+
+def seed():
+    loyal = Member(name='Loyal', admission_date=date(2024, 1, 1), last_contact_at=datetime(2025, 6, 1))
+    lapsed = Member(name='Lapsed', admission_date=date(2025, 1, 1))
+    gone = Member(name='Gone', admission_date=date(2024, 1, 1), is_active=False)
+    db.session.add_all([loyal, lapsed, gone])
+    db.session.flush()
+    for month in range(1, 7):
+        db.session.add(Payment(member_id=loyal.id, year=2025, month=month, status='Paid'))
+        db.session.add(PaymentTransaction(member_id=loyal.id, plan_type='monthly', year=2025, month=month,
+                                          amount=10, created_at=datetime(2025, month, 2)))
+    db.session.add(Payment(member_id=lapsed.id, year=2025, month=2, status='Paid'))
+    db.session.add(PaymentTransaction(member_id=lapsed.id, plan_type='monthly', year=2025, month=2,
+                                      amount=10, created_at=datetime(2025, 2, 20)))
+    db.session.commit()
+    return loyal, lapsed
+
+
+def test_churn_features(app):
+    loyal, lapsed = seed()
+    f = compute_churn_features(date(2025, 6, 15)).set_index('member_id')
+
+    assert set(f.index) == {loyal.id, lapsed.id}
+    assert f.loc[loyal.id, 'unpaid_streak'] == 0
+    assert f.loc[lapsed.id, 'unpaid_streak'] == 4
+    assert f.loc[loyal.id, 'avg_lateness_days'] == 1
+    assert f.loc[lapsed.id, 'avg_lateness_days'] == 19
+    assert f.loc[loyal.id, 'days_since_contact'] == 14
+    assert f.loc[lapsed.id, 'score'] > f.loc[loyal.id, 'score']
+
+
+def test_members_sorted_by_churn_risk(client):
+    loyal, lapsed = seed()
+    res = run_churn_scoring(date(2025, 6, 15))
+    assert res['scored'] == 2
+    assert ChurnScore.query.count() == 2
+
+    arr = client.get('/api/members?sort=churn_risk').get_json()
+    assert [m['id'] for m in arr[:2]] == [lapsed.id, loyal.id]
+    assert arr[0]['churn_risk'] > arr[1]['churn_risk']
+    # Members without a score (inactive here) sort last
+    assert arr[-1]['churn_risk'] is None
@@ -0,0 +1,121 @@
+import hashlib
+import hmac
+import json
+from datetime import date, datetime
+
+from extensions import db
+from models import Member, Payment, OutboundMessage, MessageStatus
+from delivery_status import StatusBuffer, parse_graph_statuses, status_buffer
+
+
+def _callback(*statuses):
+    return {'object': 'whatsapp_business_account', 'entry': [{'id': '1', 'changes': [{
+        'field': 'messages',
+        'value': {'messaging_product': 'whatsapp', 'statuses': [
+            {'id': wamid, 'status': st, 'timestamp': '1760860800', 'recipient_id': '923000000000',
+             **({'errors': [{'code': 131026, 'title': 'Message undeliverable'}]} if st == 'failed' else {})}
+            for wamid, st in statuses
+        ]},
+    }]}]}
+
+
+def _post(client, payload, secret='s3cret'):
+    body = json.dumps(payload).encode()
+    sig = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return client.post('/webhooks/whatsapp', data=body, content_type='application/json',
+                       headers={'X-Hub-Signature-256': sig})
+
+
+def _outbound(member_id, wamid):
+    db.session.add(OutboundMessage(channel='whatsapp', recipient='+92300', payload='{}', status='sent',
+                                   idempotency_key=f'k-{wamid}', member_id=member_id,
+                                   provider_message_id=wamid, sent_at=datetime.utcnow()))
+
+
+def test_parse_skips_unknown_statuses():
+    body = _callback(('wamid.1', 'delivered'), ('wamid.2', 'deleted'))
+    events = parse_graph_statuses(body)
+    assert [(e['provider_message_id'], e['status']) for e in events] == [('wamid.1', 'delivered')]
+
+
+def test_webhook_buffers_then_flushes_in_one_batch(client, monkeypatch):
+    monkeypatch.setenv('WHATSAPP_APP_SECRET', 's3cret')
+    m = Member(name='A', phone='+92300', admission_date=date(2025, 1, 1))
+    db.session.add(m)
+    db.session.flush()
+    for i in range(3):
+        _outbound(m.id, f'wamid.{i}')
+    db.session.commit()
+    status_buffer.flush()
+
+    r = _post(client, _callback(('wamid.0', 'sent'), ('wamid.0', 'delivered')))
+    assert r.get_json()['buffered'] == 2
+    _post(client, _callback(('wamid.0', 'read'), ('wamid.1', 'failed'), ('wamid.0', 'delivered')))
+    assert db.session.query(MessageStatus).count() == 0  # nothing written in the request
+
+    assert status_buffer.flush() == 4  # duplicate 'delivered' collapsed
+    states = dict(db.session.query(OutboundMessage.provider_message_id, OutboundMessage.delivery_status))
+    assert states == {'wamid.0': 'read', 'wamid.1': 'failed', 'wamid.2': None}
+    failed = db.session.query(MessageStatus).filter_by(status='failed').one()
+    assert failed.error_code == 131026
+
+    # A late 'delivered' retry must not downgrade 'read'; repeats are ignored
+    status_buffer.add(parse_graph_statuses(_callback(('wamid.0', 'delivered'))))
+    status_buffer.flush()
+    assert db.session.query(OutboundMessage).filter_by(provider_message_id='wamid.0').one().delivery_status == 'read'
+    assert db.session.query(MessageStatus).count() == 4
+
+    data = client.get('/api/analytics/delivery?days=7').get_json()
+    assert data['by_status']['read'] == 1 and data['by_status']['failed'] == 1
+    assert data['sent'] == 3
+
+
+def test_buffer_wakes_flusher_when_full():
+    buf = StatusBuffer(flush_size=2, flush_seconds=60)
+    buf.add([{'provider_message_id': 'x', 'status': 'sent'}])
+    assert not buf._wake.is_set()
+    buf.add([{'provider_message_id': 'y', 'status': 'sent'}])
+    assert buf._wake.is_set() and buf.pending() == 2
+
+
+def test_signature_and_verify_handshake(client, monkeypatch):
+    monkeypatch.delenv('WHATSAPP_APP_SECRET', raising=False)
+    body = json.dumps(_callback(('wamid.9', 'sent'))).encode()
+    # No secret configured: unsigned callbacks are refused unless explicitly allowed
+    assert client.post('/webhooks/whatsapp', data=body, content_type='application/json').status_code == 403
+    monkeypatch.setenv('WHATSAPP_WEBHOOK_ALLOW_UNSIGNED', '1')
+    assert client.post('/webhooks/whatsapp', data=body, content_type='application/json').status_code == 200
+    monkeypatch.delenv('WHATSAPP_WEBHOOK_ALLOW_UNSIGNED')
+
+    monkeypatch.setenv('WHATSAPP_APP_SECRET', 's3cret')
+    monkeypatch.setenv('WHATSAPP_VERIFY_TOKEN', 'tok')
+    assert client.post('/webhooks/whatsapp', data=body, content_type='application/json').status_code == 403
+    assert _post(client, _callback(('wamid.9', 'sent')), secret='wrong').status_code == 403
+    assert _post(client, _callback(('wamid.9', 'sent'))).status_code == 200
+    status_buffer.flush()
+
+    r = client.get('/webhooks/whatsapp?hub.mode=subscribe&hub.verify_token=tok&hub.challenge=42')
+    assert r.status_code == 200 and r.get_data(as_text=True) == '42'
+    assert client.get('/webhooks/whatsapp?hub.mode=subscribe&hub.verify_token=no').status_code == 403
+
+
+def test_reminder_targets_expose_last_delivery(app, monkeypatch):
+    now = datetime.now()
+    members = []
+    for name in ('ok', 'bounced'):
+        m = Member(name=name, phone='3001234567', admission_date=date(2025, 1, 1))
+        db.session.add(m)
+        db.session.flush()
+        db.session.add(Payment(member_id=m.id, year=now.year, month=now.month, status='Unpaid'))
+        members.append(m)
+    _outbound(members[1].id, 'wamid.b')
+    db.session.commit()
+    status_buffer.add(parse_graph_statuses(_callback(('wamid.b', 'failed'))))
+    status_buffer.flush()
+
+    from blueprints.communications import reminder_targets, send_bulk_text_reminders
+    targets = {t['name']: t['last_delivery'] for t in reminder_targets(now.year, now.month, 0)}
+    assert targets == {'ok': None, 'bounced': 'failed'}
+    monkeypatch.setenv('REMINDER_SKIP_FAILED_WHATSAPP', '1')
+    res = send_bulk_text_reminders(now.year, now.month, contact_window_hours=0)
+    assert res['queued'] == 1 and res['failed'] == 1
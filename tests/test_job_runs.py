@@ -0,0 +1,56 @@
+import threading
+from datetime import datetime
+
+from extensions import db
+from jobs import JobRunner, run_key
+from models import JobRun, User
+
+
+def test_run_key_buckets_by_period():
+    assert run_key(60, datetime(2026, 10, 19, 9, 0, 0, 10)) == run_key(60, datetime(2026, 10, 19, 9, 0, 59))
+    assert run_key(60, datetime(2026, 10, 19, 9, 0, 59)) != run_key(60, datetime(2026, 10, 19, 9, 1, 0))
+    assert run_key(15, datetime(2026, 10, 19, 9, 0, 14)) == '2026-10-19T09:00:00'
+
+
+def test_second_claim_of_same_trigger_is_skipped(app):
+    runner = JobRunner(db, JobRun)
+    calls = []
+    first = runner.run_once('fee_reminders', 'k1', lambda: calls.append(1) or 7)
+    second = runner.run_once('fee_reminders', 'k1', lambda: calls.append(2) or 7)
+    assert calls == [1]
+    assert second is None
+    assert first.status == 'ok' and first.rows_affected == 7 and first.duration_ms is not None
+
+    def boom():
+        raise RuntimeError('smtp down')
+    failed = runner.run_once('fee_reminders', 'k2', boom)
+    assert failed.status == 'error' and 'smtp down' in failed.error
+    assert [r['run_key'] for r in runner.history()] == ['k2', 'k1']
+
+
+def test_concurrent_workers_run_trigger_once(app):
+    runner = JobRunner(db, JobRun)
+    ran = []
+    barrier = threading.Barrier(4)
+
+    def worker():
+        with app.app_context():
+            barrier.wait()
+            runner.run_once('outbox_drain', 'same-trigger', lambda: ran.append(1))
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert ran == [1]
+    assert db.session.query(JobRun).count() == 1
+
+
+def test_admin_job_history_view(client):
+    db.session.add(User(id=1, username='tester', password_hash='x', role='admin'))
+    db.session.commit()
+    JobRunner(db, JobRun).run_once('churn_scoring', 'k', lambda: 3)
+    runs = client.get('/admin/jobs?job=churn_scoring').get_json()['runs']
+    assert len(runs) == 1 and runs[0]['rows_affected'] == 3
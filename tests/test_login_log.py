@@ -0,0 +1,48 @@
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import User, LoginLog
+from blueprints.auth import login_events
+from login_log import LoginLogBuffer
+
+
+def test_login_is_logged_by_the_flusher_not_the_request(app):
+    db.session.add(User(username='coach', password_hash=generate_password_hash('pw')))
+    db.session.commit()
+    with app.test_client() as c:
+        r = c.post('/login', data={'username': 'coach', 'password': 'pw'},
+                   environ_base={'REMOTE_ADDR': '10.0.0.7'})
+    assert r.status_code == 302 and r.headers['Location'].endswith('/dashboard')
+    assert LoginLog.query.count() == 0 and login_events.pending() == 1
+
+    assert login_events.flush() == 1
+    entry = LoginLog.query.one()
+    assert (entry.username, entry.method, entry.ip_address) == ('coach', 'password', '10.0.0.7')
+
+
+def test_buffer_writes_a_batch_in_one_flush(app):
+    buf = LoginLogBuffer(db, LoginLog, flush_size=50, flush_seconds=60)
+    user = User(id=5, username='front-desk')
+    for i in range(49):
+        buf.record(user, 'password', f'10.0.0.{i}')
+    assert not buf._wake.is_set()
+    buf.record(None, 'password', None)
+    assert buf._wake.is_set() and buf.pending() == 50
+
+    assert buf.flush() == 50 and buf.pending() == 0
+    assert LoginLog.query.filter_by(user_id=5).count() == 49
+    assert LoginLog.query.filter_by(username='unknown').one().ip_address is None
+
+
+def test_legacy_login_backup_runs_once_per_login(legacy_app, monkeypatch):
+    import threading
+    ran = []
+    monkeypatch.setattr(legacy_app, '_backup_on_login', lambda: ran.append(threading.current_thread().name))
+    monkeypatch.delenv('AUTO_BACKUP_ON_LOGIN', raising=False)
+    assert legacy_app.trigger_backup_on_login() is False
+
+    monkeypatch.setenv('AUTO_BACKUP_ON_LOGIN', '1')
+    assert legacy_app.trigger_backup_on_login() and legacy_app.trigger_backup_on_login()
+    for t in [t for t in threading.enumerate() if t.name == 'login-backup']:
+        t.join(5)
+    assert ran == ['login-backup', 'login-backup']
@@ -0,0 +1,44 @@
+import json
+
+from extensions import db
+from models import OutboundMessage, LowStockAlert
+
+
+def _low(client):
+    return [(p['name'], p['stock']) for p in client.get('/api/products/low-stock').get_json()['products']]
+
+
+def test_alert_set_follows_stock_changes(client):
+    shake = client.post('/api/products', json={'name': 'Shake', 'price': 4, 'stock': 7, 'reorder_level': 5}).get_json()
+    bar = client.post('/api/products', json={'name': 'Bar', 'price': 2, 'stock': 1}).get_json()
+    client.post('/api/products', json={'name': 'Towel', 'price': 9, 'stock': 0, 'reorder_level': None})
+    assert _low(client) == [('Bar', 1)]
+
+    client.post('/api/pos/checkout', json={'items': [{'product_id': shake['id'], 'quantity': 2}]})
+    assert _low(client) == [('Bar', 1), ('Shake', 5)]
+    client.post('/api/offline-sync', json={'orders': [{'client_id': 'o1', 'items': [{'id': shake['id'], 'quantity': 9}]}]})
+    assert _low(client) == [('Shake', 0), ('Bar', 1)]
+
+    client.put(f"/api/products/{shake['id']}", json={'stock': 24, 'stock_reason': 'restock'})
+    client.put(f"/api/products/{bar['id']}", json={'reorder_level': 0})
+    assert _low(client) == []
+
+    client.put(f"/api/products/{bar['id']}", json={'stock': 0})
+    assert _low(client) == [('Bar', 0)]
+    client.delete(f"/api/products/{bar['id']}")
+    assert _low(client) == [] and LowStockAlert.query.count() == 0
+
+
+def test_digest_is_queued_once_per_alert(client, monkeypatch):
+    monkeypatch.setenv('LOW_STOCK_ALERT_EMAILS', 'manager@gym.test')
+    client.post('/api/products', json={'name': 'Shake', 'price': 4, 'stock': 2, 'sku': 'SH-1'})
+    assert client.post('/api/products/low-stock/notify').get_json()['queued'] == 1
+    msg = OutboundMessage.query.one()
+    assert msg.channel == 'email' and msg.recipient == 'manager@gym.test'
+    assert 'Shake (SH-1): 2 left (reorder at 5)' in json.loads(msg.payload)['body']
+
+    # Already notified: nothing new until another product runs low
+    assert client.post('/api/products/low-stock/notify').get_json()['queued'] == 0
+    client.post('/api/products', json={'name': 'Bar', 'price': 2, 'stock': 3})
+    assert client.post('/api/products/low-stock/notify').get_json() == {'ok': True, 'alerts': 1, 'queued': 1}
+    assert db.session.query(OutboundMessage).count() == 2
@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+from extensions import db
+from models import Member, Payment, OutboundMessage
+from mailer import send_bulk_email, send_one
+
+
+def _messages(n):
+    return [{'to': f'm{i}@example.com', 'subject': 'Hi', 'body': f'Message {i}', 'meta': {'i': i}}
+            for i in range(n)]
+
+
+def test_bulk_email_reuses_sessions(smtp_server):
+    out = send_bulk_email(_messages(120), config=smtp_server.config, max_sessions=3)
+    assert out['sent'] == 120 and out['failed'] == 0
+    assert [r['i'] for r in out['results']] == list(range(120))
+    assert out['report']['sessions'] == 3
+    assert out['report']['connects'] == 3
+    assert len(smtp_server.peers) == 3
+    assert len(smtp_server.messages) == 120
+
+
+def test_bulk_email_reconnects_when_server_caps_session(smtp_server):
+    smtp_server.max_per_connection = 10
+    out = send_bulk_email(_messages(30), config=smtp_server.config, max_sessions=1)
+    assert out['sent'] == 30
+    assert out['report']['connects'] == 3
+    assert len(smtp_server.messages) == 30
+
+
+def test_send_one_reports_missing_config():
+    ok, err = send_one('s', 'b', 'x@example.com', config={'host': None})
+    assert not ok and 'SMTP config missing' in err
+
+
+def test_email_reminders_drain_through_bulk_sender(app, smtp_server):
+    now = datetime.now()
+    for i in range(5):
+        m = Member(name=f'M{i}', phone='', email=f'm{i}@example.com', admission_date=date(2025, 1, 1))
+        db.session.add(m)
+        db.session.flush()
+        db.session.add(Payment(member_id=m.id, year=now.year, month=now.month, status='Unpaid'))
+    db.session.commit()
+
+    from blueprints.communications import send_bulk_email_reminders, send_bulk_email_statements
+    from outbox import drain_outbox
+    assert send_bulk_email_reminders(now.year, now.month)['queued'] == 5
+    assert send_bulk_email_statements(now.year)['queued'] == 5
+    res = drain_outbox()
+    assert res['sent'] == 10
+    assert res['report']['email']['connects'] == 1
+    assert db.session.query(OutboundMessage).filter_by(status='sent').count() == 10
+    assert len(smtp_server.messages) == 10
@@ -0,0 +1,30 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip('reportlab')
+
+
+def test_card_pdf_is_stable_so_resends_reuse_the_upload(legacy_app, monkeypatch):
+    member = legacy_app.Member(name='Ali', phone='3001234567', admission_date=date(2025, 3, 1))
+    legacy_app.db.session.add(member)
+    legacy_app.db.session.commit()
+    ok, first, filename = legacy_app._build_member_card_pdf_bytes(member)
+    assert ok and filename == f'card_member_{member.id}.pdf'
+
+    class NextWeek(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(days=7)
+    monkeypatch.setattr(legacy_app, 'datetime', NextWeek)
+    assert legacy_app._build_member_card_pdf_bytes(member)[1] == first
+
+    uploads = []
+
+    def upload(filename, content, mime='application/pdf'):
+        uploads.append(filename)
+        return True, {'id': 'media-1'}
+    monkeypatch.setattr(legacy_app, '_whatsapp_upload_media', upload)
+    assert legacy_app._whatsapp_media_id(filename, first, 'application/pdf') == (True, 'media-1', False)
+    assert legacy_app._whatsapp_media_id(filename, first, 'application/pdf') == (True, 'media-1', True)
+    assert uploads == [filename]
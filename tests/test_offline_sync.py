@@ -0,0 +1,65 @@
+from extensions import db
+from models import Product, Sale, SaleItem
+
+
+def _products():
+    bar = Product(name='Protein Bar', price=10.0, stock=50)
+    shake = Product(name='Shake', price=4.5, stock=3)
+    db.session.add_all([bar, shake])
+    db.session.commit()
+    return bar.id, shake.id
+
+
+def _order(n, bar_id, shake_id):
+    return {
+        'client_id': f'tablet-1-{n}',
+        'created_at': '2026-10-19T08:30:00Z',
+        'payment_method': 'Cash',
+        'items': [
+            {'id': bar_id, 'quantity': 1, 'price': 9.0},
+            {'product_id': shake_id, 'quantity': 1},
+        ],
+    }
+
+
+def test_batch_sync_inserts_sales_and_aggregates_stock(client):
+    bar_id, shake_id = _products()
+    orders = [_order(n, bar_id, shake_id) for n in range(5)]
+    orders.append({'client_id': 'bad', 'items': [{'id': 999, 'quantity': 1}]})
+    orders.append(dict(orders[0]))  # repeated within the batch
+
+    r = client.post('/api/offline-sync', json={'orders': orders})
+    body = r.get_json()
+    assert (body['created'], body['duplicate'], body['rejected']) == (5, 1, 1)
+    assert [row['status'] for row in body['results']] == ['created'] * 5 + ['rejected', 'duplicate']
+
+    sales = db.session.query(Sale).all()
+    assert len(sales) == 5 and db.session.query(SaleItem).count() == 10
+    assert all(s.synced_from_offline and s.channel == 'offline' and s.total == 13.5 for s in sales)
+    assert sales[0].created_at.hour == 8 and sales[0].payment_method == 'cash'
+    assert len({s.invoice_number for s in sales}) == 5
+    db.session.expire_all()
+    # The sales already happened: stock floors at zero instead of rejecting
+    assert (db.session.get(Product, bar_id).stock, db.session.get(Product, shake_id).stock) == (45, 0)
+
+
+def test_resync_is_idempotent(client):
+    bar_id, shake_id = _products()
+    orders = [_order(n, bar_id, shake_id) for n in range(2)]
+    orders.append({'invoice_number': 'T1-0001', 'items': [{'id': bar_id, 'quantity': 2}]})
+    first = client.post('/api/offline-sync', json={'orders': orders}).get_json()
+    assert first['created'] == 3
+
+    again = client.post('/api/offline-sync', json={'orders': orders}).get_json()
+    assert again['created'] == 0 and again['duplicate'] == 3
+    assert [row['sale_id'] for row in again['results']] == [row['sale_id'] for row in first['results']]
+    assert db.session.query(Sale).count() == 3
+    db.session.expire_all()
+    assert db.session.get(Product, bar_id).stock == 46
+
+
+def test_sync_rejects_empty_and_oversized_batches(client, monkeypatch):
+    assert client.post('/api/offline-sync', json={'orders': []}).status_code == 400
+    monkeypatch.setenv('OFFLINE_SYNC_MAX_BATCH', '2')
+    r = client.post('/api/offline-sync', json={'orders': [{}, {}, {}]})
+    assert r.status_code == 413
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import OutboundMessage
+from outbox import enqueue_messages, claim_batch, drain_outbox, outbox_stats, requeue_dead
+
+
+def msg(key, to='+920000000001'):
+    return {'channel': 'whatsapp', 'recipient': to, 'payload': {'type': 'text', 'text': 'hi'},
+            'idempotency_key': key}
+
+
+def test_enqueue_is_idempotent(app):
+    assert enqueue_messages([msg('a'), msg('b'), msg('a')]) == {'queued': 2, 'duplicates': 1}
+    assert enqueue_messages([msg('a'), msg('c')]) == {'queued': 1, 'duplicates': 1}
+    assert OutboundMessage.query.count() == 3
+
+
+def test_claims_do_not_overlap(app):
+    enqueue_messages([msg(str(i)) for i in range(5)])
+    first = claim_batch(3)
+    second = claim_batch(10)
+    assert len(first) == 3 and len(second) == 2
+    assert not {m.id for m in first} & {m.id for m in second}
+    assert claim_batch(10) == []
+
+
+def test_failures_back_off_then_dead_letter(app, graph_api, monkeypatch):
+    monkeypatch.setenv('OUTBOX_MAX_ATTEMPTS', '2')
+    graph_api.reject.add('+920000000009')
+    enqueue_messages([msg('ok'), msg('bad', to='+920000000009')])
+
+    res = drain_outbox()
+    assert (res['sent'], res['retried'], res['dead']) == (1, 1, 0)
+    bad = OutboundMessage.query.filter_by(idempotency_key='bad').one()
+    assert bad.status == 'pending' and bad.attempts == 1
+    assert bad.next_attempt_at > datetime.utcnow()
+    assert OutboundMessage.query.filter_by(idempotency_key='ok').one().provider_message_id.startswith('wamid.')
+
+    # Not due yet, so nothing is claimed
+    assert drain_outbox()['claimed'] == 0
+    bad.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    res = drain_outbox()
+    assert res['dead'] == 1
+    stats = outbox_stats()
+    assert stats['depth']['dead'] == 1 and stats['depth']['sent'] == 1
+
+    assert requeue_dead(bad.id)
+    assert db.session.get(OutboundMessage, bad.id).status == 'pending'
@@ -0,0 +1,91 @@
+import threading
+from datetime import date
+
+from extensions import db
+from invoice_sequence import invoice_day, next_invoice_numbers
+from models import InvoiceSequence, Product, Sale, SaleItem
+
+
+def _product(stock=5, price=10.0, name='Protein Bar'):
+    p = Product(name=name, price=price, stock=stock)
+    db.session.add(p)
+    db.session.commit()
+    return p
+
+
+def test_checkout_writes_sale_items_and_stock_together(client):
+    bar = _product(stock=5)
+    shake = _product(stock=2, price=4.5, name='Shake')
+    r = client.post('/api/pos/checkout', json={'items': [
+        {'product_id': bar.id, 'quantity': 2},
+        {'product_id': shake.id, 'quantity': 1},
+        {'product_id': bar.id, 'quantity': 1},
+    ]})
+    assert r.get_json()['ok'] is True
+    sale = db.session.query(Sale).one()
+    assert sale.subtotal == 34.5
+    assert sorted((i.name, i.quantity) for i in sale.items) == [('Protein Bar', 3), ('Shake', 1)]
+    db.session.expire_all()
+    assert (db.session.get(Product, bar.id).stock, db.session.get(Product, shake.id).stock) == (2, 1)
+
+
+def test_failed_line_rolls_back_whole_checkout(client):
+    bar = _product(stock=5)
+    shake = _product(stock=1, name='Shake')
+    r = client.post('/api/pos/checkout', json={'items': [
+        {'product_id': bar.id, 'quantity': 2},
+        {'product_id': shake.id, 'quantity': 3},
+    ]})
+    assert r.status_code == 400 and 'Shake' in r.get_json()['error']
+    db.session.expire_all()
+    assert db.session.get(Product, bar.id).stock == 5
+    assert db.session.query(Sale).count() == 0 and db.session.query(SaleItem).count() == 0
+
+    r = client.post('/api/pos/checkout', json={'items': [{'product_id': 999, 'quantity': 1}]})
+    assert r.status_code == 400
+
+
+def test_parallel_checkouts_never_oversell(app):
+    bar = _product(stock=5)
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(10)
+
+    bar_id = bar.id
+
+    def terminal():
+        with app.app_context(), app.test_client() as c:
+            with c.session_transaction() as sess:
+                sess['user_id'] = 1
+            barrier.wait()
+            r = c.post('/api/pos/checkout', json={'items': [{'product_id': bar_id, 'quantity': 1}]})
+            with lock:
+                results.append((r.status_code, r.get_json()))
+
+    threads = [threading.Thread(target=terminal) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    codes = [code for code, _ in results]
+    assert codes.count(200) == 5, results
+    assert all('Insufficient stock' in body['error'] for code, body in results if code == 400)
+    db.session.expire_all()
+    assert db.session.get(Product, bar_id).stock == 0
+    assert db.session.query(Sale).count() == 5
+    assert db.session.query(SaleItem).count() == 5
+    day = invoice_day().strftime('%Y%m%d')
+    assert sorted(s.invoice_number for s in db.session.query(Sale)) == [f'INV-{day}-{n:06d}' for n in range(1, 6)]
+
+
+def test_invoice_blocks_are_gapless_across_rollbacks(app):
+    day = date(2026, 10, 19)
+    assert next_invoice_numbers(db, InvoiceSequence, 3, day=day) == [
+        'INV-20261019-000001', 'INV-20261019-000002', 'INV-20261019-000003']
+    db.session.commit()
+    next_invoice_numbers(db, InvoiceSequence, 2, day=day)
+    db.session.rollback()
+    assert next_invoice_numbers(db, InvoiceSequence, 1, day=day) == ['INV-20261019-000004']
+    assert next_invoice_numbers(db, InvoiceSequence, 1, prefix='POS', day=date(2026, 10, 20)) == ['POS-20261020-000001']
+    db.session.commit()
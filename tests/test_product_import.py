@@ -0,0 +1,75 @@
+import io
+
+import pandas as pd
+from sqlalchemy import select
+
+from extensions import db
+from models import Product, StockMovement
+from catalog import current_version
+
+
+def _upload(client, data: bytes, filename: str):
+    return client.post('/api/products/import', data={'file': (io.BytesIO(data), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_csv_import_upserts_by_sku_and_reports_rejects(client):
+    bar = client.post('/api/products', json={'name': 'Protein Bar', 'price': 5, 'stock': 10, 'sku': 'PB-1'}).get_json()
+    csv = (
+        "Barcode,Product Name,Unit Price,Qty,Category\n"
+        "PB-1,,6,15,Snacks\n"
+        "00123,Shake,4.50,20,Drinks\n"
+        ",Nameless,1,1,\n"
+        "CR-1,Creatine,abc,5,\n"
+        "00123,Shake again,4,1,Drinks\n"
+        "X-9,,3,1,\n"
+    ).encode()
+    r = _upload(client, csv, 'supplier.csv').get_json()
+    assert (r['created'], r['updated'], r['rejected']) == (1, 1, 4)
+    assert [(x['line'], x['error']) for x in r['rejects']] == [
+        (4, 'Missing SKU'), (5, "Invalid price: 'abc'"),
+        (6, 'Duplicate SKU (also on line 3)'), (7, 'Name is required for a new product')]
+
+    pb = db.session.get(Product, bar['id'])
+    assert (pb.name, pb.price, pb.stock, pb.category) == ('Protein Bar', 6.0, 15, 'Snacks')
+    shake = db.session.execute(select(Product).where(Product.sku == '00123')).scalar_one()
+    assert (shake.name, shake.price, shake.stock) == ('Shake', 4.5, 20)
+    assert shake.catalog_version == pb.catalog_version == current_version()
+
+    moves = db.session.execute(select(StockMovement.product_id, StockMovement.reason, StockMovement.delta)
+                               .order_by(StockMovement.id)).all()
+    assert moves[1:] == [(pb.id, 'import', 5), (shake.id, 'initial', 20)]
+
+    # Re-importing the same sheet changes nothing
+    again = _upload(client, csv, 'supplier.csv').get_json()
+    assert (again['created'], again['updated'], again['unchanged']) == (0, 0, 2)
+    assert _upload(client, b'Name,Price\nBar,1\n', 'x.csv').status_code == 400
+
+
+def test_xlsx_import_in_chunks(client):
+    df = pd.DataFrame({'SKU': [f'S-{i:04d}' for i in range(2000)],
+                       'Name': [f'Item {i}' for i in range(2000)],
+                       'Price': [1.25] * 2000, 'Stock': [3] * 2000})
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    r = _upload(client, buf.getvalue(), 'prices.xlsx').get_json()
+    assert (r['created'], r['rejected']) == (2000, 0)
+    assert Product.query.count() == 2000
+    assert client.get('/api/products?search=Item 1999').get_json()[0]['sku'] == 'S-1999'
+
+
+def test_bulk_price_change_by_category(client):
+    for name, price, category in (('Shake', 4.5, 'Drinks'), ('Water', 1.0, 'drinks'), ('Bar', 2.0, 'Snacks')):
+        client.post('/api/products', json={'name': name, 'price': price, 'stock': 1, 'category': category})
+    version = current_version()
+
+    r = client.post('/api/products/bulk-price', json={'mode': 'percent', 'value': 10, 'category': 'Drinks'})
+    assert r.get_json()['updated'] == 2
+    prices = {p.name: p.price for p in Product.query.all()}
+    assert prices == {'Shake': 4.95, 'Water': 1.1, 'Bar': 2.0}
+    assert current_version() == version + 1
+
+    client.post('/api/products/bulk-price', json={'mode': 'absolute', 'value': -1.5})
+    assert {p.name: p.price for p in Product.query.all()} == {'Shake': 3.45, 'Water': 0.0, 'Bar': 0.5}
+    assert client.post('/api/products/bulk-price', json={'mode': 'set', 'value': 1}).status_code == 400
+    assert client.post('/api/products/bulk-price', json={'mode': 'percent', 'value': -100}).status_code == 400
@@ -0,0 +1,63 @@
+from sqlalchemy import text
+
+from extensions import db
+from models import Product
+
+
+def _seed():
+    db.session.add_all([
+        Product(name='Whey Protein Chocolate', sku='8901234567890', price=50),
+        Product(name='Protein Bar', sku='PB-1', price=5),
+        Product(name='Shaker Bottle', sku='SH-1', price=8),
+        Product(name='Old Protein Mix', sku='OLD-1', price=1, is_active=False),
+    ])
+    db.session.commit()
+
+
+def test_sku_lookup_is_exact_and_indexed(client):
+    _seed()
+    r = client.get('/api/products/sku/8901234567890')
+    assert r.get_json()['name'] == 'Whey Protein Chocolate'
+    assert client.get('/api/products/sku/890123').status_code == 404
+    assert client.get('/api/products/sku/OLD-1').status_code == 404
+
+    plan = ' '.join(str(row) for row in db.session.execute(
+        text("EXPLAIN QUERY PLAN SELECT * FROM product WHERE sku = :s"), {'s': 'PB-1'}))
+    assert 'USING INDEX' in plan
+
+
+def test_search_uses_trigram_index_and_tracks_renames(client):
+    _seed()
+    names = lambda q: [p['name'] for p in client.get('/api/products', query_string={'search': q}).get_json()]
+    assert names('protein') == ['Protein Bar', 'Whey Protein Chocolate']
+    assert names('ker') == ['Shaker Bottle']
+    assert names('pb-') == ['Protein Bar']
+    assert names('sh') == ['Shaker Bottle']  # shorter than a trigram: plain ILIKE
+
+    bar = Product.query.filter_by(sku='PB-1').one()
+    bar.name = 'Energy Bar'
+    db.session.commit()
+    assert names('protein') == ['Whey Protein Chocolate']
+    assert names('energy') == ['Energy Bar']
+
+    plan = ' '.join(str(row) for row in db.session.execute(
+        text("EXPLAIN QUERY PLAN SELECT rowid FROM product_fts WHERE product_fts MATCH :q"), {'q': '"protein"'}))
+    assert 'VIRTUAL TABLE INDEX' in plan
+
+
+def test_old_sqlite_skips_the_trigram_index():
+    from types import SimpleNamespace
+    from models import _sqlite_has_trigram
+
+    def bind(name, version):
+        return SimpleNamespace(dialect=SimpleNamespace(name=name, server_version_info=version))
+    assert _sqlite_has_trigram(None, None, bind('sqlite', (3, 34, 0)))
+    assert not _sqlite_has_trigram(None, None, bind('sqlite', (3, 31, 1)))
+    assert not _sqlite_has_trigram(None, None, bind('postgresql', (16, 2)))
+
+
+def test_search_returns_every_match_unless_capped(client):
+    db.session.add_all([Product(name=f'Protein Bar {i:02d}', sku=f'PB-{i}', price=5) for i in range(60)])
+    db.session.commit()
+    assert len(client.get('/api/products?search=protein').get_json()) == 60
+    assert len(client.get('/api/products?search=protein&limit=10').get_json()) == 10
@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta
+
+from extensions import db
+from models import Member, Payment, OutboundMessage
+from reminder_schedule import plan_reminders, plan_status
+
+
+def _seed(now, n=10, owing_two=(7, 8)):
+    prev = (now.replace(day=1) - timedelta(days=1))
+    for i in range(n):
+        m = Member(name=f'M{i}', phone=f'+9230000000{i:02d}', admission_date=date(2025, 1, 1))
+        db.session.add(m)
+        db.session.flush()
+        db.session.add(Payment(member_id=m.id, year=now.year, month=now.month, status='Unpaid'))
+        if i in owing_two:
+            db.session.add(Payment(member_id=m.id, year=prev.year, month=prev.month, status='Unpaid'))
+    db.session.commit()
+
+
+def test_plan_spreads_sends_and_respects_cap(app, monkeypatch):
+    monkeypatch.setenv('SCHEDULE_TIME_HH', '9')
+    monkeypatch.setenv('SCHEDULE_TIME_MM', '0')
+    monkeypatch.setenv('REMINDER_WINDOW_MINUTES', '60')
+    monkeypatch.setenv('REMINDER_DAILY_CAP', '4')
+    now = datetime.combine(date.today(), datetime.min.time()).replace(hour=9)
+    _seed(now)
+
+    res = plan_reminders(now)
+    assert res['planned'] == 4 and res['deferred'] == 6
+    assert res['remaining'] == 4 and res['sent'] == 0
+
+    rows = db.session.query(OutboundMessage).order_by(OutboundMessage.next_attempt_at).all()
+    gaps = {(b.next_attempt_at - a.next_attempt_at).total_seconds() for a, b in zip(rows, rows[1:])}
+    assert gaps == {900.0}  # 60 minutes / 4 messages
+    # Members owing the most months go first when the cap bites
+    assert {8, 9} <= {r.member_id for r in rows}
+
+    # A second run the same day (restart, other worker) does not plan again
+    again = plan_reminders(now + timedelta(minutes=5))
+    assert again['planned'] == 4
+    assert db.session.query(OutboundMessage).count() == 4
+
+
+def test_plan_status_endpoint(client, monkeypatch):
+    monkeypatch.setenv('REMINDER_DAILY_CAP', '100')
+    _seed(datetime.now(), n=3, owing_two=())
+    assert client.get('/api/reminders/plan').get_json()['exists'] is False
+    plan_reminders()
+    data = client.get('/api/reminders/plan').get_json()
+    assert data['planned'] == 3 and data['remaining'] == 3
+    assert data['next_send_at'] is not None
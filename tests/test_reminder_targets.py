@@ -0,0 +1,76 @@
+from datetime import date, datetime, timedelta
+
+from extensions import db
+from models import Member, Payment
+
+
+def _member(name, phone='3001234567', **kw):
+    m = Member(name=name, phone=phone, admission_date=date(2025, 1, 1), **kw)
+    db.session.add(m)
+    db.session.flush()
+    return m
+
+
+def _seed():
+    owes_two = _member('Owes Two', monthly_fee=12)
+    db.session.add(Payment(member_id=owes_two.id, year=2026, month=8, status='Unpaid'))
+    db.session.add(Payment(member_id=owes_two.id, year=2026, month=9, status='Unpaid'))
+    paid = _member('Paid')
+    db.session.add(Payment(member_id=paid.id, year=2026, month=9, status='Paid'))
+    inactive = _member('Inactive', is_active=False)
+    db.session.add(Payment(member_id=inactive.id, year=2026, month=9, status='Unpaid'))
+    recent = _member('Recent', last_contact_at=datetime.utcnow() - timedelta(hours=2))
+    db.session.add(Payment(member_id=recent.id, year=2026, month=9, status='Unpaid'))
+    # A future unpaid month must not count towards months owed
+    db.session.add(Payment(member_id=recent.id, year=2026, month=10, status='Unpaid'))
+    db.session.commit()
+    return owes_two, recent
+
+
+def test_targets_skip_inactive_paid_and_recently_contacted(app):
+    owes_two, recent = _seed()
+    from blueprints.communications import reminder_targets
+    targets = reminder_targets(2026, 9)
+    assert [t['member_id'] for t in targets] == [owes_two.id]
+    t = targets[0]
+    assert t['months_owed'] == 2
+    assert t['fee'] == 12.0
+    assert t['phone'] == '+923001234567'
+
+    # Window 0 disables the last-contact filter
+    ids = {t['member_id']: t for t in reminder_targets(2026, 9, contact_window_hours=0)}
+    assert set(ids) == {owes_two.id, recent.id}
+    assert ids[recent.id]['months_owed'] == 1
+
+
+def test_remind_dry_run_does_not_queue(client):
+    _seed()
+    from models import OutboundMessage
+    r = client.post('/api/fees/remind?year=2026&month=9&dry_run=1&contact_window_hours=0')
+    data = r.get_json()
+    assert data['dry_run'] is True and data['count'] == 2
+    assert db.session.query(OutboundMessage).count() == 0
+
+    r = client.post('/api/fees/remind?year=2026&month=9&contact_window_hours=abc')
+    assert r.status_code == 400
+
+
+def test_reminders_dedupe_per_send_day(app, monkeypatch):
+    _seed()
+    import blueprints.communications as comms
+    from models import OutboundMessage
+    m = Member.query.filter_by(name='Owes Two').one()
+    m.email = 'owes@gym.test'
+    db.session.commit()
+
+    assert comms.send_bulk_email_reminders(2026, 9)['queued'] == 1
+    assert comms.send_bulk_email_reminders(2026, 9)['duplicates'] == 1
+
+    class Tomorrow(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(days=1)
+    monkeypatch.setattr(comms, 'datetime', Tomorrow)
+    assert comms.send_bulk_email_reminders(2026, 9)['queued'] == 1
+    keys = sorted(k for (k,) in db.session.query(OutboundMessage.idempotency_key))
+    assert [k.rsplit(':', 1)[0] for k in keys] == [f'fee-reminder:email:{m.id}:2026-09'] * 2
@@ -0,0 +1,65 @@
+from sqlalchemy import event
+
+from blueprints.decorators import role_cache
+from extensions import db
+from models import User
+
+
+def _count_user_selects():
+    seen = []
+
+    def before(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('SELECT') and 'user' in statement:
+            seen.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before)
+    return seen, lambda: event.remove(db.engine, 'before_cursor_execute', before)
+
+
+def test_admin_routes_follow_role_changes(client):
+    user = User(id=1, username='tester', password_hash='x', role='staff')
+    db.session.add(user)
+    db.session.commit()
+    assert client.get('/admin/jobs').status_code == 403
+
+    user.role = 'admin'
+    db.session.commit()
+    assert client.get('/admin/jobs').status_code == 200
+
+    db.session.delete(user)
+    db.session.commit()
+    assert client.get('/admin/jobs').status_code == 403
+
+
+def test_role_is_cached_across_requests(app):
+    db.session.add(User(id=7, username='desk', password_hash='x', role='staff'))
+    db.session.commit()
+    role_cache.invalidate_user()
+
+    seen, stop = _count_user_selects()
+    try:
+        with app.app_context():
+            assert role_cache.role(7) == 'staff' and not role_cache.is_admin(7)
+        with app.app_context():
+            assert role_cache.role(7) == 'staff'
+    finally:
+        stop()
+    assert len(seen) == 1
+
+
+def test_role_change_is_dropped_on_commit_not_flush(app):
+    user = User(id=4, username='coach', password_hash='x', role='admin')
+    db.session.add(user)
+    db.session.commit()
+    assert role_cache.is_admin(4)
+
+    # Demotion flushed but not committed: other requests still see the committed role
+    user.role = 'staff'
+    db.session.flush()
+    assert role_cache._roles[4][1] == 'admin'
+    db.session.rollback()
+    assert role_cache._roles[4][1] == 'admin'
+
+    user.role = 'staff'
+    db.session.commit()
+    assert 4 not in role_cache._roles
+    assert not role_cache.is_admin(4)
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import pytest
+
+pytest.importorskip('googleapiclient')
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+class GoogleStandIn:
+    """Local stand-in for the OAuth token endpoint and Sheets values.append.
+
+    ``fail_next`` makes the next N append calls answer 503.
+    """
+
+    def __init__(self):
+        stand_in = self
+        self.token_requests = 0
+        self.appends = []
+        self.fail_next = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                path = urlparse(self.path).path
+                with stand_in._lock:
+                    if path == '/token':
+                        stand_in.token_requests += 1
+                        return self._reply(200, {'access_token': 't', 'expires_in': 3600, 'token_type': 'Bearer'})
+                    if path.endswith(':append'):
+                        if stand_in.fail_next:
+                            stand_in.fail_next -= 1
+                            return self._reply(503, {'error': {'code': 503, 'message': 'backend unavailable'}})
+                        stand_in.appends.append({'range': unquote(path.split('/values/')[1]).rsplit(':', 1)[0],
+                                                 'values': json.loads(body)['values']})
+                        return self._reply(200, {'updates': {'updatedRows': len(json.loads(body)['values'])}})
+                self._reply(404, {})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def service_account_file(self, directory):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode()
+        path = os.path.join(directory, 'sa.json')
+        with open(path, 'w') as f:
+            json.dump({'type': 'service_account', 'project_id': 'gym', 'private_key_id': 'k1',
+                       'private_key': pem, 'client_email': 'pos@gym.iam.gserviceaccount.com',
+                       'client_id': '1', 'token_uri': self.url + 'token'}, f)
+        return path
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def legacy(legacy_app, monkeypatch, tmp_path):
+    google = GoogleStandIn()
+    monkeypatch.setenv('GOOGLE_SERVICE_ACCOUNT_FILE', google.service_account_file(str(tmp_path)))
+    monkeypatch.setenv('SALES_SHEET_ID', 'sheet-1')
+    monkeypatch.setenv('SALES_SHEET_API_ENDPOINT', google.url)
+    monkeypatch.delenv('DRIVE_FOLDER_ID', raising=False)
+    legacy_app.sale_mirror.services.reset()
+    yield legacy_app, google
+    google.close()
+
+
+def _sell(legacy_app, n, start=0):
+    for i in range(start, start + n):
+        legacy_app._persist_sale({'items': [{'name': 'Bar', 'quantity': 2, 'price': 5}],
+                                  'invoice_number': f'T-{i:03d}'}, user_id=None)
+
+
+def test_sales_are_queued_and_mirrored_in_one_append(legacy):
+    legacy_app, google = legacy
+    _sell(legacy_app, 40)
+    assert google.appends == []  # checkout no longer talks to Google
+
+    res = legacy_app.sale_mirror.flush()
+    assert (res['claimed'], res['done']) == (40, 40)
+    assert len(google.appends) == 1 and google.appends[0]['range'] == 'Sheet1!A:F'
+    assert [row[0] for row in google.appends[0]['values']] == [f'T-{i:03d}' for i in range(40)]
+
+    _sell(legacy_app, 1, start=40)
+    legacy_app.sale_mirror.flush()
+    assert google.token_requests == 1  # credentials and client reused across flushes
+    assert legacy_app.sale_mirror.stats()['by_status'] == {'done': 41}
+
+
+def test_failed_append_is_retried_without_duplicates(legacy, monkeypatch):
+    legacy_app, google = legacy
+    _sell(legacy_app, 3)
+    google.fail_next = 1
+    res = legacy_app.sale_mirror.flush()
+    assert res['retried'] == 3 and '503' in res['errors']['sheet_done']
+    queued = legacy_app.SaleMirrorQueue.query.all()
+    assert all(q.status == 'pending' and q.attempts == 1 and not q.sheet_done for q in queued)
+
+    # Make the rows due again instead of waiting out the backoff
+    legacy_app.SaleMirrorQueue.query.update({'next_attempt_at': legacy_app.datetime.utcnow()})
+    legacy_app.db.session.commit()
+    assert legacy_app.sale_mirror.flush()['done'] == 3
+    assert len(google.appends) == 1 and len(google.appends[0]['values']) == 3
+
+
+def test_mirror_disabled_skips_queue(legacy, monkeypatch):
+    legacy_app, google = legacy
+    monkeypatch.setenv('POS_GOOGLE_BACKUP_ENABLED', '0')
+    sale, info = legacy_app._persist_sale({'items': [{'name': 'Bar', 'price': 5}]}, user_id=None)
+    assert info == {'mirror': 'disabled'}
+    assert legacy_app.SaleMirrorQueue.query.count() == 0
+
+
+def test_missing_credentials_retry_instead_of_marking_done(legacy, monkeypatch):
+    legacy_app, google = legacy
+    monkeypatch.setenv('GOOGLE_SERVICE_ACCOUNT_FILE', '/nonexistent/sa.json')
+    monkeypatch.setenv('SALE_MIRROR_MAX_ATTEMPTS', '2')
+    _sell(legacy_app, 2)
+    res = legacy_app.sale_mirror.flush()
+    assert res['retried'] == 2 and 'GOOGLE_SERVICE_ACCOUNT_FILE' in res['errors']['sheet_done']
+    queued = legacy_app.SaleMirrorQueue.query.all()
+    assert all(q.status == 'pending' and not q.sheet_done and q.mirrored_at is None and q.last_error
+               for q in queued)
+
+    legacy_app.SaleMirrorQueue.query.update({'next_attempt_at': legacy_app.datetime.utcnow()})
+    legacy_app.db.session.commit()
+    assert legacy_app.sale_mirror.flush()['dead'] == 2
+    assert google.appends == []
+
+
+def test_sales_are_not_queued_without_a_target(legacy, monkeypatch):
+    legacy_app, _ = legacy
+    monkeypatch.delenv('SALES_SHEET_ID')
+    _sell(legacy_app, 1)
+    assert legacy_app.SaleMirrorQueue.query.count() == 0
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from extensions import db
+from models import Sale, SaleItem
+
+
+def _seed(n=30):
+    base = datetime(2026, 1, 1, 9, 0)
+    for i in range(n):
+        db.session.add(Sale(
+            invoice_number=f'INV-T-{i:04d}',
+            # Pairs share a timestamp so the id tie-breaker is exercised
+            created_at=base + timedelta(days=i // 2),
+            total=10.0 + i,
+            payment_method='card' if i % 3 == 0 else 'cash',
+            user_id=1 if i % 2 else 2,
+            verification_hash='x',
+            items=[SaleItem(name='Bar', quantity=1, unit_price=10.0, total_price=10.0),
+                   SaleItem(name='Shake', quantity=2, unit_price=4.0, total_price=8.0)],
+        ))
+    db.session.commit()
+
+
+def test_keyset_pages_cover_every_sale_once_with_constant_queries(client):
+    _seed()
+    statements = []
+    listener = lambda *a: statements.append(a[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        seen, cursor, pages = [], None, 0
+        while True:
+            r = client.get('/api/sales', query_string={'limit': 7, **({'cursor': cursor} if cursor else {})})
+            body = r.get_json()
+            seen += [(s['created_at'], s['id']) for s in body['sales']]
+            assert all(len(s['items']) == 2 for s in body['sales'])
+            pages += 1
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert pages == 5 and len(seen) == 30 and len(set(seen)) == 30
+    assert seen == sorted(seen, reverse=True)
+    # One query for the page plus one IN query for its items
+    assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == pages * 2
+
+
+def test_filters_and_summary_run_in_sql(client):
+    _seed()
+    body = client.get('/api/sales?method=card&user_id=2&items=0').get_json()
+    assert body['sales'] and all(s['payment_method'] == 'card' and s['user_id'] == 2 for s in body['sales'])
+    assert 'items' not in body['sales'][0]
+
+    body = client.get('/api/sales?from=2026-01-01&to=2026-01-02').get_json()
+    assert len(body['sales']) == 4
+
+    summary = client.get('/api/sales?summary=1&to=2026-01-02').get_json()
+    assert summary['count'] == 4 and summary['total'] == 10 + 11 + 12 + 13
+    assert summary['by_method'] == {'card': {'count': 2, 'total': 23.0}, 'cash': {'count': 2, 'total': 23.0}}
+
+    assert client.get('/api/sales?cursor=nonsense').status_code == 400
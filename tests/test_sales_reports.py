@@ -0,0 +1,65 @@
+from datetime import date, datetime, timedelta, timezone
+
+from extensions import db
+from models import Product, SalesDailyProduct, SalesHourly, User
+
+
+def _local_iso(day, hour):
+    # Offline orders carry a UTC timestamp; build it from a local wall-clock time
+    local = datetime(day.year, day.month, day.day, hour, 15).astimezone()
+    return local.astimezone(timezone.utc).isoformat()
+
+
+def test_rollups_follow_product_id_and_answer_reports(client):
+    bar = Product(name='Protein Bar', price=10.0, stock=100)
+    shake = Product(name='Shake', price=4.0, stock=100)
+    db.session.add_all([bar, shake])
+    db.session.commit()
+    monday = date(2026, 10, 12)
+
+    orders = [
+        {'client_id': 'a', 'created_at': _local_iso(monday, 9), 'payment_method': 'cash',
+         'items': [{'id': bar.id, 'quantity': 2, 'name': 'Choco Bar'}]},
+        {'client_id': 'b', 'created_at': _local_iso(monday, 9), 'payment_method': 'card',
+         'items': [{'id': shake.id, 'quantity': 5}]},
+        {'client_id': 'c', 'created_at': _local_iso(monday + timedelta(days=2), 18), 'payment_method': 'cash',
+         'items': [{'id': bar.id, 'quantity': 4}, {'id': shake.id, 'quantity': 1}]},
+    ]
+    assert client.post('/api/offline-sync', json={'orders': orders}).get_json()['created'] == 3
+
+    r = client.get('/api/pos/reports', query_string={'from': '2026-10-12', 'to': '2026-10-18'}).get_json()
+    # The old receipt name does not split the product
+    assert [(b['name'], b['quantity']) for b in r['best_sellers']] == [('Protein Bar', 6), ('Shake', 6)]
+    assert (r['sales'], r['revenue']) == (3, 84.0)
+    assert r['by_hour'][9] == 40.0 and r['by_hour'][18] == 44.0
+    assert r['by_weekday']['Mon'] == 40.0 and r['by_weekday']['Wed'] == 44.0
+    assert r['heatmap']['sales'][0][9] == 2 and r['heatmap']['revenue'][2][18] == 44.0
+    assert r['payment_methods']['cash'] == {'count': 2, 'revenue': 64.0, 'share': round(64 / 84, 4)}
+
+    empty = client.get('/api/pos/reports?from=2026-01-01&to=2026-01-07').get_json()
+    assert empty['sales'] == 0 and empty['best_sellers'] == [] and len(empty['heatmap']['revenue']) == 7
+    assert client.get('/api/pos/reports?from=2026-02-01&to=2026-01-01').status_code == 400
+
+
+def test_rebuild_matches_incremental_rollups(client):
+    bar = Product(name='Protein Bar', price=10.0, stock=100)
+    db.session.add(bar)
+    db.session.commit()
+    for method in ('cash', 'card', 'cash'):
+        client.post('/api/pos/checkout', json={'items': [{'product_id': bar.id, 'quantity': 2}],
+                                               'payment_method': method})
+
+    def snapshot():
+        db.session.expire_all()
+        return (sorted((r.day, r.product_id, r.quantity, r.revenue) for r in SalesDailyProduct.query),
+                sorted((r.day, r.hour, r.payment_method, r.sales_count, r.revenue) for r in SalesHourly.query))
+
+    incremental = snapshot()
+    assert incremental[0][0][2:] == (6, 60.0)
+    today = date.today().isoformat()
+    # Deletes and recomputes rollups, so staff can't run it
+    assert client.post('/api/pos/reports/rebuild', json={'from': today, 'to': today}).status_code == 403
+    db.session.add(User(id=1, username='tester', password_hash='x', role='admin'))
+    db.session.commit()
+    assert client.post('/api/pos/reports/rebuild', json={'from': today, 'to': today}).get_json()['sales'] == 3
+    assert snapshot() == incremental
@@ -0,0 +1,79 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Product, StockMovement, StockSnapshot, User
+from stock_ledger import audit, stock_on, take_snapshot
+
+
+def _ledger_total(product_id):
+    return db.session.execute(
+        select(func.coalesce(func.sum(StockMovement.delta), 0)).where(StockMovement.product_id == product_id)
+    ).scalar()
+
+
+def test_every_stock_change_is_in_the_ledger(client):
+    pid = client.post('/api/products', json={'name': 'Protein Bar', 'price': 10, 'stock': 20}).get_json()['id']
+    sold = client.post('/api/pos/checkout', json={'items': [{'product_id': pid, 'quantity': 3}]}).get_json()
+    # The till sold more than the server thinks is left; stock floors at zero
+    synced = client.post('/api/offline-sync', json={'orders': [
+        {'client_id': 'x1', 'items': [{'id': pid, 'quantity': 30}]},
+    ]}).get_json()
+    assert synced['created'] == 1 and db.session.get(Product, pid).stock == 0
+    assert client.put(f'/api/products/{pid}', json={'stock': 12, 'stock_reason': 'restock'}).status_code == 200
+    assert client.put(f'/api/products/{pid}', json={'stock': 1, 'stock_reason': 'lost'}).status_code == 400
+
+    moves = db.session.execute(
+        select(StockMovement.reason, StockMovement.delta, StockMovement.ref)
+        .where(StockMovement.product_id == pid).order_by(StockMovement.id)
+    ).all()
+    assert [(r, d) for r, d, _ in moves] == [('initial', 20), ('sale', -3), ('sale', -30), ('oversold', 13),
+                                             ('restock', 12)]
+    assert moves[1].ref == sold['invoice_number']
+    assert _ledger_total(pid) == db.session.get(Product, pid).stock == 12
+
+
+def _move(product, delta, reason, day, hour=12):
+    # A movement at a local wall-clock time, applied to the live stock as the app would
+    at = datetime(day.year, day.month, day.day, hour).astimezone(timezone.utc).replace(tzinfo=None)
+    db.session.add(StockMovement(product_id=product.id, delta=delta, reason=reason, created_at=at))
+    product.stock += delta
+
+
+def test_stock_on_date_and_month_end_audit(client):
+    bar = Product(name='Protein Bar', price=2.5, stock=0)
+    db.session.add(bar)
+    db.session.flush()
+    _move(bar, 50, 'initial', date(2026, 9, 28))
+    _move(bar, -5, 'sale', date(2026, 9, 30), hour=23)
+    _move(bar, -3, 'damage', date(2026, 10, 1), hour=0)
+    _move(bar, -10, 'sale', date(2026, 10, 20))
+    _move(bar, 4, 'adjustment', date(2026, 10, 21))
+    db.session.commit()
+
+    # Same answers from the live stock alone and from a snapshot on either side
+    expected = {date(2026, 9, 27): 0, date(2026, 9, 28): 50, date(2026, 9, 30): 45,
+                date(2026, 10, 1): 42, date(2026, 10, 31): 36}
+    assert {d: stock_on(d).get(bar.id, 0) for d in expected} == expected
+    assert take_snapshot(date(2026, 9, 30))['products'] == 1
+    assert db.session.get(StockSnapshot, (date(2026, 9, 30), bar.id)).stock == 45
+    assert {d: stock_on(d).get(bar.id, 0) for d in expected} == expected
+
+    report = audit(date(2026, 10, 1), date(2026, 10, 31))
+    row, = report['products']
+    assert (row['opening'], row['closing']) == (45, 36)
+    assert row['movements'] == {'damage': -3, 'sale': -10, 'adjustment': 4}
+    assert (report['shrinkage_units'], report['shrinkage_value']) == (3, 7.5)
+    assert report['closing_value'] == 90.0
+
+    r = client.get('/api/inventory/stock?date=2026-10-01').get_json()
+    assert (r['units'], r['value']) == (42, 105.0)
+    assert client.get('/api/inventory/audit?from=2026-10-31&to=2026-10-01').status_code == 400
+
+
+def test_manual_snapshot_needs_admin(client):
+    assert client.post('/api/inventory/snapshot', json={'date': '2026-09-30'}).status_code == 403
+    db.session.add(User(id=1, username='tester', password_hash='x', role='admin'))
+    db.session.commit()
+    assert client.post('/api/inventory/snapshot', json={'date': '2026-09-30'}).status_code == 200
@@ -0,0 +1,79 @@
+from datetime import date, datetime
+
+from extensions import db
+from models import Member, Payment
+from messaging import TokenBucket, dispatch_concurrent
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=10, clock=clock, sleep=clock.sleep)
+    for _ in range(30):
+        bucket.acquire()
+    # 10 tokens from the initial burst, the remaining 20 refill at 10/s
+    assert abs(clock.now - 2.0) < 1e-6
+
+
+def test_dispatch_reports_per_message_results():
+    def send(to_phone):
+        return (to_phone != 'bad'), ('ok' if to_phone != 'bad' else 'rejected')
+
+    jobs = [{'args': {'to_phone': p}, 'meta': {'to': p}} for p in ('a', 'bad', 'c')]
+    out = dispatch_concurrent(jobs, send, max_workers=3, rate_per_sec=1000)
+    assert out['sent'] == 2 and out['failed'] == 1
+    assert [r['to'] for r in out['results']] == ['a', 'bad', 'c']
+    assert out['results'][1]['error'] == 'rejected'
+    assert out['report']['messages'] == 3
+
+
+def test_bulk_text_reminders_against_stand_in(app, graph_api, monkeypatch):
+    monkeypatch.setenv('WHATSAPP_RATE_PER_SEC', '200')
+    now = datetime.now()
+    for i in range(20):
+        m = Member(name=f'M{i}', phone=f'+9230000000{i:02d}', admission_date=date(2025, 1, 1))
+        db.session.add(m)
+        db.session.flush()
+        db.session.add(Payment(member_id=m.id, year=now.year, month=now.month, status='Unpaid'))
+    no_phone = Member(name='NoPhone', phone='', admission_date=date(2025, 1, 1))
+    db.session.add(no_phone)
+    db.session.flush()
+    db.session.add(Payment(member_id=no_phone.id, year=now.year, month=now.month, status='Unpaid'))
+    db.session.commit()
+    graph_api.reject.add('+923000000005')
+
+    from blueprints.communications import send_bulk_text_reminders
+    from outbox import drain_outbox
+    queued = send_bulk_text_reminders(now.year, now.month)
+    assert queued['queued'] == 20 and queued['failed'] == 1
+    assert graph_api.messages() == []
+
+    res = drain_outbox()
+    assert res['sent'] == 19
+    assert res['retried'] == 1
+    assert len(graph_api.messages()) == 20
+    assert res['report']['whatsapp']['messages'] == 20
+
+
+def test_pooled_client_records_latency(graph_api):
+    from whatsapp_client import WhatsAppClient
+    client = WhatsAppClient(pool_size=4)
+    for _ in range(5):
+        r = client.post(f"{graph_api.url}/1234/messages", json={'to': '+92000'}, timeout=5)
+        assert r.status_code == 200
+    graph_api.reject.add('+92bad')
+    client.post(f"{graph_api.url}/1234/messages", json={'to': '+92bad'}, timeout=5)
+    snap = client.latency.snapshot()['messages']
+    assert snap['count'] == 6 and snap['errors'] == 1
+    assert sum(snap['buckets'].values()) == 6
+    client.close()
@@ -0,0 +1,82 @@
+"""Benchmark: one SMTP connection per email vs reused sessions.
+
+Starts a local aiosmtpd server (pip install aiosmtpd) that adds a fixed delay
+to EHLO to mimic the handshake round trips of a remote provider, then sends a
+batch of emails both ways and reports elapsed time and connections opened.
+
+Usage:
+  python tools/bench_smtp_session.py [--messages 500] [--sessions 4] [--rtt-ms 20]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import logging
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mailer import send_bulk_email, send_one  # noqa: E402
+
+
+class Handler:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.connections = 0
+        self.delivered = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        await asyncio.sleep(self.rtt)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered += 1
+        return '250 OK'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--rtt-ms', type=float, default=20)
+    args = parser.parse_args()
+    # aiosmtpd logs a deprecation notice on every AUTH
+    logging.getLogger('mail.log').setLevel(logging.ERROR)
+
+    handler = Handler(args.rtt_ms / 1000)
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    controller = Controller(handler, hostname='127.0.0.1', port=port,
+                            authenticator=lambda *a: AuthResult(success=True), auth_require_tls=False)
+    controller.start()
+    cfg = {'host': '127.0.0.1', 'port': port, 'user': 'bench@example.com', 'password': 'x',
+           'use_tls': False, 'sender': 'bench@example.com'}
+    msgs = [{'to': f'm{i}@example.com', 'subject': 'Fee reminder', 'body': 'Please pay.'} for i in range(args.messages)]
+    print(f"{'mode':<26} {'elapsed':>9} {'rate':>13} {'conns':>8}")
+    try:
+        handler.connections = 0
+        started = time.perf_counter()
+        ok = sum(1 for m in msgs if send_one(m['subject'], m['body'], m['to'], config=cfg)[0])
+        baseline = time.perf_counter() - started
+        print(f"{'connect per message':<26} {baseline:8.2f}s {args.messages / baseline:9.1f} msg/s "
+              f"{handler.connections:8d}  {ok}/{args.messages} ok")
+
+        handler.connections = 0
+        out = send_bulk_email(msgs, config=cfg, max_sessions=args.sessions)
+        bulk = out['report']['elapsed_s']
+        print(f"{'send_bulk_email':<26} {bulk:8.2f}s {args.messages / bulk:9.1f} msg/s "
+              f"{handler.connections:8d}  {out['sent']}/{args.messages} ok")
+        print(f"speedup: {baseline / bulk:.2f}x")
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
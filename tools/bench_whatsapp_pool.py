@@ -0,0 +1,110 @@
+"""Benchmark: per-call requests.post vs the pooled WhatsApp client.
+
+Starts a local HTTPS stand-in for graph.facebook.com (self-signed cert made
+with the openssl CLI), sends a batch of text messages both ways and reports
+elapsed time and the number of TCP/TLS connections the server accepted.
+
+Usage:
+  python tools/bench_whatsapp_pool.py [--messages 1000] [--workers 16]
+"""
+import argparse
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from whatsapp_client import WhatsAppClient  # noqa: E402
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def get_request(self):
+        sock, addr = super().get_request()
+        type(self).connections += 1
+        return sock, addr
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        data = json.dumps({'messages': [{'id': 'wamid.bench'}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_cert(tmp: str) -> tuple[str, str]:
+    cert, key = os.path.join(tmp, 'cert.pem'), os.path.join(tmp, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+        '-keyout', key, '-out', cert,
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+def start_server(cert: str, key: str) -> CountingServer:
+    server = CountingServer(('127.0.0.1', 0), Handler)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(label, post, url, n, workers, server):
+    payload = {'messaging_product': 'whatsapp', 'to': '+920000000000', 'type': 'text', 'text': {'body': 'hi'}}
+    headers = {'Authorization': 'Bearer bench', 'Content-Type': 'application/json'}
+    CountingServer.connections = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        codes = list(pool.map(lambda _: post(url, headers=headers, json=payload, timeout=20).status_code, range(n)))
+    elapsed = time.perf_counter() - started
+    ok = sum(1 for c in codes if c == 200)
+    print(f"{label:<22} {elapsed:8.2f}s {n / elapsed:9.1f} msg/s {CountingServer.connections:8d} conns  {ok}/{n} ok")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_cert(tmp)
+        server = start_server(cert, key)
+        url = f"https://127.0.0.1:{server.server_address[1]}/v20.0/1234/messages"
+        print(f"{'mode':<22} {'elapsed':>9} {'rate':>13} {'conns':>8}")
+
+        def per_call_post(u, **kw):
+            return requests.post(u, verify=cert, **kw)
+
+        baseline = run('requests.post (no pool)', per_call_post, url, args.messages, args.workers, server)
+        client = WhatsAppClient(pool_size=args.workers, verify=cert)
+        pooled = run('WhatsAppClient (pooled)', client.post, url, args.messages, args.workers, server)
+        print(f"speedup: {baseline / pooled:.2f}x")
+        print(json.dumps(client.latency.snapshot(), indent=2))
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
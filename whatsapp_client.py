@@ -0,0 +1,133 @@
+"""Shared HTTP client for WhatsApp Graph API calls.
+
+Every sender goes through one pooled ``requests.Session`` so bulk sends reuse
+keep-alive TCP/TLS connections instead of handshaking per message. Per-call
+latency is recorded into a small fixed-bucket histogram for the admin view.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: dict[str, dict] = {}
+
+    def observe(self, label: str, ms: float, ok: bool) -> None:
+        with self._lock:
+            s = self._series.setdefault(label, {
+                'counts': [0] * (len(self.buckets) + 1), 'count': 0, 'errors': 0, 'sum_ms': 0.0, 'max_ms': 0.0,
+            })
+            idx = next((i for i, b in enumerate(self.buckets) if ms <= b), len(self.buckets))
+            s['counts'][idx] += 1
+            s['count'] += 1
+            s['sum_ms'] += ms
+            s['max_ms'] = max(s['max_ms'], ms)
+            if not ok:
+                s['errors'] += 1
+
+    def snapshot(self) -> dict:
+        labels = [f"<={b}ms" for b in self.buckets] + [f">{self.buckets[-1]}ms"]
+        with self._lock:
+            return {
+                name: {
+                    'count': s['count'],
+                    'errors': s['errors'],
+                    'avg_ms': round(s['sum_ms'] / s['count'], 1) if s['count'] else None,
+                    'max_ms': round(s['max_ms'], 1),
+                    'buckets': dict(zip(labels, s['counts'])),
+                }
+                for name, s in self._series.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class WhatsAppClient:
+    """Thread-safe wrapper around a pooled ``requests.Session``.
+
+    The session is shared by all threads (urllib3's pool hands each request
+    its own connection). Only connection failures and 429/503 replies are
+    retried: those are the cases where Graph has not accepted the message, so
+    a retry cannot produce a duplicate.
+    """
+
+    def __init__(self, pool_size: int | None = None, retries: int = 2, verify=True):
+        self.pool_size = pool_size or int(os.getenv('WHATSAPP_POOL_SIZE') or 32)
+        self.retries = retries
+        self.verify = verify
+        self.latency = LatencyHistogram()
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _build_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,
+            status=self.retries,
+            status_forcelist=(429, 503),
+            allowed_methods=frozenset(['GET', 'POST']),
+            backoff_factor=0.5,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.verify = self.verify
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        # Label by endpoint ('messages', 'media') rather than full URL
+        label = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1] or 'root'
+        # Pass verify per call: requests lets REQUESTS_CA_BUNDLE override session.verify
+        kwargs.setdefault('verify', self.verify)
+        started = time.perf_counter()
+        ok = False
+        try:
+            resp = self.session.post(url, **kwargs)
+            ok = 200 <= resp.status_code < 300
+            return resp
+        finally:
+            self.latency.observe(label, (time.perf_counter() - started) * 1000, ok)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_client: WhatsAppClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_whatsapp_client() -> WhatsAppClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WhatsAppClient()
+    return _client